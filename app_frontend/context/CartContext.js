@@ -1,5 +1,6 @@
 // components/cartContext.js
 import { createContext, useState, useEffect } from 'react';
+import config from '../config';
 
 export const CartContext = createContext();
 
@@ -12,12 +13,40 @@ export const CartProvider = ({ children }) => {
     if (typeof window !== 'undefined') {
       const stored = localStorage.getItem('cart');
       if (stored) {
-        setCart(JSON.parse(stored));
+        const items = JSON.parse(stored);
+        setCart(items);
+        refreshCart(items);
       }
       setHasMounted(true);
     }
   }, []);
 
+  // Refresh stored prices with one batch lookup and drop products that no longer exist
+  const refreshCart = async (items) => {
+    if (items.length === 0) return;
+    try {
+      const response = await fetch(`${config.apiBaseUrl}/api/product/byIds`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ ids: items.map(item => item.product_id) }),
+      });
+      if (!response.ok) return;
+      const { data } = await response.json();
+      setCart((prev) =>
+        prev
+          .filter(item => data[item.product_id])
+          .map(item => ({
+            ...item,
+            name: data[item.product_id].product_name,
+            price: data[item.product_id].price,
+            img_url: data[item.product_id].img_url,
+          }))
+      );
+    } catch (err) {
+      console.error('Error refreshing cart:', err);
+    }
+  };
+
   // Save cart to localStorage
   useEffect(() => {
     if (hasMounted) {
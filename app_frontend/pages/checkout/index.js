@@ -10,6 +10,8 @@ export default function CheckoutForm() {
   const [shippingFee, setShippingFee] = useState(50); // Default shipping fee
   const [subtotal, setSubtotal] = useState(0);
   const [hasToken, setHasToken] = useState(false);
+  // One key per checkout attempt, so a resubmit or retry cannot place the order twice
+  const [idempotencyKey] = useState(() => crypto.randomUUID());
 
   const searchProducts = () => {
     // Show default products when search is empty
@@ -89,7 +91,8 @@ export default function CheckoutForm() {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
-        'Authorization': token ? `Bearer ${token}` : ''
+        'Authorization': token ? `Bearer ${token}` : '',
+        'Idempotency-Key': idempotencyKey
       },
       body: JSON.stringify({
         ...formData,
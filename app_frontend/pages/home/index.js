@@ -3,6 +3,7 @@ import Head from 'next/head';
 import { useEffect, useRef, useState } from 'react';
 import Link from 'next/link';
 
+const API_URL = 'https://ecoreachdb-api.onrender.com';
 
 export default function HomePage() {
   const bannerRef = useRef(null);
@@ -13,7 +14,12 @@ export default function HomePage() {
   
   const [searchTerm, setSearchTerm] = useState('');
   const [activeTab, setActiveTab] = useState('all');
-  const [products, setProducts] = useState([]);
+  const [newReleases, setNewReleases] = useState([]);
+  const [trending, setTrending] = useState([]);
+  // Products of the selected category or search, one page at a time
+  const [results, setResults] = useState([]);
+  // The next page to load: { url } (category cursor) or { term, page } (search)
+  const [nextPage, setNextPage] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [retryCount, setRetryCount] = useState(0);
@@ -30,30 +36,47 @@ export default function HomePage() {
     setHasToken(!!token); // true if token exists, false otherwise
   }, []);
 
+  useEffect(() => {
+    if (!searchTerm) return;
+    // Wait for a pause in typing before asking the server
+    const timer = setTimeout(() => searchPage(searchTerm, 1, false), 300);
+    return () => clearTimeout(timer);
+  }, [searchTerm]);
+
+  const fetchJson = async (url) => {
+    // Add a timeout to the fetch request
+    const fetchPromise = fetch(url);
+    const timeoutPromise = new Promise((_, reject) =>
+      setTimeout(() => reject(new Error('Request timed out')), 5000)
+    );
+
+    const response = await Promise.race([fetchPromise, timeoutPromise]);
+
+    if (!response.ok) {
+      throw new Error(`HTTP error! Status: ${response.status}`);
+    }
+
+    const data = await response.json();
+
+    if (!data || !data.data) {
+      throw new Error('Invalid data format received from API');
+    }
+    return data;
+  };
+
   const fetchProducts = async () => {
     try {
       setLoading(true);
       setError(null);
-      
-      // Add a timeout to the fetch request
-      const fetchPromise = fetch('https://ecoreachdb-api.onrender.com/api/product/all');
-      const timeoutPromise = new Promise((_, reject) => 
-        setTimeout(() => reject(new Error('Request timed out')), 5000)
-      );
-      
-      const response = await Promise.race([fetchPromise, timeoutPromise]);
-      
-      if (!response.ok) {
-        throw new Error(`HTTP error! Status: ${response.status}`);
-      }
-      
-      const data = await response.json();
-      
-      if (!data || !data.data) {
-        throw new Error('Invalid data format received from API');
-      }
-      
-      setProducts(data.data);
+
+      // The sections only show the first page of what the server filters for them
+      const [releases, trend] = await Promise.all([
+        fetchJson(`${API_URL}/api/product/all?is_new_release=true`),
+        fetchJson(`${API_URL}/api/product/all?is_trending=true`),
+      ]);
+
+      setNewReleases(releases.data);
+      setTrending(trend.data);
       setLoading(false);
     } catch (err) {
       console.error('Failed to fetch products:', err);
@@ -62,6 +85,39 @@ export default function HomePage() {
     }
   };
 
+  // Follows the `next` cursor link the catalog returns, so every page costs the same
+  const categoryPage = async (url, append) => {
+    try {
+      const data = await fetchJson(url);
+      setResults(prev => (append ? [...prev, ...data.data] : data.data));
+      setNextPage(data.next ? { url: data.next } : null);
+    } catch (err) {
+      console.error('Failed to fetch products:', err);
+      setResults(prev => (append ? prev : []));
+      setNextPage(null);
+    }
+  };
+
+  const searchPage = async (term, page, append) => {
+    try {
+      const data = await fetchJson(`${API_URL}/api/product/search?q=${encodeURIComponent(term)}&page=${page}`);
+      setResults(prev => (append ? [...prev, ...data.data] : data.data));
+      setNextPage(data.next_page ? { term, page: data.next_page } : null);
+    } catch (err) {
+      console.error('Failed to search products:', err);
+      setResults(prev => (append ? prev : []));
+      setNextPage(null);
+    }
+  };
+
+  const loadMore = () => {
+    if (nextPage?.url) {
+      categoryPage(nextPage.url, true);
+    } else if (nextPage) {
+      searchPage(nextPage.term, nextPage.page, true);
+    }
+  };
+
   const handleRetry = () => {
     setRetryCount(prev => prev + 1);
   };
@@ -79,6 +135,10 @@ export default function HomePage() {
     if (category === 'all') {
       showDefault();
     } else {
+      setSearchTerm('');
+      setResults([]);
+      setNextPage(null);
+      categoryPage(`${API_URL}/api/product/all?category=${encodeURIComponent(category)}`, false);
       bannerRef.current?.classList.add('hidden');
       newReleaseRef.current?.classList.add('hidden');
       trendingRef.current?.classList.add('hidden');
@@ -96,19 +156,14 @@ export default function HomePage() {
     }
     
     setActiveTab('');
+    setResults([]);
+    setNextPage(null);
     bannerRef.current?.classList.add('hidden');
     newReleaseRef.current?.classList.add('hidden');
     trendingRef.current?.classList.add('hidden');
     resultsRef.current?.classList.remove('hidden');
   };
 
-  const filteredProducts = searchTerm
-    ? products.filter(product =>
-        product.product_name.toLowerCase().includes(searchTerm.toLowerCase()))
-    : activeTab !== 'all'
-      ? products.filter(product => product.category === activeTab)
-      : [];
-
   // Render error state with retry button
   if (error) {
     return (
@@ -271,8 +326,8 @@ export default function HomePage() {
           ref={resultsRef}
           className="max-w-screen-2xl mx-auto px-6 py-8 grid grid-cols-2 sm:grid-cols-3 md:grid-cols-4 lg:grid-cols-6 gap-6 hidden"
         >
-          {filteredProducts.length > 0 ? (
-            filteredProducts.map(product => (
+          {results.length > 0 ? (
+            results.map(product => (
               <a
                 key={product.product_id}
                 href={`/product/${product.product_id}`}
@@ -297,6 +352,16 @@ export default function HomePage() {
           ) : (
             <div className="col-span-full text-center py-10">No products found</div>
           )}
+          {nextPage && (
+            <div className="col-span-full text-center">
+              <button
+                onClick={loadMore}
+                className="px-4 py-2 border border-green-900 rounded text-green-900 text-sm hover:bg-green-900 hover:text-white transition"
+              >
+                Load more
+              </button>
+            </div>
+          )}
         </div>
         
         {/* Banner */}
@@ -315,8 +380,8 @@ export default function HomePage() {
           <div className="max-w-screen-2xl mx-auto px-6">
             <h2 className="text-xl font-bold text-green-900 mb-2">New Release</h2>
             <div className="overflow-x-auto flex space-x-4 py-2">
-              {products.filter(product => product.is_new_release === true).length > 0 ? (
-                products.filter(product => product.is_new_release === true).map(product => (
+              {newReleases.length > 0 ? (
+                newReleases.map(product => (
                   <a
                     key={product.product_id}
                     href={`/product/${product.product_id}`}
@@ -350,8 +415,8 @@ export default function HomePage() {
         <section ref={trendingRef} className="max-w-screen-2xl mx-auto px-6 mt-8">
           <h2 className="text-xl font-bold text-green-900 mb-2">Trending Product</h2>
           <div className="overflow-x-auto flex space-x-4 py-2">
-            {products.filter(product => product.is_trending === true).length > 0 ? (
-              products.filter(product => product.is_trending === true).map(product => (
+            {trending.length > 0 ? (
+              trending.map(product => (
                 <a
                   key={product.product_id}
                   href={`/product/${product.product_id}`}
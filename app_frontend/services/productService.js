@@ -11,6 +11,7 @@ export const ProductService = {
    * Get all products
    * @param {Object} options - Query options
    * @param {number} options.page - Page number
+   * @param {string} options.cursor - Opaque cursor taken from the previous response's `next` link
    * @param {number} options.limit - Number of products per page
    * @param {string} options.category - Filter by category
    * @param {boolean} options.isNewRelease - Filter by new release status
@@ -21,6 +22,7 @@ export const ProductService = {
     // Build query string from options
     const queryParams = new URLSearchParams();
     if (options.page) queryParams.append('page', options.page);
+    if (options.cursor) queryParams.append('cursor', options.cursor);
     if (options.limit) queryParams.append('limit', options.limit);
     if (options.category) queryParams.append('category', options.category);
     if (options.isNewRelease !== undefined) queryParams.append('is_new_release', options.isNewRelease);
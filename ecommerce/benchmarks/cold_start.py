@@ -0,0 +1,138 @@
+"""
+Cold-start time of the API server: from process start to the first
+successful response, plus the latency of the first few requests.
+
+Compares the old start command with the serve path:
+- legacy runs check --deploy, migrate, collectstatic and the fixtures on
+  every boot, then gunicorn without preloading.
+- serve is serve.sh: a fingerprint check, then gunicorn with preload_app
+  and the warm-up hook.
+Both restart against a database that is already migrated and seeded, as a
+restart in production would:
+
+    python -m benchmarks.cold_start --runs 5
+
+Uses a throwaway SQLite database unless --database-url is given.
+"""
+import argparse
+import http.client
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+LEGACY = (
+    'python manage.py check --deploy && '
+    'python manage.py migrate --noinput && '
+    'python manage.py collectstatic --noinput && '
+    '{ (python manage.py import_products product_management/fixtures/products.json && '
+    'python manage.py loaddata users.json || echo "Warning: Could not load fixtures") & } && '
+    'gunicorn ecommerce_service.asgi:application -k uvicorn.workers.UvicornWorker --bind 127.0.0.1:$PORT --workers $WEB_CONCURRENCY'
+)
+SERVE = './serve.sh'
+PATH = '/api/product/all'
+
+
+def get(port):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    try:
+        started = time.perf_counter()
+        connection.request('GET', PATH)
+        response = connection.getresponse()
+        response.read()
+        return response.status, (time.perf_counter() - started) * 1000
+    finally:
+        connection.close()
+
+
+def boot(command, env, port, requests, timeout=120):
+    """Start ``command`` and time it until the first 200; returns (boot seconds, request latencies in ms)"""
+    process = subprocess.Popen(
+        command, shell=True, env=env, start_new_session=True,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    started = time.perf_counter()
+    try:
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f'{command!r} exited with {process.returncode}')
+            if time.perf_counter() - started > timeout:
+                raise RuntimeError(f'{command!r} did not answer within {timeout}s')
+            try:
+                status, first = get(port)
+            except OSError:
+                time.sleep(0.02)
+                continue
+            if status == 200:
+                break
+            time.sleep(0.02)
+        boot_seconds = time.perf_counter() - started
+        return boot_seconds, [first] + [get(port)[1] for _ in range(requests - 1)]
+    finally:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait()
+        wait_closed(port)
+
+
+def wait_closed(port, timeout=30):
+    """gunicorn shuts its workers down gracefully; wait until nothing listens on ``port``"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            get(port)
+        except OSError:
+            return
+        time.sleep(0.05)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--requests', type=int, default=5, help='Requests timed after each boot')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--port', type=int, default=8791)
+    parser.add_argument('--database-url')
+    parser.add_argument('--output', default='cold_start_output.json')
+    args = parser.parse_args(argv)
+
+    tmp = tempfile.TemporaryDirectory()
+    env = dict(
+        os.environ,
+        DATABASE_URL=args.database_url or f'sqlite:///{tmp.name}/cold_start.sqlite3',
+        RELEASE_MARKER=os.path.join(tmp.name, '.release'),
+        PORT=str(args.port),
+        WEB_CONCURRENCY=str(args.workers),
+        DEBUG='true',  # no HTTPS redirect on the plain-HTTP probe
+    )
+    # The first boot of a release does the one-time work; measure restarts after it
+    subprocess.run([sys.executable, 'manage.py', 'prepare_release', '-v0'], env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+
+    results = {'runs': args.runs, 'workers': args.workers, 'modes': {}}
+    for mode, command in (('legacy', LEGACY), ('serve', SERVE)):
+        boots, firsts, rest = [], [], []
+        for _ in range(args.runs):
+            seconds, latencies = boot(command, env, args.port, args.requests)
+            boots.append(seconds)
+            firsts.append(latencies[0])
+            rest.extend(latencies[1:])
+        results['modes'][mode] = result = {
+            'boot_s': round(statistics.median(boots), 3),
+            'first_request_ms': round(statistics.median(firsts), 1),
+            'later_requests_ms': round(statistics.median(rest), 1) if rest else None,
+        }
+        print(f"{mode:<8} boot {result['boot_s']:>7} s  first request {result['first_request_ms']:>7} ms  "
+              f"later requests {result['later_requests_ms']} ms")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+    tmp.cleanup()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
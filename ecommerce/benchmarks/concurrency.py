@@ -0,0 +1,141 @@
+"""
+Throughput and tail latency under concurrent load, against a running server.
+
+Unlike benchmarks.run, which drives views in-process, this issues real HTTP
+requests from N client threads (one keep-alive connection each), so it
+compares serving stacks: the WSGI server with sync views against the ASGI
+server with the async views (ASYNC_VIEWS=true).
+
+    # WSGI
+    gunicorn ecommerce_service.wsgi:application -w 2 --threads 8 -b 127.0.0.1:8000
+    python -m benchmarks.concurrency --url http://127.0.0.1:8000 --label wsgi --output wsgi.json
+
+    # ASGI
+    ASYNC_VIEWS=true gunicorn ecommerce_service.asgi:application -w 2 -k uvicorn.workers.UvicornWorker -b 127.0.0.1:8000
+    python -m benchmarks.concurrency --url http://127.0.0.1:8000 --label asgi --compare wsgi.json
+
+Seed the server's database first (e.g. import_products) and pass --token for
+the wishlist path.
+"""
+import argparse
+import http.client
+import json
+import random
+import sys
+import threading
+import time
+import urllib.parse
+
+from benchmarks.run import percentile
+
+CATEGORIES = ['Long-Life Eco', 'Reusable', 'Zero Waste', 'Organic', 'Upcycled']
+
+
+def build_paths(args, rng):
+    """Name -> callable returning the next path to request"""
+    product_ids = range(1, args.products + 1)
+    paths = {
+        'catalog': lambda: '/api/product/all?' + urllib.parse.urlencode({'limit': 24, 'category': rng.choice(CATEGORIES)}),
+        'product_detail': lambda: f'/api/product/byId/{rng.choice(product_ids)}',
+    }
+    if args.username:
+        paths['userinfo'] = lambda: f'/api/userinfo/{args.username}'
+    if args.token:
+        paths['wishlist'] = lambda: '/wishlist/'
+    return paths
+
+
+def worker(url, next_path, headers, deadline, timings, errors):
+    connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            connection.request('GET', next_path(), headers=headers)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            errors.append(1)
+            connection.close()
+            connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+            continue
+        timings.append((time.perf_counter() - started) * 1000)
+        if response.status >= 400:
+            errors.append(response.status)
+    connection.close()
+
+
+def run_level(url, next_path, headers, concurrency, duration):
+    timings, errors = [], []
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(target=worker, args=(url, next_path, headers, deadline, timings, errors))
+        for _ in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if not timings:
+        return {'rps': 0, 'p50_ms': None, 'p99_ms': None, 'errors': len(errors)}
+    return {
+        'rps': round(len(timings) / duration, 1),
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'errors': len(errors),
+    }
+
+
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    label, other = current['label'], baseline['label']
+    print(f"\n{'endpoint':<16}{'conc':>6}{f'rps {other} -> {label}':>30}{f'p99 ms {other} -> {label}':>34}")
+    for name, levels in current['endpoints'].items():
+        for level, result in levels.items():
+            before = baseline['endpoints'].get(name, {}).get(level)
+            if before is None:
+                continue
+            print(f"{name:<16}{level:>6}{before['rps']:>17} -> {result['rps']:<10}"
+                  f"{before['p99_ms'] or 0:>20.2f} -> {result['p99_ms'] or 0:.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--label', default='server', help='Name for this run, e.g. wsgi or asgi')
+    parser.add_argument('--concurrency', default='1,10,50', help='Comma separated client thread counts')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per endpoint and concurrency level')
+    parser.add_argument('--products', type=int, default=1000, help='Product ids 1..N to request')
+    parser.add_argument('--username', help='Username for /api/userinfo/')
+    parser.add_argument('--token', help='Bearer token for /wishlist/')
+    parser.add_argument('--only', action='append', help='Run only this endpoint; may be repeated')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--output', default='concurrency_output.json')
+    parser.add_argument('--compare', help='Earlier results file to print deltas against')
+    args = parser.parse_args(argv)
+
+    url = urllib.parse.urlsplit(args.url)
+    headers = {'Authorization': f'Bearer {args.token}'} if args.token else {}
+    levels = [int(level) for level in args.concurrency.split(',')]
+    rng = random.Random(args.seed)
+
+    results = {'label': args.label, 'url': args.url, 'duration': args.duration, 'endpoints': {}}
+    for name, next_path in build_paths(args, rng).items():
+        if args.only and name not in args.only:
+            continue
+        results['endpoints'][name] = {}
+        for level in levels:
+            result = results['endpoints'][name][str(level)] = run_level(url, next_path, headers, level, args.duration)
+            print(f"{name:<16} c={level:<4} {result['rps']:>9} req/s  p50 {result['p50_ms']} ms  "
+                  f"p99 {result['p99_ms']} ms  errors {result['errors']}")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
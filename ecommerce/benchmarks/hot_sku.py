@@ -0,0 +1,114 @@
+"""
+Checkout throughput on a single hot product.
+
+N worker threads, each with its own database connection, buy one unit of the
+same product until it sells out. The run reports orders per second and
+checks that exactly the starting stock was sold. Compare plain stock
+(--shards 0) with sharded stock:
+
+    DATABASE_URL=postgres://... python -m benchmarks.hot_sku --workers 1,8,32 --shards 0
+    DATABASE_URL=postgres://... python -m benchmarks.hot_sku --workers 1,8,32 --shards 16
+
+SQLite allows one writer at a time, so only PostgreSQL shows the scaling.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import django
+
+
+def run(workers, stock, shards):
+    from django.db import OperationalError, connection
+
+    from order_management.checkout import CheckoutError, place_order
+    from order_management.models import Order
+    from order_management.payloads import parse_checkout
+    from product_management import inventory
+    from product_management.models import Product
+
+    Order.objects.all().delete()
+    Product.objects.update_or_create(
+        product_id='hot', defaults={'product_name': 'Hot item', 'price': '10.00', 'stock': stock},
+    )
+    inventory.shard_product('hot', 0)  # reset any earlier shards
+    Product.objects.filter(product_id='hot').update(stock=stock)
+    inventory.shard_product('hot', shards)
+
+    payload = parse_checkout({
+        'email': 'bench@example.com', 'first_name': 'Bench', 'last_name': 'User', 'shipping_method': 'sd',
+        'items': [{'product_id': 'hot', 'quantity': 1}],
+    })
+    retries = [0] * workers
+
+    def worker(index):
+        try:
+            while True:
+                try:
+                    place_order(None, payload)
+                except CheckoutError:
+                    if not inventory_left():
+                        return
+                    retries[index] += 1
+                except OperationalError:
+                    # Lock timeout; may also come from the post-commit
+                    # counter update of an order that did go through
+                    retries[index] += 1
+        finally:
+            connection.close()
+
+    def inventory_left():
+        product = Product.objects.get(product_id='hot')
+        if not product.stock_shards:
+            return product.stock
+        return sum(product.shards.values_list('stock', flat=True))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(workers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    sold = Order.objects.count()
+    return {
+        'orders_per_s': round(sold / elapsed, 1),
+        'sold': sold,
+        'left': inventory_left(),
+        'retries': sum(retries),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', default='1,8,32', help='Comma separated worker thread counts')
+    parser.add_argument('--stock', type=int, default=2000)
+    parser.add_argument('--shards', type=int, default=16, help='0 keeps stock in the product row')
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce_service.settings')
+    django.setup()
+
+    from django.test.utils import setup_databases, setup_test_environment, teardown_databases
+
+    setup_test_environment(debug=False)
+    old_config = setup_databases(verbosity=0, interactive=False)
+    oversold = False
+    try:
+        for workers in (int(n) for n in args.workers.split(',')):
+            result = run(workers, args.stock, args.shards)
+            oversold |= result['sold'] != args.stock or result['left'] != 0
+            print(f"workers {workers:<4} shards {args.shards:<3} {result['orders_per_s']:>9} orders/s  "
+                  f"sold {result['sold']}/{args.stock}  left {result['left']}  retries {result['retries']}")
+    finally:
+        teardown_databases(old_config, verbosity=0)
+    if oversold:
+        print('Sold count does not match the starting stock')
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""
+Endpoint latency benchmark.
+
+Seeds a synthetic dataset into a throwaway test database (SQLite by default,
+or whatever DATABASE_URL points at), drives each endpoint through the Django
+test client and records p50/p95 latency and SQL query counts.
+
+    python -m benchmarks.run --products 10000 --orders 5000 --output before.json
+    python -m benchmarks.run --products 10000 --orders 5000 --compare before.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+import django
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def build_scenarios(client, dataset, rng, headers):
+    """Name -> callable issuing one request; together they cover the main read and write paths"""
+    from benchmarks.seed import CATEGORIES
+
+    product_ids = dataset['product_ids']
+
+    def checkout():
+        items = [{'product_id': pid, 'quantity': 1} for pid in rng.sample(product_ids, min(3, len(product_ids)))]
+        payload = {
+            'email': 'bench@example.com', 'first_name': 'Bench', 'last_name': 'User',
+            'address': '1 Bench Road', 'shipping_method': 'sd', 'payment_method': 'cod', 'items': items,
+        }
+        return client.post('/api/orders/checkout/', payload, content_type='application/json', **headers)
+
+    return {
+        'catalog': lambda: client.get('/api/product/all', {'limit': 24, 'category': rng.choice(CATEGORIES)}),
+        'product_detail': lambda: client.get(f'/api/product/byId/{rng.choice(product_ids)}'),
+        'checkout': checkout,
+        'order_list': lambda: client.get('/api/orders/', **headers),
+        'wishlist': lambda: client.get('/wishlist/', **headers),
+        'summarize': lambda: client.get('/api/summarize'),
+    }
+
+
+def measure(request, iterations, warmup, cold_cache):
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    for _ in range(warmup):
+        request()
+
+    timings, queries, statuses = [], [], set()
+    for _ in range(iterations):
+        if cold_cache:
+            cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = request()
+            elapsed = time.perf_counter() - started
+        timings.append(elapsed * 1000)
+        queries.append(len(captured))
+        statuses.add(response.status_code)
+
+    return {
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'mean_ms': round(statistics.mean(timings), 3),
+        'queries': max(queries),
+        'statuses': sorted(statuses),
+    }
+
+
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\n{'endpoint':<16}{'p50 ms':>26}{'p95 ms':>26}{'queries':>12}")
+    for name, result in current['endpoints'].items():
+        before = baseline['endpoints'].get(name)
+        if before is None:
+            continue
+
+        def cell(key):
+            change = (result[key] - before[key]) / before[key] * 100 if before[key] else 0
+            return f"{before[key]:.2f} -> {result[key]:.2f} ({change:+.0f}%)"
+
+        print(f"{name:<16}{cell('p50_ms'):>26}{cell('p95_ms'):>26}{before['queries']:>6} -> {result['queries']:<3}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--orders', type=int, default=500)
+    parser.add_argument('--items-per-order', type=int, default=3)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--only', action='append', help='Run only this endpoint; may be repeated')
+    parser.add_argument('--cold-cache', action='store_true', help='Clear the cache before every request')
+    parser.add_argument('--output', default='bench_output.json')
+    parser.add_argument('--compare', help='Earlier results file to print deltas against')
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce_service.settings')
+    django.setup()
+
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import setup_databases, setup_test_environment, teardown_databases
+
+    from benchmarks.seed import seed
+    from user_management.authentication import issue_token
+    from user_management.models import CustomerUser
+
+    setup_test_environment(debug=False)
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        started = time.perf_counter()
+        dataset = seed(args.products, args.users, args.orders, args.items_per_order, seed=args.seed)
+        seed_seconds = time.perf_counter() - started
+
+        rng = random.Random(args.seed)
+        user = CustomerUser.objects.get(id=dataset['user_ids'][0])
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {issue_token(user)}'}
+        scenarios = build_scenarios(Client(), dataset, rng, headers)
+
+        results = {
+            'meta': {
+                'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'dataset': {
+                    'products': args.products, 'users': args.users, 'orders': args.orders,
+                    'items_per_order': args.items_per_order, 'seed': args.seed,
+                },
+                'seed_seconds': round(seed_seconds, 3),
+                'iterations': args.iterations,
+                'cold_cache': args.cold_cache,
+            },
+            'endpoints': {},
+        }
+        for name, request in scenarios.items():
+            if args.only and name not in args.only:
+                continue
+            results['endpoints'][name] = result = measure(request, args.iterations, args.warmup, args.cold_cache)
+            print(f"{name:<16} p50 {result['p50_ms']:8.2f} ms  p95 {result['p95_ms']:8.2f} ms  "
+                  f"queries {result['queries']:3}  status {result['statuses']}")
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Synthetic dataset for the benchmark suite.
+
+Everything is written with bulk_create, so seeding 100k products takes
+seconds. The random generator is seeded, so two runs with the same
+arguments produce the same rows.
+"""
+import random
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from order_management import customer_stats
+from order_management.models import Order, OrderItem
+from product_management import stats
+from product_management.cache import bump_version
+from product_management.models import Product
+from user_management.models import CustomerUser
+
+CATEGORIES = ['Long-Life Eco', 'Reusable', 'Zero Waste', 'Organic', 'Upcycled']
+WORDS = ['bamboo', 'cotton', 'steel', 'glass', 'hemp', 'cork', 'jute', 'tote', 'bottle', 'brush', 'straw', 'wrap']
+BENCH_PASSWORD = 'bench-pass-123'
+BATCH = 2000
+
+
+def seed(products=1000, users=100, orders=500, items_per_order=3, wishlist_size=10, seed=1234):
+    rng = random.Random(seed)
+    with transaction.atomic():
+        Product.objects.bulk_create([
+            Product(
+                product_id=str(i + 1),  # numeric, as /api/product/byId/<int> expects
+                product_name=' '.join(rng.sample(WORDS, 3)).title(),
+                price=Decimal(rng.randrange(100, 100000)) / 100,
+                stock=1_000_000,
+                category=rng.choice(CATEGORIES),
+                is_new_release=rng.random() < 0.2,
+                is_trending=rng.random() < 0.2,
+                rating=str(rng.randrange(6)),
+                description=' '.join(rng.choices(WORDS, k=8)),
+                detail=' '.join(rng.choices(WORDS, k=12)),
+                eco_point=rng.randrange(1, 200),
+            )
+            for i in range(products)
+        ], batch_size=BATCH)
+        product_rows = list(Product.objects.values_list('product_id', 'product_name', 'price'))
+
+        password = make_password(BENCH_PASSWORD)  # hash once, reuse for every user
+        CustomerUser.objects.bulk_create([
+            CustomerUser(username=f'bench{i}', email=f'bench{i}@example.com', password=password, phone_number='0800000000')
+            for i in range(users)
+        ], batch_size=BATCH)
+        user_ids = list(CustomerUser.objects.filter(username__startswith='bench').values_list('id', flat=True))
+
+        statuses = [choice for choice, _ in Order.STATUS_CHOICES]
+        for start in range(0, orders, BATCH):
+            batch = [
+                Order(
+                    user_id=user_ids[n % len(user_ids)] if user_ids else None,
+                    email='bench@example.com',
+                    first_name='Bench',
+                    last_name='User',
+                    status=rng.choice(statuses),
+                    shipping_method='sd',
+                    payment_method='cod',
+                )
+                for n in range(start, min(start + BATCH, orders))
+            ]
+            Order.objects.bulk_create(batch)
+            items = []
+            for order in batch:
+                total = Order.SHIPPING_COSTS['sd']
+                for product_id, product_name, price in rng.sample(product_rows, min(items_per_order, len(product_rows))):
+                    quantity = rng.randrange(1, 4)
+                    total += price * quantity
+                    items.append(OrderItem(order=order, product_id=product_id, product_name=product_name or '',
+                                           quantity=quantity, price=price))
+                order.total_amount = total
+            OrderItem.objects.bulk_create(items, batch_size=BATCH)
+            Order.objects.bulk_update(batch, ['total_amount'], batch_size=BATCH)
+
+        Through = CustomerUser.wishlist.through
+        Through.objects.bulk_create([
+            Through(customeruser_id=user_id, product_id=product_id)
+            for user_id in user_ids
+            for product_id, _, _ in rng.sample(product_rows, min(wishlist_size, len(product_rows)))
+        ], batch_size=BATCH)
+
+    # Bulk writes send no signals
+    stats.reconcile()
+    customer_stats.backfill()
+    bump_version()
+    return {'product_ids': [row[0] for row in product_rows], 'user_ids': user_ids}
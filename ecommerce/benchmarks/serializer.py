@@ -0,0 +1,103 @@
+"""
+Product serialization: ProductSerializer + JSONRenderer against the fast path
+(values() rows, format_product and render_rows).
+
+For each size, both paths render the same products from a seeded throwaway
+database. The run checks that the bytes are identical, then reports the
+median time and the peak memory traced while rendering. The streamed path
+consumes the chunks one at a time, as StreamingHttpResponse would:
+
+    python -m benchmarks.serializer --products 20000 --sizes 24,100,20000
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+import django
+
+
+def drf(queryset):
+    from rest_framework.renderers import JSONRenderer
+
+    from product_management.serializers import ProductSerializer
+
+    yield JSONRenderer().render(ProductSerializer(queryset, many=True).data)
+
+
+def fast(queryset):
+    from product_management.serializers import product_rows, render_rows
+
+    return render_rows(product_rows(queryset))
+
+
+def timed(render, queryset, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in render(queryset.all()):
+            pass
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def peak_memory(render, queryset):
+    tracemalloc.start()
+    try:
+        for _ in render(queryset.all()):
+            pass
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=20000)
+    parser.add_argument('--sizes', default='24,100,20000', help='Comma separated product counts to render')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', default='serializer_output.json')
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce_service.settings')
+    django.setup()
+
+    from django.test.utils import setup_databases, setup_test_environment, teardown_databases
+
+    from benchmarks.seed import seed
+    from product_management.models import Product
+
+    setup_test_environment(debug=False)
+    old_config = setup_databases(verbosity=0, interactive=False)
+    results = {'products': args.products, 'sizes': {}}
+    try:
+        seed(products=args.products, users=0, orders=0)
+        for size in (int(n) for n in args.sizes.split(',')):
+            queryset = Product.objects.order_by('product_id')[:size]
+            if b''.join(drf(queryset.all())) != b''.join(fast(queryset.all())):
+                print(f'Output differs for {size} products')
+                return 1
+            result = {}
+            for name, render in (('drf', drf), ('fast', fast)):
+                result[name] = {
+                    'ms': round(timed(render, queryset, args.repeat), 2),
+                    'peak_kib': round(peak_memory(render, queryset) / 1024),
+                }
+            result['speedup'] = round(result['drf']['ms'] / result['fast']['ms'], 2)
+            results['sizes'][size] = result
+            print(f"{size:>7} products  drf {result['drf']['ms']:>9} ms {result['drf']['peak_kib']:>8} KiB  "
+                  f"fast {result['fast']['ms']:>9} ms {result['fast']['peak_kib']:>8} KiB  "
+                  f"x{result['speedup']}")
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
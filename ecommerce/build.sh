@@ -84,4 +84,5 @@ else:
 END
 
 # Load initial data
-python manage.py loaddata products.json users.json || echo "Could not load fixtures" 
\ No newline at end of file
+python manage.py import_products product_management/fixtures/products.json || echo "Could not import products"
+python manage.py loaddata users.json || echo "Could not load fixtures" 
\ No newline at end of file
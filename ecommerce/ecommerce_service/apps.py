@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class EcommerceServiceConfig(AppConfig):
+    name = 'ecommerce_service'
+
+    def ready(self):
+        # Registers the deploy checks
+        from ecommerce_service import checks  # noqa: F401
@@ -0,0 +1,31 @@
+"""
+Deploy checks, run by ``manage.py check --deploy`` (and so by prepare_release).
+"""
+from django.conf import settings
+from django.core import checks
+
+# Backends whose entries never leave the process that wrote them
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    The product cache version and revoked token ids live in the default cache;
+    with a per-process backend a bump or revocation only reaches the worker
+    that made it, and the others keep serving stale entries.
+    """
+    backend = settings.CACHES['default']['BACKEND']
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [checks.Warning(
+        f'The default cache ({backend}) is not shared between processes.',
+        hint=(
+            'Set CACHE_BACKEND to a shared backend, e.g. '
+            'django.core.cache.backends.db.DatabaseCache with CACHE_LOCATION naming its table.'
+        ),
+        id='ecommerce_service.W001',
+    )]
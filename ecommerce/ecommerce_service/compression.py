@@ -0,0 +1,171 @@
+"""
+Response compression with gzip or brotli.
+
+CompressionMiddleware picks the encoding from Accept-Encoding (brotli on a
+tie) and compresses JSON, NDJSON and CSV responses:
+- A response that carries precompressed bodies (see precompress() and
+  product_management.cache) is sent as stored, so a cache hit is neither
+  serialized nor compressed again.
+- Other responses are compressed on the fly at a cheaper level.
+- Streaming responses are compressed chunk by chunk, so the body is never
+  held in memory whole.
+
+Like Django's GZipMiddleware, a strong ETag is made weak once the body is
+compressed; conditional requests compare ETags weakly.
+"""
+import gzip
+import zlib
+
+import brotli
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.cache import patch_vary_headers
+
+# In order of preference when the client accepts both equally
+ENCODINGS = ('br', 'gzip')
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/csv')
+# Below this many bytes the headers cost more than compression saves
+MIN_LENGTH = 200
+# On-the-fly levels trade ratio for CPU; stored bodies are compressed once, so harder
+LEVELS = {'br': 5, 'gzip': 6}
+PRECOMPRESS_LEVELS = {'br': 9, 'gzip': 9}
+
+
+def compress(body, encoding, level=None):
+    level = LEVELS[encoding] if level is None else level
+    if encoding == 'br':
+        return brotli.compress(body, quality=level)
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def precompress(body):
+    """Encoding -> compressed ``body``, for responses served many times over"""
+    if len(body) < MIN_LENGTH:
+        return {}
+    return {encoding: compress(body, encoding, PRECOMPRESS_LEVELS[encoding]) for encoding in ENCODINGS}
+
+
+class StreamCompressor:
+    """Compress a body piece by piece"""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == 'br':
+            self.compressor = brotli.Compressor(quality=LEVELS['br'])
+        else:
+            # wbits 16 + MAX_WBITS writes the gzip header and trailer
+            self.compressor = zlib.compressobj(LEVELS['gzip'], zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data):
+        # Flushed, so the client can decode each chunk as it arrives
+        if self.encoding == 'br':
+            return self.compressor.process(data) + self.compressor.flush()
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self.compressor.finish()
+        return self.compressor.flush()
+
+
+def compress_stream(chunks, encoding):
+    compressor = StreamCompressor(encoding)
+    for data in chunks:
+        if data:
+            yield compressor.chunk(data)
+    yield compressor.finish()
+
+
+async def acompress_stream(chunks, encoding):
+    compressor = StreamCompressor(encoding)
+    async for data in chunks:
+        if data:
+            yield compressor.chunk(data)
+    yield compressor.finish()
+
+
+def accepted_encodings(header):
+    """Accept-Encoding as coding -> q-value"""
+    qualities = {}
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    return qualities
+
+
+def choose_encoding(header):
+    qualities = accepted_encodings(header)
+    best, best_quality = None, 0.0
+    for encoding in ENCODINGS:
+        quality = qualities.get(encoding, qualities.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compressible(response):
+    content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+    return (
+        response.status_code == 200
+        and content_type in COMPRESSIBLE_TYPES
+        and not response.has_header('Content-Encoding')
+    )
+
+
+class CompressionMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        if not compressible(response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.headers.get('Accept-Encoding', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = acompress_stream(response.streaming_content, encoding)
+            else:
+                response.streaming_content = compress_stream(response.streaming_content, encoding)
+            del response['Content-Length']
+        else:
+            body = getattr(response, 'precompressed', {}).get(encoding)
+            if body is None:
+                if len(response.content) < MIN_LENGTH:
+                    return response
+                body = compress(response.content, encoding)
+                if len(body) >= len(response.content):
+                    return response
+            response.content = body
+            response.headers['Content-Length'] = str(len(body))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
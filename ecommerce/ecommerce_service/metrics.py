@@ -0,0 +1,223 @@
+"""
+Per-endpoint request and SQL metrics in Prometheus text format.
+
+MetricsMiddleware records, per resolved URL name, the request count, a latency
+histogram, SQL query count and time (through a connection execute_wrapper) and
+response bytes. Each worker process aggregates in memory and periodically
+writes a snapshot to METRICS_DIR/<pid>.json; the /metrics view sums the
+snapshots of every worker, so gunicorn workers report as one service.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden, HttpResponseNotFound
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+FLUSH_INTERVAL = 5  # seconds
+
+DESCRIPTIONS = {
+    'http_requests_total': ('counter', 'Requests handled, by view, method and status'),
+    'http_request_duration_seconds': ('histogram', 'Request latency by view'),
+    'http_response_bytes_total': ('counter', 'Response body bytes by view (streamed bodies excluded)'),
+    'db_queries_total': ('counter', 'SQL queries executed by view'),
+    'db_query_duration_seconds_total': ('counter', 'Time spent in SQL by view'),
+    'db_queries_per_request': ('histogram', 'SQL queries per request by view'),
+}
+
+
+def metrics_dir():
+    return getattr(settings, 'METRICS_DIR', None) or os.path.join(tempfile.gettempdir(), 'ecoreach-metrics')
+
+
+class Registry:
+    """In-process counters and histograms keyed by (metric, labels)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.last_flush = 0.0
+
+    def inc(self, name, labels, value=1):
+        key = (name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value, buckets):
+        key = (name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = {'buckets': [0] * len(buckets), 'sum': 0, 'count': 0}
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                histogram['buckets'][i] += 1
+        histogram['sum'] += value
+        histogram['count'] += 1
+
+    def record(self, view, method, status, duration, queries, query_time, size):
+        with self.lock:
+            self.inc('http_requests_total', (('view', view), ('method', method), ('status', str(status))))
+            self.observe('http_request_duration_seconds', (('view', view),), duration, LATENCY_BUCKETS)
+            self.inc('db_queries_total', (('view', view),), queries)
+            self.inc('db_query_duration_seconds_total', (('view', view),), query_time)
+            self.observe('db_queries_per_request', (('view', view),), queries, QUERY_BUCKETS)
+            if size is not None:
+                self.inc('http_response_bytes_total', (('view', view),), size)
+            due = time.monotonic() - self.last_flush >= FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, list(labels), dict(h, buckets=list(h['buckets']))]
+                               for (name, labels), h in self.histograms.items()],
+            }
+
+    def flush(self):
+        """Atomically replace this worker's snapshot file"""
+        directory = metrics_dir()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{os.getpid()}.json')
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+        self.last_flush = time.monotonic()
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+
+registry = Registry()
+
+
+def collect():
+    """Sum the snapshots written by every worker, including workers that have exited"""
+    counters, histograms = {}, {}
+    directory = metrics_dir()
+    for filename in os.listdir(directory) if os.path.isdir(directory) else []:
+        if not filename.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for name, labels, value in data['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, h in data['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            total = histograms.setdefault(key, {'buckets': [0] * len(h['buckets']), 'sum': 0, 'count': 0})
+            total['buckets'] = [a + b for a, b in zip(total['buckets'], h['buckets'])]
+            total['sum'] += h['sum']
+            total['count'] += h['count']
+    return counters, histograms
+
+
+def format_labels(labels):
+    escaped = (
+        (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+def render():
+    counters, histograms = collect()
+    lines = []
+    for name, (kind, help_text) in DESCRIPTIONS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'counter':
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{format_labels(labels)} {value}')
+            continue
+        buckets = LATENCY_BUCKETS if name == 'http_request_duration_seconds' else QUERY_BUCKETS
+        for (metric, labels), h in sorted(histograms.items()):
+            if metric != name:
+                continue
+            for bound, count in zip(buckets, h['buckets']):
+                lines.append(f'{name}_bucket{format_labels(labels + (("le", bound),))} {count}')
+            lines.append(f'{name}_bucket{format_labels(labels + (("le", "+Inf"),))} {h["count"]}')
+            lines.append(f'{name}_sum{format_labels(labels)} {h["sum"]}')
+            lines.append(f'{name}_count{format_labels(labels)} {h["count"]}')
+    return '\n'.join(lines) + '\n'
+
+
+class QueryTimer:
+    """execute_wrapper that counts queries and the time spent in them"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timer = QueryTimer()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        self.record(request, response, started, timer)
+        return response
+
+    async def __acall__(self, request):
+        timer = QueryTimer()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = await self.get_response(request)
+        self.record(request, response, started, timer)
+        return response
+
+    def record(self, request, response, started, timer):
+        duration = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name if match else None) or 'unresolved'
+        size = None if response.streaming else len(response.content)
+        registry.record(view, request.method, response.status_code, duration, timer.count, timer.duration, size)
+
+
+def metrics_view(request):
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token:
+        # Never served unauthenticated: without a token the endpoint doesn't exist
+        return HttpResponseNotFound()
+    if request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponseForbidden()
+    registry.flush()
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
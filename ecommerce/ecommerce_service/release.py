@@ -0,0 +1,62 @@
+"""
+Release fingerprint for fast boots.
+
+The one-time work of a deploy is done by ``manage.py prepare_release``:
+deploy checks, migrations, the cache table, collectstatic and fixtures. That
+command records a fingerprint of everything the work depends on:
+- the migration, fixture and static source files;
+- requirements.txt;
+- the database and cache backend the service points at.
+
+On boot, the serve path (serve.sh) runs ``python -m ecommerce_service.release``
+first. It recomputes the fingerprint without importing Django and exits 0
+when it matches the recorded one, so a restart goes straight to gunicorn.
+"""
+import hashlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+MARKER = Path(os.environ.get('RELEASE_MARKER') or BASE_DIR / '.release')
+# collectstatic output; the fingerprint only matches while it is in place
+STATIC_MANIFEST = BASE_DIR / 'staticfiles' / 'staticfiles.json'
+INPUTS = ('*/migrations/*.py', '*/fixtures/*.json', '*/static/**/*', 'requirements.txt')
+ENVIRONMENT = ('DATABASE_URL', 'CACHE_BACKEND', 'CACHE_LOCATION')
+
+
+def fingerprint():
+    digest = hashlib.sha256()
+    paths = sorted({path for pattern in INPUTS for path in BASE_DIR.glob(pattern) if path.is_file()})
+    for path in paths:
+        digest.update(str(path.relative_to(BASE_DIR)).encode())
+        digest.update(hashlib.sha256(path.read_bytes()).digest())
+    for name in ENVIRONMENT:
+        digest.update(f'{name}={os.environ.get(name, "")}'.encode())
+    return digest.hexdigest()
+
+
+def recorded():
+    try:
+        return json.loads(MARKER.read_text())['fingerprint']
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def record(value):
+    MARKER.write_text(json.dumps({'fingerprint': value, 'prepared_at': time.time()}))
+
+
+def is_current():
+    """True when prepare_release has run for exactly this code, data and database"""
+    return STATIC_MANIFEST.exists() and recorded() == fingerprint()
+
+
+if __name__ == '__main__':
+    if is_current():
+        print('Release is prepared; skipping prepare_release')
+        sys.exit(0)
+    print('Release changed since the last prepare_release')
+    sys.exit(1)
@@ -0,0 +1,116 @@
+"""
+Read-replica routing.
+
+When DATABASE_REPLICA_URL is set, the views named in REPLICA_VIEWS read from
+the "replica" database; everything else, and every write, uses "default".
+
+ReplicaMiddleware decides per request. A request is only routed to the
+replica if it is a GET or HEAD, its resolved URL name is in REPLICA_VIEWS and
+it is not pinned to the primary. After a successful write, a client stays
+pinned for REPLICA_STICKY_SECONDS, so it reads its own writes rather than a
+replica that has not caught up yet. The pin is a cookie for browsers. For
+API clients that do not send cookies, the response also carries a
+``Read-Primary-For: <seconds>`` header, and the client echoes it back as
+``Read-Primary`` to stay pinned.
+
+Entries of the shared product cache are built inside primary(): an entry
+built from a lagging replica would be served under the new cache version
+until it expires.
+"""
+import contextlib
+import contextvars
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA = 'replica'
+COOKIE = 'read_primary'
+REQUEST_HEADER = 'Read-Primary'
+RESPONSE_HEADER = 'Read-Primary-For'
+SAFE_METHODS = ('GET', 'HEAD')
+
+_use_replica = contextvars.ContextVar('use_replica', default=False)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+@contextlib.contextmanager
+def primary():
+    """Read from the primary inside the block, whatever the request was routed to"""
+    token = _use_replica.set(False)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and replica_configured():
+            return REPLICA
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+
+def pinned_to_primary(request):
+    if REQUEST_HEADER in request.headers:
+        return True
+    try:
+        return float(request.COOKIES.get(COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+class ReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _use_replica.set(False)
+        try:
+            response = self.get_response(request)
+        finally:
+            _use_replica.reset(token)
+        return self.pin_after_write(request, response)
+
+    async def __acall__(self, request):
+        token = _use_replica.set(False)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _use_replica.reset(token)
+        return self.pin_after_write(request, response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # The URL name is only known once the URL has been resolved
+        if (
+            replica_configured()
+            and request.method in SAFE_METHODS
+            and request.resolver_match.url_name in settings.REPLICA_VIEWS
+            and not pinned_to_primary(request)
+        ):
+            _use_replica.set(True)
+
+    def pin_after_write(self, request, response):
+        if replica_configured() and request.method not in SAFE_METHODS and response.status_code < 400:
+            seconds = settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(COOKIE, str(time.time() + seconds), max_age=seconds, httponly=True, samesite='Lax')
+            response[RESPONSE_HEADER] = str(seconds)
+        return response
@@ -0,0 +1,39 @@
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+
+from ecommerce_service.codecs import dumps
+
+
+def api_json_response(data, status=200, **kwargs):
+    # Same codec as the API's default renderer, so plain Django views (e.g. the
+    # async views) produce byte-identical bodies to their APIView twins
+    return HttpResponse(dumps(data), status=status, content_type='application/json', **kwargs)
+
+
+async def aiterate(chunks):
+    """
+    ``chunks`` as an async iterator. Each chunk is produced in the sync thread,
+    one sync_to_async call per chunk, so a database cursor behind ``chunks``
+    stays on its connection and only one chunk is in memory at a time.
+    """
+    chunks = iter(chunks)
+    next_chunk = sync_to_async(next)
+    try:
+        while (chunk := await next_chunk(chunks, None)) is not None:
+            yield chunk
+    finally:
+        # Also runs when the client disconnects, so the cursor is released
+        if hasattr(chunks, 'close'):
+            await sync_to_async(chunks.close)()
+
+
+def streaming_response(request, chunks, **kwargs):
+    """
+    A StreamingHttpResponse of ``chunks`` that streams under both servers.
+    Under ASGI Django reads a sync iterator whole before sending it, so there
+    the chunks are handed over as an async iterator instead.
+    """
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        chunks = aiterate(chunks)
+    return StreamingHttpResponse(chunks, **kwargs)
@@ -0,0 +1,389 @@
+import datetime
+import gzip
+import io
+import json
+import os
+import re
+import tempfile
+import time
+import uuid
+from decimal import Decimal
+from unittest import mock
+from django.db import connection, router
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import resolve
+from django.utils import timezone
+from benchmarks.seed import seed
+from django.core.cache import cache
+from django.core.cache.backends.db import DatabaseCache
+from django.core.management import call_command
+from ecommerce_service import checks, codecs, compression, metrics, release, replicas
+from ecommerce_service.warmup import warm_up
+from job_management.models import Job
+from order_management.models import CustomerStats, IdempotencyKey, Order, OrderItem
+from product_management.models import Product
+from product_management import cache as product_cache
+from product_management.views import catalog_queryset
+from user_management.models import CustomerUser
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(METRICS_DIR=self.tmp.name, METRICS_TOKEN='s3cret')
+        override.enable()
+        self.addCleanup(override.disable)
+        metrics.registry.reset()
+        Product.objects.create(product_id='1', product_name='Tote', price='80.00')
+
+    def scrape(self):
+        return self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer s3cret')
+
+    def test_records_requests_per_view(self):
+        self.client.get('/api/product/byId/1')
+        self.client.get('/api/product/byId/1')
+        body = self.scrape().content.decode()
+        self.assertIn('http_requests_total{view="product_byid",method="GET",status="200"} 2', body)
+        self.assertIn('http_request_duration_seconds_count{view="product_byid"} 2', body)
+        self.assertIn('db_queries_per_request_bucket{view="product_byid",le="+Inf"} 2', body)
+        self.assertIn('http_response_bytes_total{view="product_byid"}', body)
+
+    def test_sums_snapshots_from_other_workers(self):
+        other = {
+            'counters': [['http_requests_total', [['view', 'summarize'], ['method', 'GET'], ['status', '200']], 5]],
+            'histograms': [],
+        }
+        with open(os.path.join(self.tmp.name, '999999.json'), 'w') as f:
+            json.dump(other, f)
+        self.client.get('/api/summarize')
+        body = self.scrape().content.decode()
+        self.assertIn('http_requests_total{view="summarize",method="GET",status="200"} 6', body)
+
+    def test_token_required(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.assertEqual(self.scrape().status_code, 200)
+
+    def test_not_served_without_a_token(self):
+        with override_settings(METRICS_TOKEN=''):
+            self.assertEqual(self.client.get('/metrics').status_code, 404)
+
+
+
+# Tables that grow with traffic; a full scan or a sort over one of them is a regression
+LARGE_TABLES = [
+    model._meta.db_table
+    for model in (Product, Order, OrderItem, CustomerUser, CustomerUser.wishlist.through, Job, IdempotencyKey, CustomerStats)
+]
+
+
+def plan_problems(plan, allow_sort=False):
+    """Full table scans and sorts on LARGE_TABLES in an EXPLAIN (PostgreSQL) or EXPLAIN QUERY PLAN (SQLite) plan"""
+    problems = []
+    for line in plan.splitlines():
+        if connection.vendor == 'postgresql':
+            match = re.search(r'Seq Scan on (\w+)', line)
+            if match and match.group(1) in LARGE_TABLES:
+                problems.append(line.strip())
+            if not allow_sort and re.search(r'(^|->)\s*(Incremental )?Sort\b', line.strip()):
+                problems.append(line.strip())
+        else:
+            match = re.search(r'\bSCAN (\w+)(?! USING)', line)
+            if match and match.group(1) in LARGE_TABLES:
+                problems.append(line.strip())
+            if not allow_sort and 'USE TEMP B-TREE FOR ORDER BY' in line:
+                problems.append(line.strip())
+    return problems
+
+
+class QueryPlanTests(TestCase):
+    """
+    EXPLAIN the ORM query behind each endpoint against a seeded database and
+    fail when it needs a full scan or a sort of a large table.
+
+    On PostgreSQL sequential scans are disabled for the test, so any that
+    remains in a plan means there is no index the query can use.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        dataset = seed(products=3000, users=200, orders=2000, items_per_order=3, wishlist_size=10, seed=7)
+        cls.user = CustomerUser.objects.get(id=dataset['user_ids'][5])
+        cls.order_ids = list(Order.objects.filter(user=cls.user).values_list('id', flat=True))
+        now = timezone.now()
+        Job.objects.bulk_create(
+            [Job(name='done.job', status='done', finished_at=now) for _ in range(2000)]
+            + [Job(name='queued.job') for _ in range(5)]
+        )
+        IdempotencyKey.objects.bulk_create([
+            IdempotencyKey(owner=f'user:{i}', key=f'key-{i}', request_hash='x', expires_at=now)
+            for i in range(2000)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def assertUsesIndexes(self, queryset, allow_sort=False):
+        plan = queryset.explain()
+        problems = plan_problems(plan, allow_sort)
+        self.assertFalse(problems, f'\n{queryset.query}\n{plan}')
+
+    def test_harness_reports_scans_and_sorts(self):
+        self.assertTrue(plan_problems(Order.objects.filter(email='bench@example.com').explain()))
+        self.assertTrue(plan_problems(Product.objects.filter(product_id__in=['1', '2']).order_by('price').explain()))
+
+    def test_catalog(self):
+        for params in ({}, {'category': 'Reusable'}, {'is_trending': 'true'}, {'is_new_release': 'true'},
+                       {'category': 'Organic', 'is_trending': 'true'}):
+            with self.subTest(params=params):
+                queryset = catalog_queryset(params).order_by('product_id')
+                self.assertUsesIndexes(queryset[:25])
+                self.assertUsesIndexes(queryset.filter(product_id__gt='500')[:25])
+
+    def test_product_lookups(self):
+        self.assertUsesIndexes(Product.objects.filter(product_id='42'))
+        self.assertUsesIndexes(Product.objects.filter(product_id__in=['1', '2', '3']))
+
+    def test_user_info_and_wishlist(self):
+        self.assertUsesIndexes(CustomerUser.objects.filter(username='bench5'))
+        self.assertUsesIndexes(self.user.wishlist.values('product_id', 'product_name', 'price'))
+
+    def test_order_history(self):
+        self.assertUsesIndexes(Order.objects.filter(user=self.user))
+        self.assertUsesIndexes(OrderItem.objects.filter(order_id=self.order_ids[0]))
+        # The prefetch sorts the items of one page of orders, not the table
+        self.assertUsesIndexes(OrderItem.objects.filter(order_id__in=self.order_ids), allow_sort=True)
+
+    def test_job_claim_and_idempotency_lookup(self):
+        self.assertUsesIndexes(
+            Job.objects.filter(status='queued', run_at__lte=timezone.now()).order_by('run_at').values('id')[:10]
+        )
+        self.assertUsesIndexes(IdempotencyKey.objects.filter(owner='user:5', key='key-5'))
+        self.assertUsesIndexes(IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).values('pk')[:1000])
+
+    def test_eco_leaderboard(self):
+        from order_management.customer_stats import leaderboard
+
+        self.assertTrue(CustomerStats.objects.filter(eco_points__gt=0).exists())
+        self.assertUsesIndexes(
+            CustomerStats.objects.filter(eco_points__gt=0).order_by('-eco_points', 'user_id').values('user_id')[:10]
+        )
+        self.assertEqual(len(leaderboard(10)), 10)
+
+
+@mock.patch.object(replicas, 'replica_configured', lambda: True)
+class ReplicaRoutingTests(SimpleTestCase):
+    """Runs the middleware around a stand-in view that reports where a Product read would go"""
+
+    def handle(self, method, path, status=200, read=lambda: router.db_for_read(Product), **headers):
+        request = getattr(RequestFactory(), method)(path, **headers)
+        request.resolver_match = resolve(path)
+        seen = {}
+
+        def view(request):
+            middleware.process_view(request, None, (), {})
+            seen['db'] = read()
+            return HttpResponse(status=status)
+
+        middleware = replicas.ReplicaMiddleware(view)
+        response = middleware(request)
+        return seen['db'], response
+
+    def test_listed_reads_go_to_replica(self):
+        for path in ('/api/product/all', '/api/product/byId/1', '/api/product/byIds', '/api/summarize', '/api/userinfo/eco'):
+            with self.subTest(path=path):
+                self.assertEqual(self.handle('get', path)[0], 'replica')
+        self.assertEqual(router.db_for_read(Product), 'default')  # reset after the request
+
+    def test_product_cache_entries_are_built_from_primary(self):
+        key = product_cache.make_key('replica-test')
+        self.addCleanup(cache.delete, key)
+
+        def read():
+            return codecs.loads(product_cache.get_or_build(key, lambda: router.db_for_read(Product))['body'])
+
+        self.assertEqual(self.handle('get', '/api/product/all', read=read)[0], 'default')
+
+    def test_writes_and_other_views_use_primary(self):
+        self.assertEqual(self.handle('get', '/wishlist/')[0], 'default')
+        self.assertEqual(self.handle('get', '/api/orders/')[0], 'default')
+        self.assertEqual(self.handle('post', '/api/product/byIds')[0], 'default')
+        self.assertEqual(router.db_for_write(Product), 'default')
+
+    def test_write_pins_client_to_primary(self):
+        _, response = self.handle('post', '/api/orders/checkout/', status=201)
+        self.assertEqual(response['Read-Primary-For'], '10')
+        cookie = response.cookies['read_primary']
+        self.assertEqual(cookie['max-age'], 10)
+
+        self.assertEqual(self.handle('get', '/api/product/all', HTTP_COOKIE=f'read_primary={cookie.value}')[0], 'default')
+        self.assertEqual(self.handle('get', '/api/product/all', HTTP_READ_PRIMARY='1')[0], 'default')
+        expired = f'read_primary={time.time() - 1}'
+        self.assertEqual(self.handle('get', '/api/product/all', HTTP_COOKIE=expired)[0], 'replica')
+
+    def test_failed_write_does_not_pin(self):
+        _, response = self.handle('post', '/api/orders/checkout/', status=400)
+        self.assertNotIn('read_primary', response.cookies)
+        self.assertFalse(response.has_header('Read-Primary-For'))
+
+
+@mock.patch.object(replicas, 'replica_configured', lambda: False)
+class ReplicaDisabledTests(TestCase):
+    def test_no_replica_no_pinning(self):
+        response = self.client.post('/api/register/', {
+            'username': 'eco', 'email': 'eco@example.com', 'password': 'secret-pass-123',
+            'confirm_password': 'secret-pass-123', 'first_name': 'Eco', 'last_name': 'User', 'phone_number': '1',
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('read_primary', response.cookies)
+        self.assertEqual(router.db_for_read(Product), 'default')
+
+
+class ReleaseTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        marker = mock.patch.object(release, 'MARKER', release.Path(self.tmp.name) / '.release')
+        manifest = mock.patch.object(release, 'STATIC_MANIFEST', release.Path(self.tmp.name) / 'staticfiles.json')
+        for patch in (marker, manifest):
+            patch.start()
+            self.addCleanup(patch.stop)
+        release.STATIC_MANIFEST.write_text('{}')
+
+    def test_fingerprint_follows_database(self):
+        release.record(release.fingerprint())
+        self.assertTrue(release.is_current())
+        with mock.patch.dict(os.environ, {'DATABASE_URL': 'postgres://elsewhere/db'}):
+            self.assertFalse(release.is_current())
+
+    def test_missing_static_output_or_marker_means_not_prepared(self):
+        self.assertFalse(release.is_current())
+        release.record(release.fingerprint())
+        release.STATIC_MANIFEST.unlink()
+        self.assertFalse(release.is_current())
+
+    def test_prepare_release_skips_current_release(self):
+        release.record(release.fingerprint())
+        out = io.StringIO()
+        with self.assertNumQueries(0):
+            call_command('prepare_release', '--if-changed', stdout=out)
+        self.assertIn('nothing to do', out.getvalue())
+
+    def test_warm_up_does_not_touch_the_database(self):
+        with self.assertNumQueries(0):
+            self.assertGreater(warm_up(), 0)
+
+
+DATABASE_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'ecoreach_cache'}}
+
+
+class SharedCacheTests(TestCase):
+    def test_deploy_check_warns_about_process_local_cache(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertEqual([w.id for w in checks.check_shared_cache(None)], ['ecommerce_service.W001'])
+        with override_settings(CACHES=DATABASE_CACHE):
+            self.assertEqual(checks.check_shared_cache(None), [])
+
+    @override_settings(CACHES=DATABASE_CACHE)
+    def test_database_cache_carries_version_bumps_across_processes(self):
+        call_command('createcachetable', verbosity=0)
+        # A second backend instance stands in for another worker process
+        other_worker = DatabaseCache('ecoreach_cache', {})
+        version = product_cache.get_version()
+        product_cache.bump_version()
+        self.assertEqual(other_worker.get(product_cache.VERSION_KEY), version + 1)
+
+
+class CodecTests(SimpleTestCase):
+    def test_dumps_matches_drf_json_renderer(self):
+        from django.utils.translation import gettext_lazy
+        from rest_framework.renderers import JSONRenderer
+
+        data = {
+            'price': Decimal('12.50'),
+            'aware': datetime.datetime(2024, 5, 1, 8, 30, 0, 123456, tzinfo=datetime.timezone.utc),
+            'naive': datetime.datetime(2024, 5, 1, 8, 30),
+            'day': datetime.date(2024, 5, 1),
+            'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            'lazy': gettext_lazy('Not found.'),
+            'text': 'Café "quoted" \u2028 \u2029 \n',
+            1: [None, True, 1.5, (1, 2)],
+        }
+        self.assertEqual(codecs.dumps(data), JSONRenderer().render(data))
+
+    def test_parser_rejects_malformed_json(self):
+        from rest_framework.exceptions import ParseError
+
+        parser = codecs.ORJSONParser()
+        self.assertEqual(parser.parse(io.BytesIO('{"a": ["ü", 1]}'.encode())), {'a': ['ü', 1]})
+        for body in (b'{"a": ', b'{"a": NaN}', b'\xff'):
+            with self.assertRaises(ParseError):
+                parser.parse(io.BytesIO(body))
+
+    def test_renderer_leaves_indented_output_to_drf(self):
+        renderer = codecs.ORJSONRenderer()
+        self.assertEqual(renderer.render({'a': 1}), b'{"a":1}')
+        self.assertEqual(renderer.render({'a': 1}, 'application/json; indent=2'), b'{\n  "a": 1\n}')
+        self.assertEqual(renderer.render(None), b'')
+
+
+class CompressionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(1, 6):
+            Product.objects.create(product_id=str(i), product_name=f'Bamboo product {i}', price='10.00',
+                                   description='Reusable bamboo, cotton and steel')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_choose_encoding(self):
+        self.assertEqual(compression.choose_encoding('gzip, deflate, br'), 'br')
+        self.assertEqual(compression.choose_encoding('gzip;q=1, br;q=0.5'), 'gzip')
+        self.assertEqual(compression.choose_encoding('br;q=0, *'), 'gzip')
+        self.assertEqual(compression.choose_encoding('identity'), None)
+        self.assertEqual(compression.choose_encoding(''), None)
+
+    def test_cache_hit_is_served_precompressed(self):
+        import brotli
+
+        plain = self.client.get('/api/product/all')
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        with mock.patch('product_management.cache.dumps', side_effect=AssertionError('serialized')), \
+                mock.patch('ecommerce_service.compression.compress', side_effect=AssertionError('compressed')):
+            response = self.client.get('/api/product/all', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), plain.content)
+        self.assertEqual(response['ETag'], 'W/' + plain['ETag'])
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+
+        response = self.client.get('/api/product/all', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_other_json_is_compressed_on_the_fly(self):
+        plain = self.client.get('/api/product/byIds', {'ids': '1,2,3,4,5'})
+        response = self.client.get('/api/product/byIds', {'ids': '1,2,3,4,5'}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+    def test_streaming_response_is_compressed_in_chunks(self):
+        plain = b''.join(self.client.get('/api/product/feed').streaming_content)
+        response = self.client.get('/api/product/feed', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), plain)
+
+    def test_small_and_error_responses_are_left_alone(self):
+        response = self.client.get('/api/product/byIds', {'ids': 'nope'}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Content-Encoding', response)
+        response = self.client.get('/api/product/byIds', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('Content-Encoding', response)
@@ -14,13 +14,15 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 from django.http import JsonResponse
-from product_management.views import ProductAllView, ProductByIdView, SummarizeView
+from product_management.views import ProductAllView, ProductByIdView, ProductByIdsView, ProductFeedView, ProductSearchView, SummarizeView, AsyncProductAllView, AsyncProductByIdView
 from rest_framework.routers import DefaultRouter
-from order_management.views import OrderViewSet, OrderProductDetails
-from user_management.views import CustomerUserView, CustomerUserProfileView, RegisterView, LoginView, AddToWishlistView, RemoveFromWishlistView, WishlistView
+from ecommerce_service.metrics import metrics_view
+from order_management.views import OrderViewSet, CartViewSet, OrderProductDetails, OrderExportView, EcoLeaderboardView
+from user_management.views import CustomerUserView, CustomerUserProfileView, RegisterView, LoginView, AddToWishlistView, RemoveFromWishlistView, WishlistView, WishlistBulkView, AsyncCustomerUserView, AsyncWishlistView
 
 def api_root(request):
     return JsonResponse({
@@ -28,41 +30,51 @@ def api_root(request):
         'available_endpoints': {
             'products': '/api/product/all',
             'product_by_id': '/api/product/byId/<id>',
+            'products_by_ids': '/api/product/byIds?ids=<id>,<id>',
+            'product_search': '/api/product/search?q=<text>',
+            'product_feed': '/api/product/feed',
             'login': '/api/login/',
             'register': '/api/register/',
             'wishlist': '/wishlist/',
+            'wishlist_bulk': '/wishlist/bulk/',
             'orders': '/api/orders/',
+            'cart': '/api/carts/current/',
+            'order_impact': '/api/orders/impact/',
+            'eco_leaderboard': '/api/leaderboard/eco',
         }
     })
 
+if settings.ASYNC_VIEWS:
+    ProductAllView, ProductByIdView = AsyncProductAllView, AsyncProductByIdView
+    CustomerUserView, WishlistView = AsyncCustomerUserView, AsyncWishlistView
+
 router = DefaultRouter()
 router.register(r'orders', OrderViewSet, basename='order')
+router.register(r'carts', CartViewSet, basename='cart')
 
 urlpatterns = [
     path('', api_root, name='api-root'),  # Root route
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('api/register/', RegisterView.as_view(), name='register'),
     path('api/login/', LoginView.as_view(), name='login'),
     path('api/profile/', CustomerUserProfileView.as_view(), name='profile'),
     path("api/userinfo/<str:username>", CustomerUserView.as_view(), name="userinfo"),
     path('api/product/all', ProductAllView.as_view(), name='product_all'),
     path('api/product/byId/<int:product_id>', ProductByIdView.as_view(), name='product_byid'),
+    path('api/product/byIds', ProductByIdsView.as_view(), name='product_byids'),
+    path('api/product/search', ProductSearchView.as_view(), name='product_search'),
+    path('api/product/feed', ProductFeedView.as_view(), name='product_feed'),
     path('api/summarize', SummarizeView.as_view(), name='summarize'),
+    path('api/orders/export/', OrderExportView.as_view(), name='order-export'),
+    path('api/leaderboard/eco', EcoLeaderboardView.as_view(), name='eco_leaderboard'),
     path('api/', include(router.urls)),
     path('orders/products/<int:order_id>/', OrderProductDetails.as_view(), name='order-product-details'),
     path('wishlist/', WishlistView.as_view(), name='wishlist'),
+    path('wishlist/bulk/', WishlistBulkView.as_view(), name='wishlist_bulk'),
     path('wishlist/add/<int:product_id>/', AddToWishlistView.as_view(), name='add_to_wishlist'),
     path('wishlist/remove/<int:product_id>/', RemoveFromWishlistView.as_view(), name='remove_from_wishlist'),
 
 
     # path('api/order/byProductId/<int:product_id>', OrderView.as_view(), name='order'),
-    # path('api/cart/', CartViewSet.as_view({
-    #     'get': 'list',
-    #     'post': 'create'
-    # }), name='cart'),
-    # path('api/cart/current/', CartViewSet.as_view({'get': 'current'}), name='cart-current'),
-    # path('api/cart/add_item/', CartViewSet.as_view({'post': 'add_item'}), name='cart-add-item'),
-    # path('api/cart/update_item/', CartViewSet.as_view({'post': 'update_item'}), name='cart-update-item'),
-    # path('api/cart/remove_item/', CartViewSet.as_view({'post': 'remove_item'}), name='cart-remove-item'),
-    # path('api/cart/clear/', CartViewSet.as_view({'post': 'clear'}), name='cart-clear'),
 ]
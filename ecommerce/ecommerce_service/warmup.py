@@ -0,0 +1,49 @@
+"""
+Warm-up for preloaded servers.
+
+gunicorn.conf.py loads the application in the master process (preload_app)
+and calls warm_up() there before forking workers. That moves the first
+request's one-off costs out of the request path, once for all workers:
+- importing the view modules;
+- populating the URL resolver;
+- building model metadata and serializer fields;
+- rendering JSON.
+warm_up() must not touch the database, because connections opened in the
+master would be shared by every forked worker.
+"""
+import time
+from decimal import Decimal
+
+from django.apps import apps
+from django.urls import get_resolver, resolve, reverse
+
+# Paths resolved during warm-up; one per view module
+PATHS = (
+    '/', '/api/product/all', '/api/product/byId/1', '/api/product/byIds', '/api/summarize',
+    '/api/userinfo/warmup', '/api/orders/', '/api/carts/current/', '/wishlist/', '/metrics',
+)
+
+
+def serializers():
+    from order_management.serializers import OrderItemSerializer, OrderSerializer
+    from product_management.serializers import ProductSerializer
+    from user_management.serializers import CustomerUserSerializer
+
+    return (ProductSerializer, OrderSerializer, OrderItemSerializer, CustomerUserSerializer)
+
+
+def warm_up():
+    """Prime the process-wide caches the first requests would otherwise fill; returns seconds taken"""
+    from rest_framework.renderers import JSONRenderer
+
+    started = time.perf_counter()
+    for model in apps.get_models():
+        model._meta.get_fields()
+    get_resolver().url_patterns  # imports urls.py and with it every view module
+    reverse('api-root')  # populates the reverse lookup tables
+    for path in PATHS:
+        resolve(path)
+    for serializer in serializers():
+        serializer().fields
+    JSONRenderer().render({'price': Decimal('1.00'), 'items': [1, 'a', None, True]})
+    return time.perf_counter() - started
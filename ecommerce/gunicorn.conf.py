@@ -0,0 +1,29 @@
+"""
+gunicorn settings for the API; used by serve.sh.
+
+The application is loaded once in the master (preload_app) and warmed up
+there before the workers fork, so every worker starts with imports and
+caches in place instead of paying for them on its first requests.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "uvicorn.workers.UvicornWorker")
+workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+timeout = 120
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
+preload_app = True
+
+
+def when_ready(server):
+    # Runs in the master after the preloaded app is imported and before any worker forks
+    from ecommerce_service.warmup import warm_up
+
+    server.log.info("Warmed up in %.0f ms", warm_up() * 1000)
+
+
+def post_fork(server, worker):
+    # Nothing in the master should have connected, but never share a connection
+    from django.db import connections
+
+    connections.close_all()
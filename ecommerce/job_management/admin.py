@@ -0,0 +1,11 @@
+from django.contrib import admin
+from job_management.models import Job
+
+# Register your models here.
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "status", "attempts", "run_at", "finished_at")
+    list_filter = ("status", "name")
+    readonly_fields = ("locked_by", "locked_at", "last_error", "created_at", "finished_at")
+
+admin.site.register(Job, JobAdmin)
@@ -0,0 +1,23 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from job_management.queue import Worker
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs. SIGTERM/SIGINT finish the jobs in progress, then exit."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=4, help="Jobs run at the same time (threads)")
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds between polls when idle")
+        parser.add_argument("--once", action="store_true", help="Exit once no job is due")
+
+    def handle(self, *args, **options):
+        worker = Worker(options["concurrency"], options["poll_interval"])
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: worker.stop())
+
+        self.stdout.write(f"Worker {worker.name} running {options['concurrency']} jobs at a time")
+        worker.run(once=options["once"])
+        self.stdout.write(self.style.SUCCESS(f"Processed {worker.processed} jobs"))
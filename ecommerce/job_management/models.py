@@ -0,0 +1,39 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.db.models import Q
+from django.utils.timezone import now
+
+# Create your models here.
+
+
+class Job(models.Model):
+    """A queued call to a module-level function; see job_management.queue"""
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+
+    name = models.CharField(max_length=200)  # dotted path of the function
+    kwargs = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField(default=now)
+    locked_by = models.CharField(max_length=64, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers only ever scan runnable jobs, so the index stays small
+            # however many finished jobs the table holds
+            models.Index(fields=['run_at'], condition=Q(status='queued'), name='job_queued_run_at_idx'),
+            models.Index(fields=['status', 'locked_at'], name='job_status_locked_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} {self.name} ({self.status})"
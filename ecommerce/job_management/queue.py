@@ -0,0 +1,201 @@
+"""
+Database-backed job queue.
+
+enqueue() inserts a Job row on the caller's connection, so the job commits or
+rolls back together with the caller's transaction, and a worker never picks
+up a job before the rows it refers to are visible.
+
+Workers (``manage.py run_worker``) claim batches of due jobs. On PostgreSQL
+the candidates are selected with FOR UPDATE SKIP LOCKED, so workers neither
+block on nor double-claim each other's rows. SQLite has no row locks; there
+the conditional UPDATE (``status = 'queued'``) that marks the batch as
+running decides, and a worker only runs the rows it actually changed.
+
+A job's function runs in a transaction together with the update that marks
+it done. Failures are retried with exponential backoff until max_attempts,
+then left as 'failed' with the traceback in last_error.
+"""
+import datetime
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from job_management.models import Job
+
+MAX_ATTEMPTS = getattr(settings, 'JOB_MAX_ATTEMPTS', 5)
+BACKOFF_BASE = getattr(settings, 'JOB_BACKOFF_BASE', 5)  # seconds, doubled per attempt
+BACKOFF_MAX = getattr(settings, 'JOB_BACKOFF_MAX', 3600)
+# A job still 'running' after this long belongs to a worker that died
+STALE_AFTER = getattr(settings, 'JOB_STALE_AFTER', 600)
+# Finished jobs are kept this long for inspection in the admin
+RETENTION = getattr(settings, 'JOB_RETENTION', 7 * 24 * 60 * 60)
+MAINTENANCE_INTERVAL = 60  # seconds
+PURGE_BATCH = 1000
+
+
+def job_name(func):
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+def enqueue(func, *, delay=None, run_at=None, max_attempts=None, **kwargs):
+    """
+    Queue ``func(**kwargs)``. ``func`` is a module-level function or its dotted
+    path, and ``kwargs`` must be JSON-serializable.
+    """
+    if run_at is None:
+        run_at = timezone.now() + datetime.timedelta(seconds=delay or 0)
+    return Job.objects.create(
+        name=func if isinstance(func, str) else job_name(func),
+        kwargs=kwargs,
+        run_at=run_at,
+        max_attempts=max_attempts or MAX_ATTEMPTS,
+    )
+
+
+def backoff(attempts):
+    """Delay before retry number ``attempts``, with +/-20% jitter so failures do not retry in lockstep"""
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return datetime.timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def claim(worker, limit):
+    """Mark up to ``limit`` due jobs as running for ``worker`` and return them"""
+    token = f'{worker}:{uuid.uuid4().hex[:12]}'
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status='queued', run_at__lte=now)
+            .order_by('run_at')
+            .values_list('id', flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        Job.objects.filter(id__in=ids, status='queued').update(
+            status='running', locked_by=token, locked_at=now, attempts=F('attempts') + 1,
+        )
+    return list(Job.objects.filter(locked_by=token, status='running'))
+
+
+def run_job(job):
+    """Run one claimed job; returns True if it succeeded"""
+    try:
+        func = import_string(job.name)
+        with transaction.atomic():
+            func(**job.kwargs)
+            Job.objects.filter(pk=job.pk).update(
+                status='done', finished_at=timezone.now(), locked_by='', locked_at=None, last_error='',
+            )
+        return True
+    except Exception:
+        error = traceback.format_exc()
+
+    if job.attempts >= job.max_attempts:
+        Job.objects.filter(pk=job.pk).update(
+            status='failed', finished_at=timezone.now(), locked_by='', locked_at=None, last_error=error,
+        )
+    else:
+        Job.objects.filter(pk=job.pk).update(
+            status='queued', run_at=timezone.now() + backoff(job.attempts),
+            locked_by='', locked_at=None, last_error=error,
+        )
+    return False
+
+
+def requeue_stale():
+    """Give jobs of workers that died mid-job back to the queue (or fail them if out of attempts)"""
+    cutoff = timezone.now() - datetime.timedelta(seconds=STALE_AFTER)
+    stale = Job.objects.filter(status='running', locked_at__lt=cutoff)
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', finished_at=timezone.now(), locked_by='', locked_at=None,
+        last_error='Worker stopped before the job finished',
+    )
+    return failed + stale.update(status='queued', run_at=timezone.now(), locked_by='', locked_at=None)
+
+
+def purge_finished(batch_size=PURGE_BATCH):
+    """Delete jobs that finished more than RETENTION ago, in batches"""
+    cutoff = timezone.now() - datetime.timedelta(seconds=RETENTION)
+    total = 0
+    while True:
+        ids = list(
+            Job.objects.filter(status__in=('done', 'failed'), finished_at__lt=cutoff)
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return total
+        total += Job.objects.filter(id__in=ids).delete()[0]
+
+
+def drain(worker='inline', batch_size=100):
+    """Run every due job in this thread until none are left; returns how many ran"""
+    count = 0
+    while jobs := claim(worker, batch_size):
+        for job in jobs:
+            run_job(job)
+        count += len(jobs)
+    return count
+
+
+class Worker:
+    """Claims due jobs and runs them on a pool of ``concurrency`` threads"""
+
+    def __init__(self, concurrency=4, poll_interval=1.0, name=None):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.name = name or f'{socket.gethostname()[:30]}:{os.getpid()}'
+        self.stopping = threading.Event()
+        self.processed = 0
+
+    def stop(self):
+        self.stopping.set()
+
+    def execute(self, job):
+        try:
+            return run_job(job)
+        finally:
+            # Each pool thread holds its own connection
+            connection.close()
+
+    def run(self, once=False):
+        """Work until stop() is called, or with ``once`` until no job is due"""
+        last_maintenance = 0.0
+        in_flight = set()
+        with ThreadPoolExecutor(self.concurrency, thread_name_prefix='job') as pool:
+            while not self.stopping.is_set():
+                if time.monotonic() - last_maintenance >= MAINTENANCE_INTERVAL:
+                    requeue_stale()
+                    purge_finished()
+                    last_maintenance = time.monotonic()
+
+                jobs = []
+                free = self.concurrency - len(in_flight)
+                if free:
+                    close_old_connections()
+                    try:
+                        jobs = claim(self.name, free)
+                    except OperationalError:
+                        pass  # SQLite busy with another writer; try again on the next poll
+                in_flight.update(pool.submit(self.execute, job) for job in jobs)
+
+                if in_flight:
+                    # Wake as soon as a slot frees up, or after a poll interval
+                    done, in_flight = wait(in_flight, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                    self.processed += len(done)
+                elif once:
+                    break
+                else:
+                    self.stopping.wait(self.poll_interval)
+            wait(in_flight)
+            self.processed += len(in_flight)
@@ -0,0 +1,90 @@
+import datetime
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from job_management.models import Job
+from job_management.queue import Worker, claim, drain, enqueue, requeue_stale, run_job
+
+# Create your tests here.
+
+CALLS = []
+
+
+def record(value):
+    CALLS.append(value)
+
+
+def explode():
+    raise ValueError('boom')
+
+
+def enqueue_then_explode():
+    enqueue(record, value='never')
+    raise ValueError('boom')
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_enqueue_commits_with_the_callers_transaction(self):
+        try:
+            with transaction.atomic():
+                enqueue(record, value=1)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertFalse(Job.objects.exists())
+
+        with transaction.atomic():
+            enqueue(record, value=2)
+        self.assertEqual(drain(), 1)
+        self.assertEqual(CALLS, [2])
+        self.assertEqual(Job.objects.get().status, 'done')
+
+    def test_claim_skips_future_and_claimed_jobs(self):
+        enqueue(record, value=1, delay=60)
+        due = enqueue(record, value=2)
+        self.assertEqual([job.id for job in claim('a', 10)], [due.id])
+        self.assertEqual(claim('b', 10), [])
+
+    def test_failures_retry_with_backoff_then_fail(self):
+        job = enqueue(explode, max_attempts=2)
+        drain()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('ValueError: boom', job.last_error)
+
+        Job.objects.update(run_at=timezone.now())
+        drain()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+
+    def test_failed_job_rolls_back_its_writes(self):
+        enqueue(enqueue_then_explode)
+        [job] = claim('a', 1)
+        self.assertFalse(run_job(job))
+        self.assertEqual(list(Job.objects.values_list('name', 'status')), [(job.name, 'queued')])
+
+    def test_stale_running_jobs_are_requeued(self):
+        enqueue(record, value=1)
+        claim('dead-worker', 1)
+        Job.objects.update(locked_at=timezone.now() - datetime.timedelta(hours=1))
+        self.assertEqual(requeue_stale(), 1)
+        drain()
+        self.assertEqual(CALLS, [1])
+
+
+class WorkerTests(TransactionTestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_worker_runs_due_jobs_on_its_pool(self):
+        for value in range(5):
+            enqueue(record, value=value)
+        worker = Worker(concurrency=1, poll_interval=0.01)
+        worker.run(once=True)
+        self.assertEqual(worker.processed, 5)
+        self.assertEqual(sorted(CALLS), [0, 1, 2, 3, 4])
+        self.assertEqual(Job.objects.filter(status='done').count(), 5)
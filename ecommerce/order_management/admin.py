@@ -1,5 +1,5 @@
 from django.contrib import admin
-from order_management.models import Order, OrderItem
+from order_management.models import Cart, CartItem, CustomerStats, Order, OrderItem
 
 # Register your models here.
 class OrderItemInline(admin.TabularInline):
@@ -11,4 +11,29 @@ class OrderAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'first_name', 'status', 'created_at')
     inlines = [OrderItemInline]
 
-admin.site.register(Order)
\ No newline at end of file
+admin.site.register(Order)
+
+class CartItemInline(admin.TabularInline):
+    model = CartItem
+    extra = 0
+    readonly_fields = ('product', 'quantity', 'price')
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+class CartAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'item_count', 'subtotal', 'updated_at')
+    # Totals are maintained by order_management.cart; edit the cart through the API
+    readonly_fields = ('user', 'item_count', 'subtotal', 'created_at', 'updated_at')
+    inlines = [CartItemInline]
+
+admin.site.register(Cart, CartAdmin)
+
+class CustomerStatsAdmin(admin.ModelAdmin):
+    list_display = ('user', 'order_count', 'lifetime_spend', 'eco_points', 'updated_at')
+    ordering = ('-eco_points', 'user')
+    # Maintained by order_management.customer_stats; rebuild with backfill_customer_stats
+    readonly_fields = ('user', 'order_count', 'lifetime_spend', 'eco_points', 'updated_at')
+
+admin.site.register(CustomerStats, CustomerStatsAdmin)
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class OrderManagementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'order_management'
+
+    def ready(self):
+        # Registers the signal handlers that keep cart totals right when a
+        # product is deleted, and customer totals right on every order write
+        from order_management import cart, customer_stats  # noqa: F401
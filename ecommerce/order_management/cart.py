@@ -0,0 +1,222 @@
+"""
+Server-side carts.
+
+Every mutation locks the customer's Cart row, changes one CartItem row and
+moves Cart.subtotal and Cart.item_count by the same delta with an F()
+update, so the totals are never re-summed from the items. A cart is read
+with one query that joins its items to the cart row and the products.
+
+checkout() hands the cart lines to place_order() and empties the cart in the
+same transaction. Line prices are snapshots taken when a product is added;
+refresh_prices() moves them to the current prices, and checkout refuses a
+cart whose prices are out of date so the customer confirms the new total.
+"""
+import dataclasses
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, pre_delete
+from django.dispatch import receiver
+from django.utils.timezone import now
+from rest_framework import status
+
+from order_management.checkout import CheckoutError, place_order
+from order_management.models import Cart, CartItem
+from order_management.payloads import CheckoutItem
+from product_management.models import Product
+from product_management.serializers import format_decimal
+
+MAX_QUANTITY = 99
+PRICES_CHANGED = 'Some prices have changed; please review your cart'
+
+
+def parse_quantity(value, minimum=1):
+    try:
+        quantity = int(value)
+    except (TypeError, ValueError):
+        raise CheckoutError('quantity must be an integer')
+    if not minimum <= quantity <= MAX_QUANTITY:
+        raise CheckoutError(f'quantity must be between {minimum} and {MAX_QUANTITY}')
+    return quantity
+
+
+def parse_item_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise CheckoutError('item_id must be an integer')
+
+
+def check_stock(product, quantity):
+    # Sharded stock is only known once a shard is claimed at checkout
+    if not product.stock_shards and product.stock < quantity:
+        raise CheckoutError(f'Not enough stock for product {product.product_id}')
+
+
+def locked_cart(user):
+    """The user's cart, created on first use and locked until the caller's transaction ends"""
+    cart, _ = Cart.objects.select_for_update().get_or_create(user_id=user.id)
+    return cart
+
+
+def set_line(cart, item, product_id, price, quantity):
+    """Make the cart's line for ``product_id`` hold ``quantity`` units at ``price`` and move the totals to match"""
+    old_subtotal = item.subtotal if item else Decimal('0')
+    old_quantity = item.quantity if item else 0
+    if not quantity:
+        CartItem.objects.filter(pk=item.pk).delete()
+    elif item is None:
+        CartItem.objects.create(cart=cart, product_id=product_id, quantity=quantity, price=price)
+    else:
+        CartItem.objects.filter(pk=item.pk).update(quantity=quantity, price=price)
+    Cart.objects.filter(pk=cart.pk).update(
+        subtotal=F('subtotal') + (price * quantity - old_subtotal),
+        item_count=F('item_count') + (quantity - old_quantity),
+        updated_at=now(),
+    )
+
+
+def add_item(user, product_id, quantity):
+    """Add ``quantity`` units of a product, repricing the line to the current price"""
+    quantity = parse_quantity(quantity)
+    product = Product.objects.filter(product_id=str(product_id)).only('price', 'stock', 'stock_shards').first()
+    if product is None:
+        raise CheckoutError(f'Product with id {product_id} not found', status.HTTP_404_NOT_FOUND)
+
+    with transaction.atomic():
+        cart = locked_cart(user)
+        item = CartItem.objects.filter(cart=cart, product_id=product.product_id).first()
+        quantity += item.quantity if item else 0
+        if quantity > MAX_QUANTITY:
+            raise CheckoutError(f'quantity must be between 1 and {MAX_QUANTITY}')
+        check_stock(product, quantity)
+        set_line(cart, item, product.product_id, product.price, quantity)
+
+
+def update_quantity(user, item_id, quantity):
+    """Set a line's quantity; 0 removes it"""
+    item_id, quantity = parse_item_id(item_id), parse_quantity(quantity, minimum=0)
+    with transaction.atomic():
+        cart = locked_cart(user)
+        item = CartItem.objects.filter(cart=cart, pk=item_id).select_related('product').first()
+        if item is None:
+            raise CheckoutError('Cart item not found', status.HTTP_404_NOT_FOUND)
+        if quantity > item.quantity:
+            check_stock(item.product, quantity)
+        set_line(cart, item, item.product_id, item.price, quantity)
+
+
+def remove_item(user, item_id):
+    item_id = parse_item_id(item_id)
+    with transaction.atomic():
+        cart = locked_cart(user)
+        item = CartItem.objects.filter(cart=cart, pk=item_id).first()
+        if item is None:
+            raise CheckoutError('Cart item not found', status.HTTP_404_NOT_FOUND)
+        set_line(cart, item, item.product_id, item.price, 0)
+
+
+def clear(user):
+    with transaction.atomic():
+        cart = locked_cart(user)
+        empty(cart)
+
+
+def empty(cart):
+    CartItem.objects.filter(cart=cart).delete()
+    Cart.objects.filter(pk=cart.pk).update(subtotal=0, item_count=0, updated_at=now())
+
+
+def recount(cart_ids):
+    """Recompute the totals of ``cart_ids`` from their items, in one UPDATE"""
+    lines = CartItem.objects.filter(cart=OuterRef('pk')).order_by().values('cart')
+    Cart.objects.filter(pk__in=cart_ids).update(
+        subtotal=Coalesce(
+            Subquery(lines.annotate(total=Sum(F('price') * F('quantity'), output_field=DecimalField())).values('total')),
+            Value(Decimal('0')),
+        ),
+        item_count=Coalesce(Subquery(lines.annotate(total=Sum('quantity')).values('total')), Value(0)),
+        updated_at=now(),
+    )
+
+
+def reprice(cart):
+    """Move every line of ``cart`` to its product's current price"""
+    CartItem.objects.filter(cart=cart).update(
+        price=Subquery(Product.objects.filter(product_id=OuterRef('product_id')).values('price')[:1])
+    )
+    recount([cart.pk])
+
+
+def refresh_prices(user):
+    """Reprice the cart if a product's price has changed since it was added; True if it was"""
+    if not CartItem.objects.filter(cart__user_id=user.id).exclude(price=F('product__price')).exists():
+        return False
+    with transaction.atomic():
+        reprice(locked_cart(user))
+    return True
+
+
+def checkout(user, payload):
+    """
+    Turn the user's cart into an order and empty the cart, in one transaction.
+    ``payload`` comes from parse_checkout(..., with_items=False).
+
+    Call refresh_prices() first: a cart whose prices no longer match the
+    products is refused with a 409 rather than charged at prices the
+    customer has not seen.
+    """
+    with transaction.atomic():
+        cart = locked_cart(user)
+        lines = list(CartItem.objects.filter(cart=cart).values_list('product_id', 'quantity', 'price', 'product__price'))
+        if not lines:
+            raise CheckoutError('Your cart is empty')
+        if any(price != current for _, _, price, current in lines):
+            raise CheckoutError(PRICES_CHANGED, status.HTTP_409_CONFLICT)
+        items = tuple(CheckoutItem(pid, quantity) for pid, quantity, _, _ in lines)
+        order = place_order(user, dataclasses.replace(payload, items=items))
+        empty(cart)
+    return order
+
+
+def cart_payload(user):
+    """The user's cart with its lines, from one query over the cart's items"""
+    rows = list(
+        CartItem.objects.filter(cart__user_id=user.id)
+        .order_by('created_at', 'id')
+        .values(
+            'id', 'product_id', 'quantity', 'price',
+            'product__product_name', 'product__img_url', 'cart__subtotal', 'cart__item_count',
+        )
+    )
+    return {
+        'items': [
+            {
+                'id': row['id'],
+                'product_id': row['product_id'],
+                'product_name': row['product__product_name'],
+                'img_url': row['product__img_url'],
+                'price': format_decimal(row['price'], 2),
+                'quantity': row['quantity'],
+                'subtotal': format_decimal(row['price'] * row['quantity'], 2),
+            }
+            for row in rows
+        ],
+        # An empty cart has zero totals, so it needs no query of its own
+        'item_count': rows[0]['cart__item_count'] if rows else 0,
+        'subtotal': format_decimal(rows[0]['cart__subtotal'] if rows else Decimal('0'), 2),
+    }
+
+
+@receiver(pre_delete, sender=Product)
+def remember_carts(sender, instance, **kwargs):
+    # The product's cart lines are deleted with it, behind set_line's back
+    instance._cart_ids = list(CartItem.objects.filter(product=instance).values_list('cart_id', flat=True))
+
+
+@receiver(post_delete, sender=Product)
+def recount_carts(sender, instance, **kwargs):
+    if getattr(instance, '_cart_ids', None):
+        recount(instance._cart_ids)
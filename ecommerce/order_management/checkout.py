@@ -0,0 +1,109 @@
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Case, F, Q, When
+from rest_framework import status
+
+from order_management.customer_stats import eco_points_of
+from order_management.models import Order, OrderItem
+from product_management.models import Product
+from product_management.cache import invalidate_details
+from product_management import inventory
+
+ORDER_FIELDS = (
+    'email', 'first_name', 'last_name', 'phone_number', 'address',
+    'province', 'district', 'sub_district', 'postal_code',
+)
+
+
+class CheckoutError(Exception):
+    def __init__(self, message, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def place_order(user, payload):
+    """
+    Create an order and its items in a constant number of queries.
+
+    ``payload`` is a CheckoutPayload (see order_management.payloads), so the
+    request has already been validated.
+
+    Products are fetched with one SELECT, items are written with one bulk
+    INSERT and stock is decremented with one conditional UPDATE that refuses
+    to take any product below zero; no product row is locked up front. Hot
+    products with sharded stock are claimed one shard at a time instead (see
+    product_management.inventory), one extra UPDATE per such product.
+    """
+    quantities = payload.quantities()
+    if not quantities:
+        raise CheckoutError('No items provided')
+
+    with transaction.atomic():
+        products = Product.objects.in_bulk(list(quantities))
+
+        for product_id, quantity in quantities.items():
+            product = products.get(product_id)
+            if product is None:
+                raise CheckoutError(f'Product with id {product_id} not found', status.HTTP_404_NOT_FOUND)
+            # Sharded stock is only known once a shard is claimed below
+            if not product.stock_shards and product.stock < quantity:
+                raise CheckoutError(f'Not enough stock for product {product_id}')
+
+        order = Order(
+            user=user,
+            eco_points=eco_points_of(products, quantities),
+            note=payload.note,
+            shipping_method=payload.shipping_method,
+            payment_method=payload.payment_method,
+            **payload.contact,
+        )
+        order_items = [
+            OrderItem(
+                order=order,
+                product=products[product_id],
+                product_name=products[product_id].product_name or '',
+                quantity=quantity,
+                price=products[product_id].price,
+            )
+            for product_id, quantity in quantities.items()
+        ]
+        items_subtotal = sum((item.subtotal for item in order_items), Decimal('0'))
+        order.total_amount = items_subtotal + order.shipping_cost
+        if order.payment_method != 'cod':
+            order.status = 'paid'
+        order.save()
+
+        for item in order_items:
+            item.order = order
+        OrderItem.objects.bulk_create(order_items)
+
+        plain = {pid: qty for pid, qty in quantities.items() if not products[pid].stock_shards}
+        if plain:
+            # stock_shards=0 too: a product sharded since it was read keeps its
+            # stock in the shards now, and the order must fail rather than
+            # take it from the product row
+            decremented = Product.objects.filter(
+                reduce(or_, (Q(product_id=pid, stock__gte=qty, stock_shards=0) for pid, qty in plain.items()))
+            ).update(
+                stock=Case(
+                    *(When(product_id=pid, then=F('stock') - qty) for pid, qty in plain.items()),
+                    default=F('stock'),
+                    output_field=Product._meta.get_field('stock'),
+                )
+            )
+            if decremented != len(plain):
+                raise CheckoutError('Not enough stock for one or more products', status.HTTP_409_CONFLICT)
+        # Sorted, so two orders for the same hot products claim shards in the same order
+        for product_id in sorted(quantities.keys() - plain.keys()):
+            if not inventory.claim(product_id, products[product_id].stock_shards, quantities[product_id]):
+                raise CheckoutError(f'Not enough stock for product {product_id}', status.HTTP_409_CONFLICT)
+        # Bulk update skips post_save, so drop the ordered products' cached details explicitly
+        transaction.on_commit(lambda: invalidate_details(quantities))
+
+    # Serializing the order should not go back to the database for its items
+    order._prefetched_objects_cache = {'items': order_items}
+    return order
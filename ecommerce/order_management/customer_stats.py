@@ -0,0 +1,203 @@
+"""
+Per-customer order totals: order count, lifetime spend and eco points.
+
+Every order write moves its customer's CustomerStats row by the order's
+contribution, with an F() update from the Order signals. An order counts
+while it is not cancelled and has its eco points recorded, so cancelling
+takes it out, restoring it puts it back and an edited total moves the spend
+by the difference. Checkout saves the order inside its transaction, and the
+admin and the order API save inside one too, so the totals commit or roll
+back with the order itself.
+
+Orders placed before eco points were recorded are left out until
+``manage.py backfill_customer_stats`` (see backfill()) fills them in and
+rebuilds the totals.
+"""
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils.timezone import now
+
+from order_management.models import CustomerStats, Order, OrderItem
+from user_management.models import CustomerUser
+
+CHUNK_SIZE = 500
+LEADERBOARD_SIZE = 10
+MAX_LEADERBOARD_SIZE = 100
+
+
+def eco_points_of(products, quantities):
+    """Eco points of an order: ``products`` is product id -> Product"""
+    return sum(int(products[product_id].eco_point or 0) * quantity for product_id, quantity in quantities.items())
+
+
+def contribution(status, total_amount, eco_points):
+    """What an order in this state adds to its customer's totals"""
+    if status == 'cancelled' or eco_points is None or total_amount is None:
+        return 0, Decimal('0'), 0
+    return 1, total_amount, eco_points
+
+
+def apply(user_id, orders, spend, eco_points):
+    if not (orders or spend or eco_points):
+        return
+    changes = dict(
+        order_count=F('order_count') + orders,
+        lifetime_spend=F('lifetime_spend') + spend,
+        eco_points=F('eco_points') + eco_points,
+        updated_at=now(),
+    )
+    if CustomerStats.objects.filter(user_id=user_id).update(**changes):
+        return
+    if orders <= 0 and spend <= 0 and eco_points <= 0:
+        # Nothing to take away from a missing row. It is also gone while the
+        # customer is being deleted, and creating it again in the cascade
+        # would point at the deleted user
+        return
+    try:
+        with transaction.atomic():
+            CustomerStats.objects.create(user_id=user_id, order_count=orders, lifetime_spend=spend, eco_points=eco_points)
+    except IntegrityError:
+        # Another order of the same customer created the row first
+        CustomerStats.objects.filter(user_id=user_id).update(**changes)
+
+
+def state_of(order):
+    # Read __dict__ directly so deferred fields are not loaded for every Order
+    return tuple(order.__dict__.get(name) for name in ('user_id', 'status', 'total_amount', 'eco_points'))
+
+
+@receiver(post_init, sender=Order)
+def remember_customer_state(sender, instance, **kwargs):
+    instance._customer_state = state_of(instance)
+
+
+@receiver(post_save, sender=Order)
+def count_customer_order(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    new = state_of(instance)
+    old = (None, None, None, None) if created else instance._customer_state
+    instance._customer_state = new
+    if not created and None in old[1:3]:
+        # Loaded without these fields; leave the difference to backfill()
+        return
+
+    old_user, new_user = old[0], new[0]
+    old_totals, new_totals = contribution(*old[1:]), contribution(*new[1:])
+    if old_user == new_user:
+        if new_user is not None:
+            apply(new_user, *(n - o for n, o in zip(new_totals, old_totals)))
+        return
+    if old_user is not None:
+        apply(old_user, *(-value for value in old_totals))
+    if new_user is not None:
+        apply(new_user, *new_totals)
+
+
+@receiver(post_delete, sender=Order)
+def uncount_customer_order(sender, instance, **kwargs):
+    user_id, status, total_amount, eco_points = instance._customer_state
+    if user_id is not None:
+        apply(user_id, *(-value for value in contribution(status, total_amount, eco_points)))
+
+
+def leaderboard(limit=LEADERBOARD_SIZE):
+    """The ``limit`` customers with the most eco points, read in index order"""
+    return list(
+        CustomerStats.objects.filter(eco_points__gt=0)
+        .order_by('-eco_points', 'user_id')
+        .values('user_id', 'user__username', 'eco_points')[:limit]
+    )
+
+
+def rank_of(stats):
+    """1-based leaderboard position of ``stats``, counted over the index"""
+    if not stats.eco_points:
+        return None
+    ahead = CustomerStats.objects.filter(
+        Q(eco_points__gt=stats.eco_points) | Q(eco_points=stats.eco_points, user_id__lt=stats.user_id)
+    )
+    return ahead.count() + 1
+
+
+def fill_order_eco_points(chunk_size=CHUNK_SIZE):
+    """Record eco points on orders placed before they were recorded; returns how many were filled"""
+    filled, last = 0, 0
+    while True:
+        ids = list(
+            Order.objects.filter(pk__gt=last, eco_points__isnull=True)
+            .order_by('pk').values_list('pk', flat=True)[:chunk_size]
+        )
+        if not ids:
+            return filled
+        points = dict(
+            OrderItem.objects.filter(order_id__in=ids)
+            .values('order_id')
+            .annotate(points=Sum(F('quantity') * F('product__eco_point'), output_field=DecimalField()))
+            .values_list('order_id', 'points')
+        )
+        # Plain UPDATEs: the totals are rebuilt afterwards, so no signals
+        Order.objects.bulk_update(
+            [Order(pk=pk, eco_points=int(points.get(pk) or 0)) for pk in ids], ['eco_points'], batch_size=chunk_size,
+        )
+        filled += len(ids)
+        last = ids[-1]
+
+
+def rebuild_chunk(user_ids):
+    """Recompute the totals of ``user_ids`` from their orders"""
+    with transaction.atomic():
+        # Every customer gets a row, and the rows are locked before the orders
+        # are read: a checkout of one of these customers either commits before
+        # the read and is counted, or waits and then adds its own delta
+        CustomerStats.objects.bulk_create([CustomerStats(user_id=user_id) for user_id in user_ids], ignore_conflicts=True)
+        list(CustomerStats.objects.select_for_update().filter(user_id__in=user_ids).values_list('pk'))
+        totals = {
+            row['user_id']: row
+            for row in Order.objects.filter(user_id__in=user_ids, eco_points__isnull=False)
+            .exclude(status='cancelled')
+            .values('user_id')
+            .annotate(
+                order_count=Count('id'), lifetime_spend=Sum('total_amount'), eco_points=Sum('eco_points'),
+            )
+        }
+        empty = {'order_count': 0, 'lifetime_spend': Decimal('0'), 'eco_points': 0}
+        timestamp = now()
+        CustomerStats.objects.bulk_update(
+            [
+                CustomerStats(
+                    user_id=user_id,
+                    order_count=totals.get(user_id, empty)['order_count'],
+                    lifetime_spend=totals.get(user_id, empty)['lifetime_spend'],
+                    eco_points=totals.get(user_id, empty)['eco_points'],
+                    updated_at=timestamp,
+                )
+                for user_id in user_ids
+            ],
+            ['order_count', 'lifetime_spend', 'eco_points', 'updated_at'],
+        )
+
+
+def backfill(chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Build every customer's totals from their orders, ``chunk_size`` orders and
+    then customers per transaction. Safe to re-run, and to run while the
+    shop takes orders. Returns (orders filled, customers rebuilt).
+    """
+    filled = fill_order_eco_points(chunk_size)
+    rebuilt, last = 0, 0
+    while True:
+        user_ids = list(
+            CustomerUser.objects.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+        )
+        if not user_ids:
+            return filled, rebuilt
+        rebuild_chunk(user_ids)
+        rebuilt += len(user_ids)
+        last = user_ids[-1]
+        if progress:
+            progress(rebuilt)
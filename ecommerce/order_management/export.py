@@ -0,0 +1,103 @@
+"""
+Streaming order export.
+
+Orders and their items are read with a single LEFT JOIN over ``values()`` rows
+through a server-side cursor, and written out one line at a time, so memory
+use does not depend on how many orders are exported.
+"""
+import csv
+import datetime
+import json
+from itertools import groupby
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.dateparse import parse_date
+
+from order_management.models import Order
+
+ORDER_FIELDS = (
+    'id', 'user_id', 'email', 'first_name', 'last_name', 'phone_number', 'address',
+    'province', 'district', 'sub_district', 'postal_code', 'total_amount', 'status',
+    'shipping_method', 'payment_method', 'created_at',
+)
+ITEM_FIELDS = ('product_id', 'product_name', 'quantity', 'price')
+QUANTITY = ITEM_FIELDS.index('quantity')
+FORMATS = ('ndjson', 'csv')
+CHUNK_SIZE = 2000
+
+
+def parse_day(value):
+    """A YYYY-MM-DD filter value as a date, or None if it is malformed or impossible (2024-02-30)"""
+    try:
+        return parse_date(value)
+    except ValueError:
+        return None
+
+
+def export_rows(start=None, end=None, statuses=None):
+    """One flat row per order item (or one row with empty item fields for an order without items)"""
+    queryset = Order.objects.all()
+    if start:
+        queryset = queryset.filter(created_at__date__gte=start)
+    if end:
+        queryset = queryset.filter(created_at__date__lte=end)
+    if statuses:
+        queryset = queryset.filter(status__in=statuses)
+
+    columns = ORDER_FIELDS + tuple(f'items__{field}' for field in ITEM_FIELDS)
+    return (
+        queryset.order_by('id', 'items__id')
+        .values_list(*columns)
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+
+
+def iter_ndjson(rows):
+    """One JSON object per order, with its items nested, per line"""
+    encoder = DjangoJSONEncoder()
+    width = len(ORDER_FIELDS)
+    for _, order_rows in groupby(rows, key=lambda row: row[0]):
+        first = next(order_rows)
+        order = dict(zip(ORDER_FIELDS, first[:width]))
+        items = [first[width:]] + [row[width:] for row in order_rows]
+        # quantity is NULL only on the LEFT JOIN row of an order without items
+        order['items'] = [dict(zip(ITEM_FIELDS, item)) for item in items if item[QUANTITY] is not None]
+        yield json.dumps(order, default=encoder.default) + '\n'
+
+
+class _Line:
+    """File-like target that hands back whatever csv.writer writes"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    """CSV with a header and one line per order item"""
+    writer = csv.writer(_Line())
+    yield writer.writerow(ORDER_FIELDS + tuple(f'item_{field}' for field in ITEM_FIELDS))
+    for row in rows:
+        yield writer.writerow(
+            value.isoformat() if isinstance(value, datetime.datetime) else value
+            for value in row
+        )
+
+
+def buffered(lines, size=64 * 1024):
+    """Join small lines into chunks of roughly ``size`` characters"""
+    chunk, length = [], 0
+    for line in lines:
+        chunk.append(line)
+        length += len(line)
+        if length >= size:
+            yield ''.join(chunk)
+            chunk, length = [], 0
+    if chunk:
+        yield ''.join(chunk)
+
+
+def export_orders(output_format, **filters):
+    rows = export_rows(**filters)
+    if output_format == 'csv':
+        return buffered(iter_csv(rows))
+    return buffered(iter_ndjson(rows))
@@ -0,0 +1,101 @@
+"""
+Idempotency-Key handling for checkout.
+
+The key row is inserted at the start of the checkout transaction and the
+response is stored on it before commit, so a key is only ever visible
+together with its response. A duplicate that arrives while the first request
+is still running blocks on the unique index (PostgreSQL) or the write lock
+(SQLite) until that transaction ends, then replays the stored response, or
+runs the checkout itself if the first request failed and rolled back.
+Failed checkouts are not stored, so the client can retry them with the same key.
+
+Keys are scoped to their owner. Guests have no account to scope by, so a
+guest key is scoped by the request body as well: an identical retry replays
+the stored order, while another guest would need both the key and the exact
+body (contact details included) to see it.
+"""
+import datetime
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+
+from order_management.checkout import CheckoutError
+from order_management.models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAY_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = IdempotencyKey._meta.get_field('key').max_length
+TTL = getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 60 * 60)
+
+
+def owner_of(user, fingerprint):
+    # 32 hex digits of the body hash keep the owner within its 64 characters
+    return f'user:{user.pk}' if user is not None else f'guest:{fingerprint[:32]}'
+
+
+def request_hash(data):
+    """Fingerprint of the request body, to refuse a key reused for a different checkout"""
+    body = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def run_once(user, key, data, handler):
+    """
+    Run ``handler`` (returning ``(status_code, body)``) at most once per key.
+
+    Returns ``(status_code, body, replayed)``.
+    """
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise CheckoutError(f'{HEADER} must be 1 to {MAX_KEY_LENGTH} characters')
+    fingerprint = request_hash(data)
+    owner = owner_of(user, fingerprint)
+
+    while True:
+        with transaction.atomic():
+            now = timezone.now()
+            try:
+                # Its own savepoint, so only a taken key is caught here; an
+                # IntegrityError from the handler rolls back and propagates
+                with transaction.atomic():
+                    record = IdempotencyKey.objects.create(
+                        owner=owner, key=key, request_hash=fingerprint,
+                        created_at=now, expires_at=now + datetime.timedelta(seconds=TTL),
+                    )
+            except IntegrityError:
+                record = None
+            if record is not None:
+                record.status_code, record.response = handler()
+                record.save(update_fields=['status_code', 'response'])
+                return record.status_code, record.response, False
+
+        try:
+            record = IdempotencyKey.objects.get(owner=owner, key=key)
+        except IdempotencyKey.DoesNotExist:
+            continue  # the request holding the key rolled back; run it here
+        if record.expires_at <= timezone.now():
+            record.delete()
+            continue
+        if record.request_hash != fingerprint:
+            raise CheckoutError(
+                f'{HEADER} was already used for a different request',
+                status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        return record.status_code, record.response, True
+
+
+def purge_expired(batch_size=1000):
+    """Delete expired keys in batches of ``batch_size``; returns how many were deleted"""
+    total = 0
+    while True:
+        ids = list(
+            IdempotencyKey.objects.filter(expires_at__lte=timezone.now())
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return total
+        total += IdempotencyKey.objects.filter(pk__in=ids).delete()[0]
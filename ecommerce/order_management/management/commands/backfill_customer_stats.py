@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from order_management.customer_stats import CHUNK_SIZE, backfill
+
+
+class Command(BaseCommand):
+    help = (
+        "Record eco points on older orders and rebuild every customer's order count, lifetime spend and eco "
+        "points, in chunks. Run once after deploying customer stats; safe to re-run to correct drift."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Orders, then customers, per transaction")
+
+    def handle(self, *args, **options):
+        def progress(rebuilt):
+            if options["verbosity"] > 1:
+                self.stdout.write(f"{rebuilt} customers rebuilt")
+
+        filled, rebuilt = backfill(options["chunk_size"], progress)
+        self.stdout.write(self.style.SUCCESS(f"Filled eco points on {filled} orders; rebuilt {rebuilt} customers"))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from order_management.export import FORMATS, export_orders, parse_day
+from order_management.models import Order
+
+
+class Command(BaseCommand):
+    help = "Stream orders with their items as NDJSON or CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=FORMATS, default="ndjson")
+        parser.add_argument("--start", help="First day to include (YYYY-MM-DD)")
+        parser.add_argument("--end", help="Last day to include (YYYY-MM-DD)")
+        parser.add_argument("--status", action="append", default=[], choices=dict(Order.STATUS_CHOICES),
+                            help="Only export orders in this status; may be repeated")
+        parser.add_argument("--output", "-o", help="Write to this file instead of stdout")
+
+    def handle(self, *args, **options):
+        filters = {"statuses": options["status"]}
+        for name in ("start", "end"):
+            if options[name]:
+                filters[name] = parse_day(options[name])
+                if filters[name] is None:
+                    raise CommandError(f"--{name} must be a YYYY-MM-DD date")
+
+        chunks = export_orders(options["format"], **filters)
+        if not options["output"]:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
+            return
+        with open(options["output"], "w", newline="") as out:
+            for chunk in chunks:
+                out.write(chunk)
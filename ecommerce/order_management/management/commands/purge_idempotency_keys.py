@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from order_management.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Delete expired checkout idempotency keys in batches. Run periodically (e.g. from cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deleted = purge_expired(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired idempotency keys"))
@@ -4,6 +4,7 @@ from product_management.models import Product
 from user_management.models import CustomerUser
 from django.utils.timezone import now
 from decimal import Decimal
+from django.core.serializers.json import DjangoJSONEncoder
 
 # Create your models here.
 class Order(models.Model):
@@ -34,7 +35,8 @@ class Order(models.Model):
         ('cod', 'Cash on Delivery')
     )
     
-    user = models.ForeignKey(CustomerUser, on_delete=models.CASCADE, null=True, blank=True)
+    # Indexed through order_user_created_idx below
+    user = models.ForeignKey(CustomerUser, on_delete=models.CASCADE, null=True, blank=True, db_index=False)
     email = models.EmailField(null=True, blank=False)
     first_name = models.CharField(max_length=50, null=True, blank=False)
     last_name = models.CharField(max_length=50, null=True, blank=False)
@@ -51,6 +53,9 @@ class Order(models.Model):
     note = models.TextField(max_length=300, null=True, blank=True)
     
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Product.eco_point x quantity over the items, taken at checkout; null
+    # for orders placed before it was recorded, until backfill_customer_stats
+    eco_points = models.PositiveIntegerField(null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     shipping_method = models.CharField(max_length=20, choices=SHIPPING_CHOICES, default='standard')  # Fixed default
     payment_method = models.CharField(max_length=20, choices=PAYMENT_CHOICES, default='credit_card')
@@ -60,6 +65,10 @@ class Order(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # A customer's order history, newest first
+            models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+        ]
     
     def __str__(self):
         return f"Order #{self.id} - {self.user.email if self.user else self.email}"
@@ -90,7 +99,8 @@ class Order(models.Model):
 
 
 class OrderItem(models.Model):
-    order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE)
+    # Indexed through orderitem_order_created_idx below
+    order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE, db_index=False)
     product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True)
     product_name = models.CharField(max_length=200)  # Store the product name at time of order
     quantity = models.PositiveIntegerField(default=1, validators=[MinValueValidator(1)])
@@ -100,6 +110,9 @@ class OrderItem(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['order', '-created_at'], name='orderitem_order_created_idx'),
+        ]
     
     @property
     def subtotal(self):
@@ -110,8 +123,92 @@ class OrderItem(models.Model):
     
     def save(self, *args, **kwargs):
         if not self.product_name and self.product:
-            self.product_name = self.product.name
+            self.product_name = self.product.product_name
         super().save(*args, **kwargs)
-        
-        # Update the parent order's total amount
-        self.order.save()
\ No newline at end of file
+
+
+class IdempotencyKey(models.Model):
+    """Stored checkout response for a client-supplied Idempotency-Key; see order_management.idempotency"""
+    owner = models.CharField(max_length=64)  # "user:<id>" or "guest"
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    # Filled in by the same transaction that inserts the row, so other
+    # requests only ever see the row with its response
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(encoder=DjangoJSONEncoder, null=True)
+    created_at = models.DateTimeField(default=now)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'key'], name='idempotency_owner_key_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.owner} {self.key} -> {self.status_code}"
+
+
+class Cart(models.Model):
+    """
+    A customer's server-side cart; see order_management.cart.
+
+    subtotal and item_count are kept current by every cart mutation, so the
+    totals are read from this row instead of being summed over the items.
+    """
+    user = models.OneToOneField(CustomerUser, on_delete=models.CASCADE, related_name='cart')
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    item_count = models.PositiveIntegerField(default=0)  # units, not lines
+    created_at = models.DateTimeField(default=now)
+    updated_at = models.DateTimeField(default=now)
+
+    def __str__(self):
+        return f"Cart of {self.user_id}: {self.item_count} items, {self.subtotal}"
+
+
+class CartItem(models.Model):
+    # Indexed through cartitem_cart_product_uniq below
+    cart = models.ForeignKey(Cart, related_name='items', on_delete=models.CASCADE, db_index=False)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=1, validators=[MinValueValidator(1)])
+    price = models.DecimalField(max_digits=10, decimal_places=2)  # Unit price when added or last repriced
+    created_at = models.DateTimeField(default=now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'], name='cartitem_cart_product_uniq'),
+        ]
+
+    @property
+    def subtotal(self):
+        return self.price * self.quantity
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} in cart {self.cart_id}"
+
+
+class CustomerStats(models.Model):
+    """
+    Per-customer totals over their orders that are not cancelled; see
+    order_management.customer_stats.
+
+    Kept current in the same transaction as every order write, so a
+    customer's impact is read from this row instead of summed over their
+    orders, and the eco leaderboard is a scan of customerstats_eco_idx.
+    """
+    user = models.OneToOneField(CustomerUser, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    # Signed, so a delta applied out of order cannot fail a CHECK on the
+    # order write it belongs to; backfill_customer_stats corrects drift
+    order_count = models.IntegerField(default=0)
+    lifetime_spend = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    eco_points = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=now)
+
+    class Meta:
+        verbose_name_plural = 'customer stats'
+        indexes = [
+            # Leaderboard order; user breaks ties so ranks are stable
+            models.Index(fields=['-eco_points', 'user'], name='customerstats_eco_idx'),
+        ]
+
+    def __str__(self):
+        return f"Stats of {self.user_id}: {self.order_count} orders, {self.lifetime_spend}, {self.eco_points} eco points"
@@ -0,0 +1,111 @@
+"""
+Typed decoding of checkout request bodies.
+
+parse_checkout() checks the whole body in one pass and returns a
+CheckoutPayload, or raises CheckoutError (400) naming the first bad field.
+It runs before any database work, so a malformed checkout never takes an
+idempotency key, locks a cart or reads a product.
+"""
+from dataclasses import dataclass, field
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+
+from order_management.checkout import ORDER_FIELDS, CheckoutError
+from order_management.models import Order
+
+MAX_ITEMS = 100
+SHIPPING_METHODS = dict(Order.SHIPPING_CHOICES)
+PAYMENT_METHODS = dict(Order.PAYMENT_CHOICES)
+MAX_LENGTHS = {name: Order._meta.get_field(name).max_length for name in (*ORDER_FIELDS, 'note')}
+
+
+@dataclass(frozen=True)
+class CheckoutItem:
+    product_id: str
+    quantity: int
+
+
+@dataclass(frozen=True)
+class CheckoutPayload:
+    items: tuple = ()
+    shipping_method: str = 'sd'
+    payment_method: str = 'cod'
+    note: str = ''
+    # ORDER_FIELDS the client sent; the rest keep the model defaults
+    contact: dict = field(default_factory=dict)
+
+    def quantities(self):
+        """Product id -> total quantity, with repeated products merged into one line"""
+        quantities = {}
+        for item in self.items:
+            quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+        return quantities
+
+
+def is_integer(value):
+    # bool is an int subclass, but true is not a quantity
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def parse_item(index, item):
+    if not isinstance(item, dict):
+        raise CheckoutError(f'items[{index}] must be an object')
+    product_id, quantity = item.get('product_id'), item.get('quantity')
+    if not (isinstance(product_id, str) or is_integer(product_id)) or not str(product_id).strip():
+        raise CheckoutError(f'items[{index}].product_id must be a non-empty string')
+    if not is_integer(quantity) or quantity < 1:
+        raise CheckoutError(f'items[{index}].quantity must be a positive integer')
+    return CheckoutItem(str(product_id).strip(), quantity)
+
+
+def parse_text(data, name):
+    value = data[name]
+    if not isinstance(value, str):
+        raise CheckoutError(f'{name} must be a string')
+    if MAX_LENGTHS[name] and len(value) > MAX_LENGTHS[name]:
+        raise CheckoutError(f'{name} must be at most {MAX_LENGTHS[name]} characters')
+    return value
+
+
+def parse_choice(data, name, choices, default):
+    value = data.get(name, default)
+    if value not in choices:
+        raise CheckoutError(f'{name} must be one of {", ".join(choices)}')
+    return value
+
+
+def parse_checkout(data, with_items=True):
+    """
+    Decode a checkout body. With ``with_items`` false (a cart checkout, whose
+    lines come from the cart) any ``items`` in the body are ignored.
+    """
+    if not isinstance(data, dict):
+        raise CheckoutError('Request body must be a JSON object')
+
+    items = ()
+    if with_items:
+        raw_items = data.get('items')
+        if not raw_items:
+            raise CheckoutError('No items provided')
+        if not isinstance(raw_items, list):
+            raise CheckoutError('items must be a list')
+        if len(raw_items) > MAX_ITEMS:
+            raise CheckoutError(f'At most {MAX_ITEMS} items per order')
+        items = tuple(parse_item(i, item) for i, item in enumerate(raw_items))
+
+    # Absent and null both leave the field to its model default
+    contact = {name: parse_text(data, name) for name in ORDER_FIELDS if data.get(name) is not None}
+    if contact.get('email'):
+        try:
+            validate_email(contact['email'])
+        except ValidationError:
+            raise CheckoutError('email must be a valid email address')
+
+    return CheckoutPayload(
+        items=items,
+        shipping_method=parse_choice(data, 'shipping_method', SHIPPING_METHODS, 'sd'),
+        payment_method=parse_choice(data, 'payment_method', PAYMENT_METHODS, 'cod'),
+        note=parse_text(data, 'note') if data.get('note') is not None else '',
+        contact=contact,
+    )
@@ -1,3 +1,602 @@
+import csv
+import io
+import json
+from decimal import Decimal
+import datetime
+import jwt
+from django.conf import settings
+from unittest import mock
+from django.db import IntegrityError
+from django.db.models.signals import post_save
+from django.core.management import CommandError, call_command
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from order_management.models import CustomerStats, IdempotencyKey, Order, OrderItem
+from product_management import inventory
+from product_management.models import Product, StockShard
+from user_management.authentication import issue_token
+from user_management.models import CustomerUser
 
 # Create your tests here.
+
+CHECKOUT_URL = '/api/orders/checkout/'
+
+
+def checkout_payload(items, **fields):
+    payload = {
+        'email': 'buyer@example.com',
+        'first_name': 'Eco',
+        'last_name': 'Buyer',
+        'address': '1 Green Road',
+        'shipping_method': 'sd',
+        'payment_method': 'cod',
+        'items': items,
+    }
+    payload.update(fields)
+    return payload
+
+
+class CheckoutTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(1, 6):
+            Product.objects.create(product_id=str(i), product_name=f'Product {i}', price='20.00', stock=5)
+
+    def checkout(self, items, **fields):
+        return self.client.post(CHECKOUT_URL, checkout_payload(items, **fields), content_type='application/json')
+
+    def test_checkout_creates_order_and_decrements_stock(self):
+        response = self.checkout([{'product_id': '1', 'quantity': 2}, {'product_id': '2', 'quantity': 1}])
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get(id=response.json()['id'])
+        self.assertEqual(order.total_amount, Decimal('110.00'))  # 3 x 20 + 50 shipping
+        self.assertEqual(order.items.count(), 2)
+        self.assertEqual(Product.objects.get(product_id='1').stock, 3)
+        self.assertEqual(Product.objects.get(product_id='2').stock, 4)
+
+    def test_paid_status_for_non_cod(self):
+        response = self.checkout([{'product_id': '1', 'quantity': 1}], payment_method='credit_card')
+        self.assertEqual(response.json()['status'], 'paid')
+
+    def test_query_count_does_not_grow_with_items(self):
+        # savepoint, product fetch, order insert, counter job insert, item insert, stock update, release
+        with self.assertNumQueries(7):
+            self.checkout([{'product_id': '1', 'quantity': 1}])
+        with self.assertNumQueries(7):
+            self.checkout([{'product_id': str(i), 'quantity': 1} for i in range(1, 6)])
+
+    def test_oversell_is_rejected_without_side_effects(self):
+        response = self.checkout([{'product_id': '1', 'quantity': 1}, {'product_id': '2', 'quantity': 6}])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+        self.assertEqual(Product.objects.get(product_id='1').stock, 5)
+
+    def test_unknown_product(self):
+        response = self.checkout([{'product_id': '999', 'quantity': 1}])
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Order.objects.exists())
+
+    def test_invalid_item(self):
+        response = self.checkout([{'product_id': '1', 'quantity': 0}])
+        self.assertEqual(response.status_code, 400)
+
+    def test_expired_token_checks_out_as_guest(self):
+        user = CustomerUser.objects.create_user(username='buyer', password='secret-pass-123')
+        expired = jwt.encode(
+            {'id': user.id, 'exp': datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=1)},
+            settings.SECRET_KEY, algorithm='HS256',
+        )
+        response = self.client.post(
+            CHECKOUT_URL, checkout_payload([{'product_id': '1', 'quantity': 1}]),
+            content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {expired}',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertIsNone(Order.objects.get().user_id)
+
+
+class CheckoutPayloadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Product.objects.create(product_id='1', product_name='Product 1', price='20.00', stock=5)
+
+    def test_bad_input_is_rejected_before_any_query(self):
+        item = {'product_id': '1', 'quantity': 1}
+        cases = [
+            ['not', 'an', 'object'],
+            checkout_payload([]),
+            checkout_payload({'product_id': '1'}),
+            checkout_payload([item] * 101),
+            checkout_payload(['1']),
+            checkout_payload([{'quantity': 1}]),
+            checkout_payload([{'product_id': ' ', 'quantity': 1}]),
+            checkout_payload([{'product_id': '1', 'quantity': '2'}]),
+            checkout_payload([{'product_id': '1', 'quantity': True}]),
+            checkout_payload([{'product_id': '1', 'quantity': 1.5}]),
+            checkout_payload([item], shipping_method='teleport'),
+            checkout_payload([item], payment_method=None),
+            checkout_payload([item], email='not-an-email'),
+            checkout_payload([item], first_name='x' * 51),
+            checkout_payload([item], postal_code=10110),
+        ]
+        for body in cases:
+            with self.subTest(body=body), self.assertNumQueries(0):
+                response = self.client.post(CHECKOUT_URL, body, content_type='application/json', HTTP_IDEMPOTENCY_KEY='k')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_error_names_the_field(self):
+        response = self.client.post(
+            CHECKOUT_URL, checkout_payload([{'product_id': '1', 'quantity': 1}, {'product_id': '1', 'quantity': 0}]),
+            content_type='application/json',
+        )
+        self.assertEqual(response.json()['error'], 'items[1].quantity must be a positive integer')
+
+    def test_repeated_products_merge_and_nulls_keep_defaults(self):
+        response = self.client.post(
+            CHECKOUT_URL,
+            checkout_payload([{'product_id': 1, 'quantity': 1}, {'product_id': '1', 'quantity': 2}], postal_code=None, note=None),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get()
+        self.assertEqual((order.postal_code, order.note), ('00000', ''))
+        self.assertEqual(list(order.items.values_list('product_id', 'quantity')), [('1', 3)])
+
+
+class IdempotentCheckoutTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomerUser.objects.create_user(username='buyer', password='secret-pass-123')
+        Product.objects.create(product_id='1', product_name='Tote', price='20.00', stock=5)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def checkout(self, key, quantity=1):
+        return self.client.post(
+            CHECKOUT_URL, checkout_payload([{'product_id': '1', 'quantity': quantity}]),
+            format='json', HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_retry_replays_stored_response(self):
+        first = self.checkout('abc')
+        self.assertEqual(first.status_code, 201)
+        # savepoints for the checkout and the key, failed key insert, rollback,
+        # two releases, key lookup; no product or order item queries
+        with self.assertNumQueries(7):
+            retry = self.checkout('abc')
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(Product.objects.get(product_id='1').stock, 4)
+
+    def test_different_keys_create_separate_orders(self):
+        self.checkout('a')
+        self.checkout('b')
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_key_reused_for_another_request_is_rejected(self):
+        self.checkout('abc')
+        response = self.checkout('abc', quantity=2)
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_keys_are_per_customer(self):
+        self.checkout('abc')
+        self.client.force_authenticate(CustomerUser.objects.create_user(username='other', password='secret-pass-123'))
+        response = self.checkout('abc')
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_guest_retry_replays_only_the_same_request(self):
+        self.client.force_authenticate(None)
+        first = self.checkout('abc')
+        retry = self.checkout('abc')
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        # Another guest reusing the key with their own body gets their own order
+        other = self.checkout('abc', quantity=2)
+        self.assertEqual(other.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', other)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_failed_checkout_is_not_stored(self):
+        self.assertEqual(self.checkout('abc', quantity=6).status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        Product.objects.filter(product_id='1').update(stock=10)
+        self.assertEqual(self.checkout('abc', quantity=6).status_code, 201)
+
+    def test_integrity_error_in_checkout_is_not_retried(self):
+        # Only a taken key is retried; a failing checkout must not loop
+        with mock.patch('order_management.views.place_order', side_effect=IntegrityError('FOREIGN KEY constraint failed')) as place:
+            response = self.checkout('abc')
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(place.call_count, 1)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(self.checkout('abc').status_code, 201)
+
+    def test_expired_keys_run_again_and_are_purged(self):
+        self.checkout('abc')
+        IdempotencyKey.objects.update(expires_at=timezone.now() - datetime.timedelta(seconds=1))
+        self.assertNotIn('Idempotent-Replayed', self.checkout('abc'))
+        self.assertEqual(Order.objects.count(), 2)
+
+        IdempotencyKey.objects.update(expires_at=timezone.now() - datetime.timedelta(seconds=1))
+        call_command('purge_idempotency_keys', '--batch-size', '1', stdout=io.StringIO())
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+class ShardedStockTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Product.objects.create(product_id='1', product_name='Hot', price='20.00', stock=10)
+        Product.objects.create(product_id='2', product_name='Plain', price='20.00', stock=10)
+        inventory.shard_product('1', 4)
+
+    def checkout(self, items):
+        return self.client.post(CHECKOUT_URL, checkout_payload(items), content_type='application/json')
+
+    def shard_stocks(self):
+        return list(StockShard.objects.filter(product_id='1').order_by('shard').values_list('stock', flat=True))
+
+    def test_sharding_splits_stock_evenly(self):
+        self.assertEqual(self.shard_stocks(), [3, 3, 2, 2])
+        self.assertEqual(Product.objects.get(product_id='1').stock_shards, 4)
+
+    def test_checkout_claims_one_shard_and_leaves_product_row(self):
+        # savepoint, product fetch, order insert, counter job insert, item insert,
+        # plain stock update, shard claim, release
+        with self.assertNumQueries(8):
+            response = self.checkout([{'product_id': '1', 'quantity': 2}, {'product_id': '2', 'quantity': 1}])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(sum(self.shard_stocks()), 8)
+        self.assertEqual(Product.objects.get(product_id='1').stock, 10)
+        self.assertEqual(Product.objects.get(product_id='2').stock, 9)
+
+    def test_claim_spreads_over_shards_and_never_oversells(self):
+        response = self.checkout([{'product_id': '1', 'quantity': 7}])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(sum(self.shard_stocks()), 3)
+
+        response = self.checkout([{'product_id': '1', 'quantity': 4}])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(sum(self.shard_stocks()), 3)
+        self.assertTrue(all(stock >= 0 for stock in self.shard_stocks()))
+
+        for _ in range(3):
+            self.assertEqual(self.checkout([{'product_id': '1', 'quantity': 1}]).status_code, 201)
+        self.assertEqual(self.checkout([{'product_id': '1', 'quantity': 1}]).status_code, 409)
+
+    def test_product_sharded_during_checkout_is_a_conflict(self):
+        def shard_plain_product(sender, created, **kwargs):
+            if created:
+                inventory.shard_product('2', 2)
+
+        # The order row is written after the products are read, before their stock
+        post_save.connect(shard_plain_product, sender=Order)
+        self.addCleanup(post_save.disconnect, shard_plain_product, sender=Order)
+        response = self.checkout([{'product_id': '2', 'quantity': 1}])
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Order.objects.exists())
+
+    def test_rebalance_evens_shards_and_refreshes_product_stock(self):
+        StockShard.objects.filter(product_id='1', shard=0).update(stock=0)
+        call_command('rebalance_stock', stdout=io.StringIO())
+        self.assertEqual(self.shard_stocks(), [2, 2, 2, 1])
+        self.assertEqual(Product.objects.get(product_id='1').stock, 7)
+
+    def test_unsharding_folds_stock_back(self):
+        self.checkout([{'product_id': '1', 'quantity': 3}])
+        call_command('shard_stock', '1', '0', stdout=io.StringIO())
+        product = Product.objects.get(product_id='1')
+        self.assertEqual((product.stock, product.stock_shards), (7, 0))
+        self.assertFalse(StockShard.objects.exists())
+
+
+class OrderQueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomerUser.objects.create_user(username='buyer', password='secret-pass-123')
+        cls.products = [
+            Product.objects.create(product_id=str(i), product_name=f'Product {i}', price='20.00', stock=100)
+            for i in range(1, 4)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_orders(self, count):
+        for _ in range(count):
+            order = Order.objects.create(user=self.user, shipping_method='sd')
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, product_name=product.product_name, quantity=1, price=product.price)
+                for product in self.products
+            ])
+        return order
+
+    def test_list_query_count_is_constant(self):
+        self.add_orders(1)
+        # orders, items joined with products
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/orders/')
+        self.assertEqual(len(response.json()), 1)
+
+        self.add_orders(5)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/orders/')
+        self.assertEqual(len(response.json()), 6)
+        self.assertEqual(response.json()[0]['subtotal'], '110.00')
+
+    def test_retrieve_query_count(self):
+        order = self.add_orders(1)
+        with self.assertNumQueries(2):
+            self.client.get(f'/api/orders/{order.id}/')
+
+    def test_order_product_details_query_count(self):
+        order = self.add_orders(1)
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/orders/products/{order.id}/')
+        self.assertEqual(len(response.json()), 3)
+
+
+class OrderExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomerUser.objects.create_superuser(username='admin', password='secret-pass-123')
+        product = Product.objects.create(product_id='1', product_name='Tote', price='80.00')
+        paid = Order.objects.create(status='paid', total_amount='210.00', email='a@example.com')
+        OrderItem.objects.create(order=paid, product=product, product_name='Tote', quantity=2, price='80.00')
+        OrderItem.objects.create(order=paid, product=None, product_name='Retired', quantity=1, price='50.00')
+        Order.objects.create(status='pending', total_amount='0.00')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def export(self, **params):
+        response = self.client.get('/api/orders/export/', params)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson_nests_items(self):
+        lines = [json.loads(line) for line in self.export().splitlines()]
+        self.assertEqual([len(order['items']) for order in lines], [2, 0])
+        self.assertEqual(lines[0]['items'][0]['product_name'], 'Tote')
+        self.assertEqual(lines[0]['total_amount'], '210.00')
+
+    def test_csv_filtered_by_status(self):
+        rows = list(csv.reader(io.StringIO(self.export(output='csv', status='paid'))))
+        self.assertEqual(rows[0][0], 'id')
+        self.assertEqual(len(rows), 3)  # header + one line per item
+
+    async def test_streams_asynchronously_under_asgi(self):
+        headers = {'Authorization': f'Bearer {issue_token(self.admin)}'}
+        response = await self.async_client.get('/api/orders/export/', {'output': 'csv'}, headers=headers)
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual(len(list(csv.reader(io.StringIO(body)))), 4)  # header + two items + the empty order
+
+    def test_requires_admin(self):
+        self.client.force_authenticate(None)
+        self.assertIn(self.client.get('/api/orders/export/').status_code, (401, 403))
+
+    def test_impossible_dates_are_rejected(self):
+        for params in ({'start': '2024-02-30'}, {'end': 'yesterday'}):
+            with self.subTest(params=params):
+                response = self.client.get('/api/orders/export/', params)
+                self.assertEqual(response.status_code, 400)
+        with self.assertRaisesMessage(CommandError, '--start must be a YYYY-MM-DD date'):
+            call_command('export_orders', '--start', '2024-02-30', stdout=io.StringIO())
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('export_orders', '--status', 'pending', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 1)
+
+
+class CartTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomerUser.objects.create_user(username='buyer', password='secret-pass-123')
+        for i in range(1, 4):
+            Product.objects.create(product_id=str(i), product_name=f'Product {i}', price=f'{i}0.00', stock=5)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, action, **data):
+        return self.client.post(f'/api/carts/{action}/', data, format='json')
+
+    def assertTotalsMatchItems(self, cart):
+        self.assertEqual(Decimal(cart['subtotal']), sum(Decimal(item['subtotal']) for item in cart['items']))
+        self.assertEqual(cart['item_count'], sum(item['quantity'] for item in cart['items']))
+
+    def test_mutations_keep_totals_current(self):
+        self.post('add_item', product_id='1', quantity=2)
+        self.post('add_item', product_id='2')
+        cart = self.post('add_item', product_id='1').json()
+        self.assertEqual([(item['product_id'], item['quantity']) for item in cart['items']], [('1', 3), ('2', 1)])
+        self.assertEqual((cart['subtotal'], cart['item_count']), ('50.00', 4))
+        self.assertTotalsMatchItems(cart)
+
+        line = cart['items'][0]['id']
+        cart = self.post('update_quantity', item_id=line, quantity=1).json()
+        self.assertEqual((cart['subtotal'], cart['item_count']), ('30.00', 2))
+        cart = self.post('remove_item', item_id=cart['items'][1]['id']).json()
+        self.assertEqual((cart['subtotal'], cart['item_count']), ('10.00', 1))
+        cart = self.post('update_quantity', item_id=line, quantity=0).json()
+        self.assertEqual(cart, {'items': [], 'item_count': 0, 'subtotal': '0.00'})
+
+    def test_reads_are_one_query(self):
+        self.post('add_item', product_id='1')
+        self.post('add_item', product_id='3')
+        with self.assertNumQueries(1):
+            cart = self.client.get('/api/carts/current/').json()
+        self.assertEqual(cart['subtotal'], '40.00')
+
+    def test_rejects_bad_changes(self):
+        self.assertEqual(self.post('add_item', product_id='nope').status_code, 404)
+        self.assertEqual(self.post('add_item', product_id='1', quantity=6).status_code, 400)
+        self.assertEqual(self.post('add_item', product_id='1', quantity='x').status_code, 400)
+        self.assertEqual(self.post('remove_item', item_id=999).status_code, 404)
+        other = CustomerUser.objects.create_user(username='other', password='secret-pass-123')
+        self.client.force_authenticate(other)
+        line = self.post('add_item', product_id='1').json()['items'][0]['id']
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.post('remove_item', item_id=line).status_code, 404)
+        self.assertEqual(APIClient().get('/api/carts/current/').status_code, 401)
+
+    def test_checkout_converts_cart_to_order(self):
+        self.post('add_item', product_id='1', quantity=2)
+        self.post('add_item', product_id='3')
+        response = self.post('checkout', **checkout_payload([]))
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get()
+        self.assertEqual(order.user, self.user)
+        self.assertEqual(order.total_amount, Decimal('100.00'))  # 50.00 of items + 50.00 standard delivery
+        self.assertEqual(sorted(order.items.values_list('product_id', 'quantity')), [('1', 2), ('3', 1)])
+        self.assertEqual(Product.objects.get(product_id='1').stock, 3)
+        self.assertEqual(self.client.get('/api/carts/current/').json()['item_count'], 0)
+        self.assertEqual(self.post('checkout', **checkout_payload([])).status_code, 400)
+
+    def test_checkout_retry_replays_order(self):
+        self.post('add_item', product_id='1')
+        first = self.client.post('/api/carts/checkout/', checkout_payload([]), format='json', HTTP_IDEMPOTENCY_KEY='k1')
+        retry = self.client.post('/api/carts/checkout/', checkout_payload([]), format='json', HTTP_IDEMPOTENCY_KEY='k1')
+        self.assertEqual((first.status_code, retry.status_code), (201, 201))
+        self.assertEqual(retry.json()['id'], first.json()['id'])
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_failed_checkout_keeps_cart(self):
+        self.post('add_item', product_id='1', quantity=3)
+        Product.objects.filter(product_id='1').update(stock=2)
+        self.assertEqual(self.post('checkout', **checkout_payload([])).status_code, 400)
+        self.assertEqual(self.client.get('/api/carts/current/').json()['item_count'], 3)
+        self.assertFalse(Order.objects.exists())
+
+    def test_changed_prices_are_confirmed_before_checkout(self):
+        self.post('add_item', product_id='1', quantity=2)
+        Product.objects.filter(product_id='1').update(price='12.50')
+        response = self.post('checkout', **checkout_payload([]))
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['cart']['subtotal'], '25.00')
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.post('checkout', **checkout_payload([])).status_code, 201)
+        self.assertEqual(Order.objects.get().total_amount, Decimal('75.00'))
+
+    def test_deleting_a_product_updates_carts(self):
+        self.post('add_item', product_id='1')
+        self.post('add_item', product_id='2', quantity=2)
+        Product.objects.filter(product_id='2').delete()
+        cart = self.client.get('/api/carts/current/').json()
+        self.assertEqual((cart['subtotal'], cart['item_count']), ('10.00', 1))
+        self.assertTotalsMatchItems(cart)
+
+
+class CustomerStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomerUser.objects.create_user(username='buyer', password='secret-pass-123')
+        Product.objects.create(product_id='1', product_name='Tote', price='20.00', stock=10, eco_point=5)
+        Product.objects.create(product_id='2', product_name='Straw', price='10.00', stock=10, eco_point=2)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def checkout(self, items):
+        return self.client.post(CHECKOUT_URL, checkout_payload(items), format='json')
+
+    def totals(self, user=None):
+        stats = CustomerStats.objects.get(user=user or self.user)
+        return stats.order_count, stats.lifetime_spend, stats.eco_points
+
+    def test_checkout_and_cancellation_move_the_totals(self):
+        first = self.checkout([{'product_id': '1', 'quantity': 2}, {'product_id': '2', 'quantity': 1}]).json()
+        self.assertEqual(Order.objects.get(id=first['id']).eco_points, 12)
+        self.checkout([{'product_id': '2', 'quantity': 3}])
+        self.assertEqual(self.totals(), (2, Decimal('180.00'), 18))  # 100.00 + 80.00, shipping included
+
+        response = self.client.patch(f"/api/orders/{first['id']}/", {'status': 'cancelled'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.totals(), (1, Decimal('80.00'), 6))
+        self.client.patch(f"/api/orders/{first['id']}/", {'status': 'paid'}, format='json')
+        self.assertEqual(self.totals(), (2, Decimal('180.00'), 18))
+
+        Order.objects.get(id=first['id']).delete()
+        self.assertEqual(self.totals(), (1, Decimal('80.00'), 6))
+
+    def test_deleting_a_customer_with_orders(self):
+        self.checkout([{'product_id': '1', 'quantity': 1}])
+        self.user.delete()
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(CustomerStats.objects.exists())
+
+    def test_failed_checkout_leaves_totals_alone(self):
+        self.checkout([{'product_id': '1', 'quantity': 1}])
+        response = self.checkout([{'product_id': '1', 'quantity': 1}, {'product_id': '2', 'quantity': 11}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.totals(), (1, Decimal('70.00'), 5))
+
+    def test_leaderboard_and_impact(self):
+        others = [CustomerUser.objects.create_user(username=f'user{i}', password='secret-pass-123') for i in range(3)]
+        CustomerStats.objects.bulk_create([
+            CustomerStats(user=others[0], eco_points=50),
+            CustomerStats(user=others[1], eco_points=10),
+            CustomerStats(user=others[2], eco_points=0),
+        ])
+        self.checkout([{'product_id': '1', 'quantity': 2}])  # 10 points, tied with user1 who joined later
+
+        with self.assertNumQueries(1):
+            response = APIClient().get('/api/leaderboard/eco')
+        self.assertEqual(response.json()['data'], [
+            {'rank': 1, 'username': 'user0', 'eco_points': 50},
+            {'rank': 2, 'username': 'buyer', 'eco_points': 10},
+            {'rank': 3, 'username': 'user1', 'eco_points': 10},
+        ])
+        self.assertEqual(len(APIClient().get('/api/leaderboard/eco', {'limit': 1}).json()['data']), 1)
+        self.assertEqual(APIClient().get('/api/leaderboard/eco', {'limit': 'x'}).status_code, 400)
+
+        impact = self.client.get('/api/orders/impact/').json()
+        self.assertEqual(impact, {'order_count': 1, 'lifetime_spend': '90.00', 'eco_points': 10, 'rank': 2})
+        self.client.force_authenticate(others[2])
+        self.assertEqual(self.client.get('/api/orders/impact/').json()['rank'], None)
+
+    def test_backfill_builds_totals_from_existing_orders(self):
+        other = CustomerUser.objects.create_user(username='other', password='secret-pass-123')
+        tote, straw = Product.objects.get(product_id='1'), Product.objects.get(product_id='2')
+        # Bulk writes send no signals, like orders placed before the totals existed
+        orders = Order.objects.bulk_create([
+            Order(user=self.user, status='paid', total_amount='60.00'),
+            Order(user=self.user, status='cancelled', total_amount='70.00'),
+            Order(user=other, status='pending', total_amount='30.00'),
+            Order(user=None, status='paid', total_amount='55.00'),
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=orders[0], product=tote, product_name='Tote', quantity=1, price='20.00'),
+            OrderItem(order=orders[0], product=straw, product_name='Straw', quantity=2, price='10.00'),
+            OrderItem(order=orders[0], product=None, product_name='Retired', quantity=1, price='5.00'),
+            OrderItem(order=orders[1], product=tote, product_name='Tote', quantity=1, price='20.00'),
+            OrderItem(order=orders[2], product=straw, product_name='Straw', quantity=1, price='10.00'),
+        ])
+        CustomerStats.objects.create(user=other, order_count=7, eco_points=99)  # drifted
+
+        out = io.StringIO()
+        call_command('backfill_customer_stats', '--chunk-size', '2', stdout=out)
+        self.assertIn('Filled eco points on 4 orders; rebuilt 2 customers', out.getvalue())
+        self.assertEqual(list(Order.objects.order_by('id').values_list('eco_points', flat=True)), [9, 5, 2, 0])
+        self.assertEqual(self.totals(), (1, Decimal('60.00'), 9))
+        self.assertEqual(self.totals(other), (1, Decimal('30.00'), 2))
+
+        # New orders keep counting on top of the rebuilt totals
+        self.checkout([{'product_id': '1', 'quantity': 1}])
+        self.assertEqual(self.totals(), (2, Decimal('130.00'), 14))
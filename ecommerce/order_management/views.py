@@ -1,21 +1,34 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django.db import transaction
-from .models import Order, OrderItem
+from django.db.models import Prefetch
+from .models import CustomerStats, Order, OrderItem
 from .serializers import OrderSerializer, OrderItemSerializer
-from product_management.models import Product
+from .checkout import place_order, CheckoutError
+from . import cart, customer_stats, idempotency
+from .payloads import parse_checkout
+from .export import export_orders, parse_day, FORMATS
+from product_management.serializers import format_decimal
+from ecommerce_service.responses import streaming_response
 from rest_framework.permissions import AllowAny
 from rest_framework.views import APIView
 
+def with_items(queryset):
+    """Load an order queryset's items and their products in one extra query"""
+    return queryset.prefetch_related(
+        Prefetch('items', queryset=OrderItem.objects.select_related('product'))
+    )
+
+
 class OrderProductDetails(APIView):
     permission_classes = [AllowAny]  # Allow unauthenticated access
 
     def get(self, request, order_id):
         try:
             # Fetch the order with the provided order_id
-            order = Order.objects.get(id=order_id)
+            order = with_items(Order.objects).get(id=order_id)
 
             # Serialize the order items (products in the order)
             order_items = order.items.all()
@@ -25,13 +38,63 @@ class OrderProductDetails(APIView):
         except Order.DoesNotExist:
             return Response({'error': 'Order not found'}, status=404)
 
+class OrderExportView(APIView):
+    """Stream orders with their items as NDJSON or CSV for reporting"""
+    permission_classes = [IsAdminUser]
+    content_types = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+    def get(self, request):
+        # 'format' is reserved by DRF for renderer selection
+        output_format = request.query_params.get('output', 'ndjson')
+        if output_format not in FORMATS:
+            return Response({'error': f'output must be one of {", ".join(FORMATS)}'}, status=400)
+
+        filters = {}
+        for name in ('start', 'end'):
+            value = request.query_params.get(name)
+            if value:
+                filters[name] = parse_day(value)
+                if filters[name] is None:
+                    return Response({'error': f'{name} must be a YYYY-MM-DD date'}, status=400)
+
+        statuses = [s for s in request.query_params.get('status', '').split(',') if s]
+        valid_statuses = dict(Order.STATUS_CHOICES)
+        if any(s not in valid_statuses for s in statuses):
+            return Response({'error': 'Unknown order status'}, status=400)
+        filters['statuses'] = statuses
+
+        response = streaming_response(
+            request, export_orders(output_format, **filters),
+            content_type=self.content_types[output_format],
+        )
+        response['Content-Disposition'] = f'attachment; filename="orders.{output_format}"'
+        return response
+
+class EcoLeaderboardView(APIView):
+    """The customers with the most eco points: GET /api/leaderboard/eco?limit=10"""
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get('limit', customer_stats.LEADERBOARD_SIZE))
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=400)
+        limit = min(max(limit, 1), customer_stats.MAX_LEADERBOARD_SIZE)
+        rows = customer_stats.leaderboard(limit)
+        return Response({
+            'data': [
+                {'rank': rank, 'username': row['user__username'], 'eco_points': row['eco_points']}
+                for rank, row in enumerate(rows, start=1)
+            ],
+        })
+
 class OrderViewSet(viewsets.ModelViewSet):
     serializer_class = OrderSerializer
     
     def get_queryset(self):
         user = self.request.user
         if user.is_authenticated:
-            return Order.objects.filter(user=user)
+            return with_items(Order.objects.filter(user=user))
         return Order.objects.none()
 
     def get_permissions(self):
@@ -52,66 +115,103 @@ class OrderViewSet(viewsets.ModelViewSet):
     #         self.permission_classes = [IsAuthenticated]
     #     return super().get_permissions()
     
+    def perform_update(self, serializer):
+        # The customer's totals move in the same transaction (see order_management.customer_stats)
+        with transaction.atomic():
+            serializer.save()
+
+    @action(detail=False, methods=['get'])
+    def impact(self, request):
+        """The signed-in customer's totals and leaderboard rank, read from their CustomerStats row"""
+        stats = CustomerStats.objects.filter(user=request.user).first() or CustomerStats(user=request.user)
+        return Response({
+            'order_count': stats.order_count,
+            'lifetime_spend': format_decimal(stats.lifetime_spend, 2),
+            'eco_points': stats.eco_points,
+            'rank': customer_stats.rank_of(stats),
+        })
+
     @action(detail=False, methods=['post'])
     def checkout(self, request):
         user = request.user if request.user.is_authenticated else None
+        try:
+            payload = parse_checkout(request.data)
+        except CheckoutError as e:
+            return Response({'error': e.message}, status=e.status_code)
+        return checkout_response(request, user, lambda: place_order(user, payload))
+
+
+class CartViewSet(viewsets.ViewSet):
+    """The signed-in customer's server-side cart; every action answers with the updated cart"""
+    permission_classes = [IsAuthenticated]
+
+    def data(self, request):
+        return request.data if isinstance(request.data, dict) else {}
+
+    def change(self, request, mutate, *args):
+        try:
+            mutate(request.user, *args)
+        except CheckoutError as e:
+            return Response({'error': e.message}, status=e.status_code)
+        return Response(cart.cart_payload(request.user))
+
+    @action(detail=False, methods=['get'])
+    def current(self, request):
+        return Response(cart.cart_payload(request.user))
+
+    @action(detail=False, methods=['post'])
+    def add_item(self, request):
+        data = self.data(request)
+        return self.change(request, cart.add_item, data.get('product_id'), data.get('quantity', 1))
+
+    @action(detail=False, methods=['post'])
+    def update_quantity(self, request):
+        data = self.data(request)
+        return self.change(request, cart.update_quantity, data.get('item_id'), data.get('quantity'))
+
+    @action(detail=False, methods=['post'])
+    def remove_item(self, request):
+        return self.change(request, cart.remove_item, self.data(request).get('item_id'))
 
-        items = request.data.get('items', [])
-        if not items:
-            return Response({'error': 'No items provided'}, status=400)
+    @action(detail=False, methods=['post'])
+    def clear(self, request):
+        return self.change(request, cart.clear)
 
-        # Validate and create order
+    @action(detail=False, methods=['post'])
+    def checkout(self, request):
         try:
-            with transaction.atomic():
-                order = Order.objects.create(
-                    user=user,
-                    email=request.data.get("email"),
-                    first_name=request.data.get("first_name"),
-                    last_name=request.data.get("last_name"),
-                    phone_number=request.data.get("phone_number"),
-                    address=request.data.get("address"),
-                    province=request.data.get("province"),
-                    district=request.data.get("district"),
-                    sub_district=request.data.get("sub_district"),
-                    postal_code=request.data.get("postal_code"),
-                    note=request.data.get("note", ""),
-                    shipping_method=request.data.get("shipping_method", "sd"),
-                    payment_method=request.data.get("payment_method", "cod"),
-                )
-
-                for item in items:
-                    product_id = item.get('product_id')
-                    quantity = item.get('quantity')
-
-                    if not product_id or not quantity:
-                        return Response({'error': 'Invalid item format'}, status=400)
-
-                    product = Product.objects.filter(product_id=product_id).first()
-                    if not product:
-                        return Response({'error': f'Product with id {product_id} not found'}, status=404)
-
-                    OrderItem.objects.create(
-                        order=order,
-                        product=product,
-                        product_name=product.product_name,
-                        quantity=quantity,
-                        price=product.price
-                    )
-
-                    product.stock -= quantity
-                    product.save()
-
-                order.update_total()
-
-                if order.payment_method != "cod":
-                    order.status = "paid"
-                    order.save()
-
-                serializer = OrderSerializer(order)
-                return Response(serializer.data, status=status.HTTP_201_CREATED)
-
-        except Exception as e:
-            return Response({'error': str(e)}, status=500)
+            payload = parse_checkout(request.data, with_items=False)
+        except CheckoutError as e:
+            return Response({'error': e.message}, status=e.status_code)
+        if cart.refresh_prices(request.user):
+            return Response(
+                {'error': cart.PRICES_CHANGED, 'cart': cart.cart_payload(request.user)},
+                status=status.HTTP_409_CONFLICT,
+            )
+        return checkout_response(request, request.user, lambda: cart.checkout(request.user, payload))
+
+
+def checkout_response(request, user, create):
+    """Run ``create`` (which places an order) and answer with the order, honouring Idempotency-Key"""
+    def create_order():
+        return status.HTTP_201_CREATED, OrderSerializer(create()).data
+
+    key = request.headers.get(idempotency.HEADER)
+    headers = {}
+    try:
+        if key is None:
+            status_code, body = create_order()
+        else:
+            # Retries with the same key get the first response back
+            status_code, body, replayed = idempotency.run_once(user, key, request.data, create_order)
+            if replayed:
+                headers[idempotency.REPLAY_HEADER] = 'true'
+    except CheckoutError as e:
+        return Response({'error': e.message}, status=e.status_code)
+    except Exception as e:
+        return Response({'error': str(e)}, status=500)
+
+    return Response(body, status=status_code, headers=headers)
 
 
 
@@ -168,88 +268,6 @@ class OrderViewSet(viewsets.ModelViewSet):
     #     serializer = OrderSerializer(order)
     #     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-
-
-
-    
-    # @action(detail=False, methods=['post'])
-    # def checkout(self, request):
-    #     # Get active cart
-    #     user = request.user
-    #     if user.is_authenticated:
-    #         cart = Cart.objects.filter(user=user, is_active=True).first()
-    #     else:
-    #         session_id = request.session.session_key
-    #         cart = Cart.objects.filter(session_id=session_id, is_active=True).first()
-        
-    #     if not cart or not cart.items.exists():
-    #         return Response(
-    #             {'error': 'Your cart is empty'},
-    #             status=status.HTTP_400_BAD_REQUEST
-    #         )
-        
-    #     # Validate order data
-    #     required_fields = ['full_name', 'email', 'address', 'city', 'postal_code', 
-    #                       'country', 'phone', 'payment_method']
-        
-    #     for field in required_fields:
-    #         if not request.data.get(field):
-    #             return Response(
-    #                 {'error': f'{field} is required'},
-    #                 status=status.HTTP_400_BAD_REQUEST
-    #             )
-        
-    #     try:
-    #         with transaction.atomic():
-    #             # Create order
-    #             order = Order.objects.create(
-    #                 user=user if user.is_authenticated else None,
-    #                 full_name=request.data.get('full_name'),
-    #                 email=request.data.get('email'),
-    #                 address=request.data.get('address'),
-    #                 city=request.data.get('city'),
-    #                 postal_code=request.data.get('postal_code'),
-    #                 country=request.data.get('country'),
-    #                 phone=request.data.get('phone'),
-    #                 payment_method=request.data.get('payment_method'),
-
-    #             )
-                
-    #             # Create order items from cart items
-    #             for cart_item in cart.items.all():
-    #                 OrderItem.objects.create(
-    #                     order=order,
-    #                     product=cart_item.product,
-    #                     product_name=cart_item.product.name,
-    #                     quantity=cart_item.quantity,
-    #                     price=cart_item.product.price
-    #                 )
-                    
-    #                 # Update product stock
-    #                 product = cart_item.product
-    #                 product.stock -= cart_item.quantity
-    #                 product.save()
-                
-    #             # Mark cart as inactive and clear it
-    #             cart.is_active = False
-    #             cart.save()
-                
-    #             # Process payment
-    #             # This would typically involve calling a payment gateway
-    #             # For this example, we'll just mark the order as paid
-    #             if request.data.get('payment_method') != 'cod':
-    #                 order.status = 'paid'
-    #                 order.save()
-                
-    #             serializer = OrderSerializer(order)
-    #             return Response(serializer.data, status=status.HTTP_201_CREATED)
-                
-    #     except Exception as e:
-    #         return Response(
-    #             {'error': str(e)},
-    #             status=status.HTTP_400_BAD_REQUEST
-    #         )
-
 # from django.shortcuts import render
 # from order_management.models import Order
 # from rest_framework.views import APIView
@@ -9,10 +9,13 @@ class ProductAdmin(admin.ModelAdmin):
         "product_name",
         "price",
         "stock",
+        "stock_shards",
         "is_new_release",
         "is_trending",
     )
     list_filter = ("is_new_release", "is_trending")
+    # Changed with the shard_stock command, which moves the stock as well
+    readonly_fields = ("stock_shards",)
     search_fields = (
         "product_id",
         "product_name",
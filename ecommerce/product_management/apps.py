@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ProductManagementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'product_management'
+
+    def ready(self):
+        # Registers the signal handlers for the product cache and dashboard counters
+        from product_management import cache, stats  # noqa: F401
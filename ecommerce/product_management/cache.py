@@ -0,0 +1,180 @@
+import asyncio
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from ecommerce_service.codecs import dumps, loads
+from ecommerce_service.compression import precompress
+from ecommerce_service.replicas import primary
+
+from product_management.models import Product
+
+VERSION_KEY = 'product:version'
+TIMEOUT = getattr(settings, 'PRODUCT_CACHE_TIMEOUT', 300)
+# How long a rebuild may hold the lock before other workers give up waiting
+LOCK_TIMEOUT = 10
+POLL_INTERVAL = 0.05
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def bump_version():
+    """Invalidate every cached product payload at once"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 1, None)
+        cache.incr(VERSION_KEY)
+
+
+async def aget_version():
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        await cache.aadd(VERSION_KEY, 1, None)
+        version = await cache.aget(VERSION_KEY, 1)
+    return version
+
+
+def make_key(*parts, version=None):
+    return ':'.join(['product', f'v{get_version() if version is None else version}', *map(str, parts)])
+
+
+def invalidate_details(product_ids):
+    """
+    Drop the cached detail payloads of ``product_ids`` after an order moved
+    their stock. Catalog pages keep theirs until they expire: bumping the
+    version on every order would empty the whole cache on each checkout.
+    """
+    version = get_version()
+    cache.delete_many([make_key('detail', product_id, version=version) for product_id in product_ids])
+
+
+async def amake_key(*parts):
+    return ':'.join(['product', f'v{await aget_version()}', *map(str, parts)])
+
+
+def make_entry(data):
+    """
+    The rendered body of a payload with its ETag and compressed copies, so a
+    hit is served without serializing or compressing (see CompressionMiddleware)
+    """
+    body = dumps(data)
+    return {'body': body, 'etag': '"%s"' % hashlib.md5(body).hexdigest(), 'compressed': precompress(body)}
+
+
+def entry_response(entry):
+    response = HttpResponse(entry['body'], content_type='application/json')
+    response['ETag'] = entry['etag']
+    response.precompressed = entry['compressed']
+    return response
+
+
+def get_or_build(key, build):
+    """
+    Read-through lookup where concurrent misses are coalesced.
+
+    The first worker to miss takes a short lock with cache.add() and rebuilds;
+    the others poll for its result instead of all hitting the database.
+    """
+    entry = cache.get(key)
+    if entry is not None:
+        return entry
+
+    lock_key = f'{key}:lock'
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    locked = cache.add(lock_key, 1, LOCK_TIMEOUT)
+    while not locked and time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+        locked = cache.add(lock_key, 1, LOCK_TIMEOUT)
+
+    try:
+        entry = cache.get(key)
+        if entry is None:
+            # Never from the replica, or a stale row would be cached under a fresh version
+            with primary():
+                entry = make_entry(build())
+            cache.set(key, entry, TIMEOUT)
+        return entry
+    finally:
+        if locked:
+            cache.delete(lock_key)
+
+
+async def aget_or_build(key, build):
+    """get_or_build for async views; ``build`` is a coroutine function"""
+    entry = await cache.aget(key)
+    if entry is not None:
+        return entry
+
+    lock_key = f'{key}:lock'
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    locked = await cache.aadd(lock_key, 1, LOCK_TIMEOUT)
+    while not locked and time.monotonic() < deadline:
+        await asyncio.sleep(POLL_INTERVAL)
+        entry = await cache.aget(key)
+        if entry is not None:
+            return entry
+        locked = await cache.aadd(lock_key, 1, LOCK_TIMEOUT)
+
+    try:
+        entry = await cache.aget(key)
+        if entry is None:
+            with primary():
+                entry = make_entry(await build())
+            await cache.aset(key, entry, TIMEOUT)
+        return entry
+    finally:
+        if locked:
+            await cache.adelete(lock_key)
+
+
+def not_modified(request, etag):
+    # Weak comparison: a compressed response carries the ETag as W/"..."
+    if_none_match = [tag.removeprefix('W/') for tag in parse_etags(request.headers.get('If-None-Match', ''))]
+    return etag in if_none_match or '*' in if_none_match
+
+
+def cached_response(request, key, build):
+    """Serve a cached payload, answering If-None-Match with 304 when the ETag matches"""
+    entry = get_or_build(key, build)
+    headers = {'ETag': entry['etag']}
+    if not_modified(request, entry['etag']):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    renderer = getattr(request, 'accepted_renderer', None)
+    if renderer is not None and renderer.format != 'json':
+        # e.g. the browsable API; render from the payload as usual
+        return Response(loads(entry['body']), headers=headers)
+    return entry_response(entry)
+
+
+async def acached_response(request, key, build):
+    """cached_response for async views"""
+    entry = await aget_or_build(key, build)
+    if not_modified(request, entry['etag']):
+        response = HttpResponseNotModified()
+        response['ETag'] = entry['etag']
+        return response
+    return entry_response(entry)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_products(sender, **kwargs):
+    bump_version()
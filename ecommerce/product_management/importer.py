@@ -0,0 +1,150 @@
+"""
+Batched product upserts for the import_products command.
+
+Rows are streamed from CSV, NDJSON or a Django fixture file and written in
+batches. PostgreSQL loads each batch with COPY into a temporary staging table
+and merges it with INSERT ... ON CONFLICT (product_id) DO UPDATE; other
+backends use bulk_create(update_conflicts=True).
+"""
+import csv
+import io
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+
+from product_management import inventory, stats
+from product_management.cache import bump_version
+from product_management.models import Product
+
+FIELDS = list(Product._meta.concrete_fields)
+COLUMNS = [field.column for field in FIELDS]
+STOCK = [field.name for field in FIELDS].index('stock')
+# Inventory sharding is operational state, not catalog data: new rows get the
+# default, existing rows keep theirs
+UPDATE_COLUMNS = [field.column for field in FIELDS[1:] if field.name != 'stock_shards']
+STAGING_TABLE = 'product_import_staging'
+BOOLEAN_STRINGS = {'true': True, 'yes': True, 'false': False, 'no': False}
+
+
+class ProductImportError(Exception):
+    pass
+
+
+def read_csv(stream):
+    for row in csv.DictReader(stream):
+        yield row
+
+
+def read_ndjson(stream):
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_fixture(stream):
+    """Django fixture format, as used by fixtures/products.json"""
+    for obj in json.load(stream):
+        yield {'product_id': obj['pk'], **obj['fields']}
+
+
+READERS = {'csv': read_csv, 'ndjson': read_ndjson, 'json': read_fixture}
+
+
+def clean_row(raw):
+    """Convert one input record into a tuple of Python values in COLUMNS order"""
+    values = []
+    for field in FIELDS:
+        value = raw.get(field.name, raw.get(field.attname))
+        if value is None or value == '':
+            if field.primary_key:
+                raise ProductImportError('product_id is required')
+            value = None if field.null else field.get_default()
+        elif isinstance(value, str) and value.lower() in BOOLEAN_STRINGS and field.get_internal_type() == 'BooleanField':
+            value = BOOLEAN_STRINGS[value.lower()]
+        try:
+            values.append(field.to_python(value))
+        except ValidationError as e:
+            raise ProductImportError(f'{field.name}: {"; ".join(e.messages)}')
+    return tuple(values)
+
+
+def batches(rows, size):
+    """Group cleaned rows into batches, keeping only the last row seen for a product_id"""
+    batch = {}
+    for line, raw in enumerate(rows, start=1):
+        try:
+            row = clean_row(raw)
+        except ProductImportError as e:
+            raise ProductImportError(f'Record {line}: {e}')
+        batch[row[0]] = row
+        if len(batch) >= size:
+            yield list(batch.values())
+            batch = {}
+    if batch:
+        yield list(batch.values())
+
+
+def _copy_upsert(cursor, batch):
+    columns = ', '.join(COLUMNS)
+    cursor.execute(f'TRUNCATE {STAGING_TABLE}')
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in batch:
+        # Unquoted empty fields are NULL in COPY's csv format
+        writer.writerow('' if value is None else value for value in row)
+    buffer.seek(0)
+    cursor.cursor.copy_expert(f'COPY {STAGING_TABLE} ({columns}) FROM STDIN WITH (FORMAT csv)', buffer)
+
+    updates = ', '.join(f'{column} = EXCLUDED.{column}' for column in UPDATE_COLUMNS)
+    cursor.execute(
+        f'INSERT INTO {Product._meta.db_table} ({columns}) SELECT {columns} FROM {STAGING_TABLE} '
+        f'ON CONFLICT ({COLUMNS[0]}) DO UPDATE SET {updates}'
+    )
+
+
+def _bulk_upsert(batch):
+    Product.objects.bulk_create(
+        [Product(**dict(zip([field.attname for field in FIELDS], row))) for row in batch],
+        update_conflicts=True,
+        unique_fields=['product_id'],
+        update_fields=[field.name for field in FIELDS[1:] if field.column in UPDATE_COLUMNS],
+    )
+
+
+def import_products(stream, input_format, batch_size=5000, progress=None):
+    """
+    Upsert every product in ``stream`` and return the number of rows written.
+
+    ``progress`` is called with the running row count after each batch.
+    """
+    rows = READERS[input_format](stream)
+    use_copy = connection.vendor == 'postgresql'
+    total = 0
+
+    if use_copy:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} AS '
+                f'SELECT {", ".join(COLUMNS)} FROM {Product._meta.db_table} WITH NO DATA'
+            )
+
+    for batch in batches(rows, batch_size):
+        with transaction.atomic():
+            if use_copy:
+                with connection.cursor() as cursor:
+                    _copy_upsert(cursor, batch)
+            else:
+                _bulk_upsert(batch)
+            # Sharded products count their stock in the shards; rebalance()
+            # would overwrite the imported Product.stock with their old sum
+            inventory.restock({row[0]: row[STOCK] for row in batch})
+        total += len(batch)
+        if progress:
+            progress(total)
+
+    # Bulk writes send no signals: refresh the cache version and product counter directly
+    bump_version()
+    stats.set_count(stats.PRODUCTS, Product.objects.count())
+    return total
@@ -0,0 +1,149 @@
+"""
+Sharded stock for hot products.
+
+A product with ``stock_shards = N`` keeps its stock in N StockShard rows
+rather than in the Product.stock column. Checkout claims from one randomly
+chosen shard with a conditional UPDATE (``stock >= quantity``), so concurrent
+buyers of the same product usually write different rows instead of queueing
+on a single row lock, and no shard can ever go below zero.
+
+When the chosen shard cannot cover the quantity, the claim is spread over the
+fullest shards, still with conditional updates. rebalance() evens stock out
+between the shards and writes their sum back to Product.stock, which is what
+the catalog shows.
+"""
+import random
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Case, F, Q, When
+
+from product_management.cache import bump_version
+from product_management.models import Product, StockShard
+
+MAX_SHARDS = 64
+
+
+class InventoryError(Exception):
+    pass
+
+
+def split(total, shards):
+    """Spread ``total`` over ``shards`` slices as evenly as possible"""
+    base, extra = divmod(total, shards)
+    return [base + (1 if shard < extra else 0) for shard in range(shards)]
+
+
+def _write_shards(product_id, rows, shards, total):
+    """Reshape ``rows`` (locked, ordered by shard) into ``shards`` even slices holding ``total``"""
+    existing = {row.shard: row for row in rows}
+    stocks = split(total, shards) if shards else []
+    updated, created = [], []
+    for shard, stock in enumerate(stocks):
+        row = existing.pop(shard, None)
+        if row is None:
+            created.append(StockShard(product_id=product_id, shard=shard, stock=stock))
+        elif row.stock != stock:
+            row.stock = stock
+            updated.append(row)
+    # Rows are updated in place rather than replaced, so a claim that is
+    # waiting on one of them sees the new stock instead of a deleted row
+    StockShard.objects.bulk_update(updated, ['stock'])
+    StockShard.objects.bulk_create(created)
+    if existing:
+        StockShard.objects.filter(pk__in=[row.pk for row in existing.values()]).delete()
+    Product.objects.filter(product_id=product_id).update(stock=total, stock_shards=shards)
+
+
+def shard_product(product_id, shards):
+    """
+    Split a product's stock into ``shards`` slices, or fold it back into
+    Product.stock when ``shards`` is 0. Returns the product's total stock.
+    """
+    if not 0 <= shards <= MAX_SHARDS:
+        raise InventoryError(f'shards must be between 0 and {MAX_SHARDS}')
+
+    with transaction.atomic():
+        product = Product.objects.select_for_update().get(product_id=product_id)
+        rows = list(StockShard.objects.select_for_update().filter(product_id=product_id).order_by('shard'))
+        total = sum(row.stock for row in rows) if product.stock_shards else product.stock
+        _write_shards(product_id, rows, shards, total)
+        # update() skips post_save, so invalidate cached stock levels explicitly
+        transaction.on_commit(bump_version)
+    return total
+
+
+def restock(stocks):
+    """
+    Set the stock of the sharded products among ``stocks`` (product_id ->
+    total) by splitting each total over its shards, e.g. after an import
+    wrote Product.stock. Products that are not sharded are left alone.
+    """
+    sharded = Product.objects.filter(product_id__in=list(stocks), stock_shards__gt=0)
+    with transaction.atomic():
+        for product_id, shards in sharded.values_list('product_id', 'stock_shards'):
+            rows = list(StockShard.objects.select_for_update().filter(product_id=product_id).order_by('shard'))
+            _write_shards(product_id, rows, shards, stocks[product_id])
+
+
+def rebalance(product_ids=None):
+    """
+    Even out the shards of every sharded product (or just ``product_ids``) and
+    write each total to Product.stock. Returns ``{product_id: total}``.
+
+    Each product is rebalanced in its own short transaction, so checkout only
+    waits on one product's shards at a time.
+    """
+    products = Product.objects.filter(stock_shards__gt=0)
+    if product_ids:
+        products = products.filter(product_id__in=product_ids)
+
+    totals = {}
+    for product_id, shards in products.values_list('product_id', 'stock_shards'):
+        with transaction.atomic():
+            rows = list(StockShard.objects.select_for_update().filter(product_id=product_id).order_by('shard'))
+            totals[product_id] = sum(row.stock for row in rows)
+            _write_shards(product_id, rows, shards, totals[product_id])
+    if totals:
+        bump_version()
+    return totals
+
+
+def _claim_spread(product_id, quantity):
+    """Take ``quantity`` from the fullest shards; False if they hold less than that between them"""
+    takes, remaining = {}, quantity
+    for shard, stock in StockShard.objects.filter(product_id=product_id, stock__gt=0).order_by('-stock').values_list('shard', 'stock'):
+        takes[shard] = min(stock, remaining)
+        remaining -= takes[shard]
+        if not remaining:
+            break
+    if remaining:
+        return False
+
+    claimed = StockShard.objects.filter(
+        reduce(or_, (Q(shard=shard, stock__gte=take) for shard, take in takes.items())),
+        product_id=product_id,
+    ).update(
+        stock=Case(
+            *(When(shard=shard, then=F('stock') - take) for shard, take in takes.items()),
+            default=F('stock'),
+            output_field=StockShard._meta.get_field('stock'),
+        )
+    )
+    # A concurrent claim got to one of the shards first; the caller's
+    # transaction rolls back whatever this update did take
+    return claimed == len(takes)
+
+
+def claim(product_id, shards, quantity):
+    """
+    Take ``quantity`` from a sharded product inside the caller's transaction.
+
+    Returns False when the stock could not be claimed, in which case the
+    caller must roll back.
+    """
+    claimed = StockShard.objects.filter(
+        product_id=product_id, shard=random.randrange(shards), stock__gte=quantity,
+    ).update(stock=F('stock') - quantity)
+    return bool(claimed) or _claim_spread(product_id, quantity)
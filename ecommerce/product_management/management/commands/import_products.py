@@ -0,0 +1,38 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from product_management.importer import READERS, ProductImportError, import_products
+
+
+class Command(BaseCommand):
+    help = "Upsert products from a CSV, NDJSON or fixture JSON file in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import")
+        parser.add_argument("--format", choices=READERS, help="Input format; defaults to the file extension")
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        input_format = options["format"] or os.path.splitext(path)[1].lstrip(".").lower()
+        if input_format not in READERS:
+            raise CommandError(f"Cannot tell the format of {path}; pass --format")
+
+        started = time.monotonic()
+
+        def progress(count):
+            elapsed = time.monotonic() - started
+            self.stdout.write(f"{count} rows ({count / elapsed if elapsed else 0:.0f} rows/s)")
+
+        try:
+            with open(path, newline="") as stream:
+                total = import_products(stream, input_format, options["batch_size"], progress)
+        except (ProductImportError, ValueError) as e:
+            raise CommandError(str(e))
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {total} products in {elapsed:.2f}s ({total / elapsed if elapsed else 0:.0f} rows/s)"
+        ))
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from product_management.inventory import rebalance
+
+
+class Command(BaseCommand):
+    help = "Even out the stock shards of hot products and refresh Product.stock. Run periodically (e.g. from cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("product_ids", nargs="*", help="Only these products; defaults to every sharded product")
+        parser.add_argument("--every", type=float, help="Keep running, rebalancing every this many seconds")
+
+    def handle(self, *args, **options):
+        while True:
+            totals = rebalance(options["product_ids"])
+            for product_id, total in sorted(totals.items()):
+                self.stdout.write(f"{product_id}: {total}")
+            self.stdout.write(self.style.SUCCESS(f"Rebalanced {len(totals)} products"))
+            if not options["every"]:
+                break
+            time.sleep(options["every"])
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from product_management import stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the dashboard counters from the source tables. Run periodically (e.g. from cron) to correct drift."
+
+    def handle(self, *args, **options):
+        counters = stats.reconcile()
+        for name, (count, amount) in sorted(counters.items()):
+            self.stdout.write(f"{name}: count={count} amount={amount}")
+        self.stdout.write(self.style.SUCCESS(f"Reconciled {len(counters)} counters"))
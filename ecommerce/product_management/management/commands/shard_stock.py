@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from product_management.inventory import InventoryError, shard_product
+from product_management.models import Product
+
+
+class Command(BaseCommand):
+    help = "Split a hot product's stock over N shard rows (0 folds it back into Product.stock)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("product_id")
+        parser.add_argument("shards", type=int)
+
+    def handle(self, *args, **options):
+        try:
+            total = shard_product(options["product_id"], options["shards"])
+        except Product.DoesNotExist:
+            raise CommandError(f"Product {options['product_id']} does not exist")
+        except InventoryError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"Product {options['product_id']}: {total} in stock over {options['shards']} shards"
+        ))
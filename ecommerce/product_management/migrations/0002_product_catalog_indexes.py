@@ -0,0 +1,25 @@
+# Generated by Django 5.0.4 on 2026-10-18 13:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product_management', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'product_id'], name='product_category_pk_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_new_release', 'product_id'], name='product_new_release_pk_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_trending', 'product_id'], name='product_trending_pk_idx'),
+        ),
+    ]
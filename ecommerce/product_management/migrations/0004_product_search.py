@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from product_management import search
+
+
+def install_search(apps, schema_editor):
+    search.install(schema_editor)
+
+
+def uninstall_search(apps, schema_editor):
+    search.uninstall(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product_management', '0003_statcounter'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search, uninstall_search),
+    ]
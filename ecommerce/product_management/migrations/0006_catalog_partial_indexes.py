@@ -0,0 +1,29 @@
+# Generated by Django 5.0.4 on 2026-10-18 13:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product_management', '0005_stock_shards'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_new_release_pk_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_trending_pk_idx',
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_new_release', True)), fields=['product_id'], name='product_new_release_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_trending', True)), fields=['product_id'], name='product_trending_idx'),
+        ),
+    ]
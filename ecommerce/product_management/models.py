@@ -16,5 +16,41 @@ class Product(models.Model):
     detail = models.TextField(max_length=300, null=True, blank=True)
     eco_point = models.DecimalField(max_digits=3, decimal_places=0, default=0)
     img_url = models.URLField(max_length=500, blank=True, null=True)
+    # 0 = stock lives in the column above; N > 0 = stock is split over N
+    # StockShard rows and `stock` holds their sum as of the last rebalance
+    stock_shards = models.PositiveSmallIntegerField(default=0)
 
+    class Meta:
+        # Catalog filters combined with keyset pagination on product_id. Only
+        # a small share of products is flagged, so the flag indexes are
+        # partial and hold just those rows
+        indexes = [
+            models.Index(fields=['category', 'product_id'], name='product_category_pk_idx'),
+            models.Index(fields=['product_id'], condition=models.Q(is_new_release=True), name='product_new_release_idx'),
+            models.Index(fields=['product_id'], condition=models.Q(is_trending=True), name='product_trending_idx'),
+        ]
 
+
+class StatCounter(models.Model):
+    """Running totals for the dashboard, kept current by product_management.stats"""
+    name = models.CharField(max_length=64, primary_key=True)
+    count = models.BigIntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.count} / {self.amount}"
+
+
+class StockShard(models.Model):
+    """One slice of a hot product's stock; see product_management.inventory"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='shards')
+    shard = models.PositiveSmallIntegerField()
+    stock = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'shard'], name='stock_shard_product_shard_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}[{self.shard}]: {self.stock}"
@@ -0,0 +1,30 @@
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+class ProductCursorPagination(CursorPagination):
+    """
+    Keyset pagination over the product primary key.
+
+    Each page is fetched with ``WHERE product_id > <last seen> ORDER BY product_id
+    LIMIT n``, so the cost of a page depends on ``limit`` and not on the size of
+    the catalog or how deep the client has scrolled.
+    """
+    ordering = 'product_id'
+    allowed_orderings = ('product_id', '-product_id')
+    page_size = 24
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+    def get_ordering(self, request, queryset, view):
+        ordering = request.query_params.get('ordering')
+        if ordering in self.allowed_orderings:
+            return (ordering,)
+        return (self.ordering,)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'data': data,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+        })
@@ -0,0 +1,126 @@
+"""
+Full-text product search.
+
+On PostgreSQL the product table carries a generated ``search_vector`` tsvector
+column with a GIN index, so it is current after every write without any
+application code. On SQLite an external-content FTS5 table mirrors the same
+columns and is kept in sync by triggers. Neither column is declared on the
+Product model; both are created by migration 0004.
+"""
+import re
+
+from django.db import connection
+
+TABLE = 'product_management_product'
+FTS_TABLE = 'product_management_product_fts'
+SEARCH_FIELDS = ('product_name', 'description', 'detail')
+
+POSTGRES_INSTALL = [
+    f"""
+    ALTER TABLE {TABLE} ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(product_name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(description, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(detail, '')), 'C')
+    ) STORED
+    """,
+    f"CREATE INDEX IF NOT EXISTS product_search_vector_idx ON {TABLE} USING gin (search_vector)",
+]
+POSTGRES_UNINSTALL = [
+    "DROP INDEX IF EXISTS product_search_vector_idx",
+    f"ALTER TABLE {TABLE} DROP COLUMN IF EXISTS search_vector",
+]
+
+_columns = ', '.join(SEARCH_FIELDS)
+_new = ', '.join(f'new.{field}' for field in SEARCH_FIELDS)
+_old = ', '.join(f'old.{field}' for field in SEARCH_FIELDS)
+SQLITE_UNINSTALL = [
+    "DROP TRIGGER IF EXISTS product_fts_insert",
+    "DROP TRIGGER IF EXISTS product_fts_delete",
+    "DROP TRIGGER IF EXISTS product_fts_update",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+SQLITE_INSTALL = SQLITE_UNINSTALL + [
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        {_columns}, content='{TABLE}', content_rowid='rowid'
+    )
+    """,
+    f"""
+    CREATE TRIGGER product_fts_insert AFTER INSERT ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, {_columns}) VALUES (new.rowid, {_new});
+    END
+    """,
+    f"""
+    CREATE TRIGGER product_fts_delete AFTER DELETE ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.rowid, {_old});
+    END
+    """,
+    f"""
+    CREATE TRIGGER product_fts_update AFTER UPDATE ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.rowid, {_old});
+        INSERT INTO {FTS_TABLE}(rowid, {_columns}) VALUES (new.rowid, {_new});
+    END
+    """,
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+
+def install(schema_editor):
+    """
+    Create the search column/index or FTS table for the current backend.
+
+    Safe to run again: SQLite migrations that rebuild the product table drop
+    its triggers, so such migrations should call this afterwards.
+    """
+    vendor = schema_editor.connection.vendor
+    statements = {'postgresql': POSTGRES_INSTALL, 'sqlite': SQLITE_INSTALL}.get(vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def uninstall(schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {'postgresql': POSTGRES_UNINSTALL, 'sqlite': SQLITE_UNINSTALL}.get(vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def parse_terms(query):
+    """Split free text into plain word tokens; anything else is dropped"""
+    return re.findall(r'\w+', query.lower())[:10]
+
+
+def search_product_ids(query, limit, offset=0):
+    """
+    Return product ids matching every term of ``query`` (each as a prefix),
+    best match first.
+    """
+    terms = parse_terms(query)
+    if not terms:
+        return []
+
+    if connection.vendor == 'postgresql':
+        sql = f"""
+            SELECT product_id FROM {TABLE}, to_tsquery('simple', %s) AS query
+            WHERE search_vector @@ query
+            ORDER BY ts_rank(search_vector, query) DESC, product_id
+            LIMIT %s OFFSET %s
+        """
+        params = [' & '.join(f'{term}:*' for term in terms), limit, offset]
+    elif connection.vendor == 'sqlite':
+        # bm25 weights follow the column order: name, description, detail
+        sql = f"""
+            SELECT p.product_id FROM {FTS_TABLE} f
+            JOIN {TABLE} p ON p.rowid = f.rowid
+            WHERE {FTS_TABLE} MATCH %s
+            ORDER BY bm25({FTS_TABLE}, 10.0, 4.0, 1.0), p.product_id
+            LIMIT %s OFFSET %s
+        """
+        params = [' AND '.join(f'"{term}"*' for term in terms), limit, offset]
+    else:
+        raise NotImplementedError(f'Product search is not available on {connection.vendor}')
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
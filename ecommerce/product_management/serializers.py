@@ -1,21 +1,81 @@
-from rest_framework import serializers
-from product_management.models import Product
-
-
-class ProductSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Product
-        fields = [
-            "product_id",
-            "product_name",
-            "price",
-            "stock",
-            "category",
-            "is_new_release",
-            "is_trending",
-            "rating",
-            "description",
-            "detail",
-            "eco_point",
-            "img_url",
-        ]
+from decimal import ROUND_HALF_UP, Decimal
+from itertools import islice
+
+from rest_framework import serializers
+
+from ecommerce_service.codecs import dumps
+from product_management.models import Product
+
+
+class ProductSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Product
+        fields = [
+            "product_id",
+            "product_name",
+            "price",
+            "stock",
+            "category",
+            "is_new_release",
+            "is_trending",
+            "rating",
+            "description",
+            "detail",
+            "eco_point",
+            "img_url",
+        ]
+
+
+PRODUCT_FIELDS = ProductSerializer.Meta.fields
+# Name and decimal places of each DecimalField in PRODUCT_FIELDS
+DECIMAL_FIELDS = [
+    (name, Product._meta.get_field(name).decimal_places)
+    for name in PRODUCT_FIELDS
+    if Product._meta.get_field(name).get_internal_type() == 'DecimalField'
+]
+# Rows fetched per round trip when a queryset is streamed
+CHUNK_SIZE = 2000
+
+
+def format_decimal(value, places):
+    """Decimal as DRF's DecimalField renders it (coerced to a string)"""
+    if value is None:
+        return None
+    if value.as_tuple().exponent != -places:
+        value = value.quantize(Decimal(1).scaleb(-places), rounding=ROUND_HALF_UP)
+    return format(value, 'f')
+
+
+def format_product(row):
+    """Turn a values() dict of PRODUCT_FIELDS into ProductSerializer output, in place"""
+    for name, places in DECIMAL_FIELDS:
+        row[name] = format_decimal(row[name], places)
+    return row
+
+
+def product_rows(queryset):
+    """
+    Products as the dicts ProductSerializer(many=True) produces, built from
+    values() rows instead of model instances and serializer fields. The
+    queryset is read with iterator(), so rows are not kept around.
+    """
+    for row in queryset.values(*PRODUCT_FIELDS).iterator(chunk_size=CHUNK_SIZE):
+        yield format_product(row)
+
+
+def render_rows(rows, chunk_size=CHUNK_SIZE):
+    """
+    A JSON array of ``rows`` as bytes chunks of up to ``chunk_size`` rows.
+
+    Joined, the chunks are byte-identical to JSONRenderer().render(list(rows)),
+    but only one chunk is held in memory at a time.
+    """
+    rows = iter(rows)
+    opening = b'['
+    while True:
+        chunk = b','.join(map(dumps, islice(rows, chunk_size)))
+        if not chunk:
+            break
+        yield opening + chunk
+        opening = b','
+    yield b'[]' if opening == b'[' else b']'
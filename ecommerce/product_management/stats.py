@@ -0,0 +1,233 @@
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from ecommerce_service.replicas import primary
+from job_management.models import Job
+from job_management.queue import enqueue, job_name
+from order_management.models import Order
+from product_management.models import Product, StatCounter
+from user_management.models import CustomerUser
+
+USERS = 'users'
+PRODUCTS = 'products'
+ORDERS = 'orders'
+STATUS_PREFIX = 'orders:status:'
+REVENUE_PREFIX = 'revenue:'
+
+
+def revenue_key(day):
+    return f'{REVENUE_PREFIX}{day.isoformat()}'
+
+
+def order_revenue_key(order):
+    return revenue_key(timezone.localdate(order.created_at))
+
+
+def apply_deltas(deltas):
+    """Job: add each ``[name, count, amount]`` delta to its counter, creating missing counters"""
+    for name, count, amount in deltas:
+        amount = Decimal(amount)
+        updated = StatCounter.objects.filter(name=name).update(
+            count=F('count') + count, amount=F('amount') + amount
+        )
+        if updated:
+            continue
+        try:
+            with transaction.atomic():
+                StatCounter.objects.create(name=name, count=count, amount=amount)
+        except IntegrityError:
+            StatCounter.objects.filter(name=name).update(
+                count=F('count') + count, amount=F('amount') + amount
+            )
+
+
+def bump_many(deltas):
+    """
+    Queue ``(name, count, amount)`` deltas for the background worker.
+
+    The job commits with the caller's transaction, so a checkout pays for one
+    INSERT into the job table instead of updating the shared counter rows,
+    and concurrent checkouts never queue on those rows' locks.
+    """
+    if deltas:
+        enqueue(apply_deltas, deltas=[[name, count, amount] for name, count, amount in deltas])
+
+
+def bump(name, count=0, amount=0):
+    bump_many([(name, count, amount)])
+
+
+def set_count(name, count):
+    """Overwrite a single counter, e.g. after a bulk write that sent no signals"""
+    StatCounter.objects.update_or_create(name=name, defaults={'count': count})
+
+
+def reconcile():
+    """
+    Recompute every counter from the source tables and overwrite drifted values.
+
+    A checkout commits its order together with its apply_deltas job, and a
+    worker applies the job later. The recount already includes such an
+    order, so each counter is stored as the recount minus the deltas still
+    queued; when the worker applies them, the counter lands on the recount
+    instead of counting the order twice. The recount and the queued jobs are
+    read in one transaction, from one snapshot (REPEATABLE READ on
+    PostgreSQL). If a worker applies a delta meanwhile, the overwrite fails
+    with a serialization error and the next run tries again.
+    """
+    # Counted on the primary even inside a replica-routed request (summary()),
+    # or the overwrite would store the replica's lag
+    with primary():
+        return _reconcile()
+
+
+def pending_deltas():
+    """Name -> (count, amount) of the apply_deltas jobs not applied yet"""
+    pending = {}
+    jobs = Job.objects.filter(name=job_name(apply_deltas), status__in=('queued', 'running'))
+    for kwargs in jobs.values_list('kwargs', flat=True):
+        for name, count, amount in kwargs['deltas']:
+            pending_count, pending_amount = pending.get(name, (0, Decimal('0')))
+            pending[name] = (pending_count + count, pending_amount + Decimal(amount))
+    return pending
+
+
+def _reconcile():
+    connection = transaction.get_connection()
+    # Only a transaction of our own can choose its isolation level
+    snapshot = connection.vendor == 'postgresql' and not connection.in_atomic_block
+    with transaction.atomic():
+        if snapshot:
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+
+        counters = {
+            USERS: (CustomerUser.objects.count(), 0),
+            PRODUCTS: (Product.objects.count(), 0),
+            ORDERS: (Order.objects.count(), 0),
+        }
+        for row in Order.objects.values('status').annotate(n=Count('id')):
+            counters[STATUS_PREFIX + row['status']] = (row['n'], 0)
+
+        revenue = (
+            Order.objects.exclude(status='cancelled')
+            .annotate(day=TruncDate('created_at'))
+            .values('day')
+            .annotate(total=Sum('total_amount'))
+        )
+        for row in revenue:
+            counters[revenue_key(row['day'])] = (0, row['total'])
+
+        for name, (count, amount) in pending_deltas().items():
+            recount, reamount = counters.get(name, (0, 0))
+            counters[name] = (recount - count, reamount - amount)
+
+        StatCounter.objects.exclude(name__in=counters).delete()
+        StatCounter.objects.bulk_create(
+            [StatCounter(name=name, count=count, amount=amount) for name, (count, amount) in counters.items()],
+            update_conflicts=True,
+            unique_fields=['name'],
+            update_fields=['count', 'amount'],
+        )
+    return counters
+
+
+def summary():
+    """Dashboard figures read from the counter table with one primary-key query"""
+    today = revenue_key(timezone.localdate())
+    counters = {
+        name: (count, amount)
+        for name, count, amount in StatCounter.objects.filter(
+            Q(name__in=[USERS, PRODUCTS, ORDERS, today]) | Q(name__startswith=STATUS_PREFIX)
+        ).values_list('name', 'count', 'amount')
+    }
+    if USERS not in counters:
+        # Fresh deployment: seed the table once from the source tables and
+        # answer from the recount; a re-read could hit a replica without it
+        counters = reconcile()
+
+    return {
+        'total_users': counters[USERS][0],
+        'total_products': counters.get(PRODUCTS, (0, 0))[0],
+        'total_orders': counters.get(ORDERS, (0, 0))[0],
+        'orders_by_status': {
+            name[len(STATUS_PREFIX):]: count
+            for name, (count, _) in counters.items() if name.startswith(STATUS_PREFIX)
+        },
+        'revenue_today': counters.get(today, (0, Decimal('0')))[1],
+    }
+
+
+@receiver(post_save, sender=CustomerUser)
+def count_user_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        bump(USERS, 1)
+
+
+@receiver(post_delete, sender=CustomerUser)
+def count_user_deleted(sender, instance, **kwargs):
+    bump(USERS, -1)
+
+
+@receiver(post_save, sender=Product)
+def count_product_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        bump(PRODUCTS, 1)
+
+
+@receiver(post_delete, sender=Product)
+def count_product_deleted(sender, instance, **kwargs):
+    bump(PRODUCTS, -1)
+
+
+@receiver(post_init, sender=Order)
+def remember_order_state(sender, instance, **kwargs):
+    # Read __dict__ directly so deferred fields are not loaded for every Order
+    instance._counted_state = (instance.__dict__.get('status'), instance.__dict__.get('total_amount'))
+
+
+@receiver(post_save, sender=Order)
+def count_order_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    status, total_amount = instance.status, instance.total_amount
+    revenue = order_revenue_key(instance)
+    deltas = []
+
+    if created:
+        deltas.append((ORDERS, 1, 0))
+        deltas.append((STATUS_PREFIX + status, 1, 0))
+        if status != 'cancelled':
+            deltas.append((revenue, 0, total_amount))
+    else:
+        old_status, old_total = instance._counted_state
+        if old_status is None or old_total is None:
+            # Loaded without these fields; leave the difference to reconcile()
+            instance._counted_state = (status, total_amount)
+            return
+        if old_status != status:
+            deltas.append((STATUS_PREFIX + old_status, -1, 0))
+            deltas.append((STATUS_PREFIX + status, 1, 0))
+        old_revenue = old_total if old_status != 'cancelled' else 0
+        new_revenue = total_amount if status != 'cancelled' else 0
+        if old_revenue != new_revenue:
+            deltas.append((revenue, 0, new_revenue - old_revenue))
+    bump_many(deltas)
+    instance._counted_state = (status, total_amount)
+
+
+@receiver(post_delete, sender=Order)
+def count_order_deleted(sender, instance, **kwargs):
+    status, total_amount = instance._counted_state
+    deltas = [(ORDERS, -1, 0)]
+    if status is not None and total_amount is not None:
+        deltas.append((STATUS_PREFIX + status, -1, 0))
+        if status != 'cancelled':
+            deltas.append((order_revenue_key(instance), 0, -total_amount))
+    bump_many(deltas)
@@ -1,3 +1,399 @@
-from django.test import TestCase
+import io
+import json
+import threading
+from unittest import mock
+from decimal import Decimal
+from django.conf import settings
+from django.core.management import call_command
+from django.core.cache import cache
+from asgiref.sync import async_to_sync
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from django.db import router
+from ecommerce_service import replicas
+from product_management.models import Product, StatCounter, StockShard
+from product_management import inventory
+from job_management.queue import drain
+from product_management import stats
+from product_management.importer import import_products, ProductImportError
+from order_management.models import Order
+from user_management.models import CustomerUser
+from product_management import cache as product_cache
+from product_management.views import AsyncProductAllView, AsyncProductByIdView
 
 # Create your tests here.
+
+
+def make_product(product_id, **fields):
+    fields.setdefault('product_name', f'Product {product_id}')
+    fields.setdefault('price', '10.00')
+    return Product.objects.create(product_id=product_id, **fields)
+
+
+class ProductAllViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(1, 8):
+            make_product(
+                f'p{i:02d}',
+                category='Kitchen' if i % 2 else 'Garden',
+                is_trending=i <= 3,
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_keyset_pages_cover_catalog_once(self):
+        url = reverse('product_all') + '?limit=3'
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            self.assertLessEqual(len(body['data']), 3)
+            seen += [p['product_id'] for p in body['data']]
+            url = body['next']
+        self.assertEqual(seen, sorted(Product.objects.values_list('product_id', flat=True)))
+
+    def test_page_cost_is_constant(self):
+        # One query for the page; no COUNT(*) over the catalog
+        with self.assertNumQueries(1):
+            self.client.get(reverse('product_all') + '?limit=2')
+
+    def test_filters(self):
+        response = self.client.get(reverse('product_all'), {'category': 'Kitchen', 'is_trending': 'true'})
+        ids = [p['product_id'] for p in response.json()['data']]
+        self.assertEqual(ids, ['p01', 'p03'])
+
+    def test_descending_ordering(self):
+        response = self.client.get(reverse('product_all'), {'ordering': '-product_id', 'limit': 2})
+        ids = [p['product_id'] for p in response.json()['data']]
+        self.assertEqual(ids, ['p07', 'p06'])
+
+
+class ProductCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = make_product('1', stock=5)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_repeat_requests_are_served_from_cache(self):
+        url = reverse('product_byid', args=[1])
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_if_none_match_returns_304(self):
+        url = reverse('product_all')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_save_invalidates_cached_payloads(self):
+        url = reverse('product_byid', args=[1])
+        etag = self.client.get(url)['ETag']
+        self.product.stock = 2
+        self.product.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['stock'], 2)
+
+    def test_checkout_drops_only_the_ordered_product_details(self):
+        other = make_product('2', stock=5)
+        self.client.get(reverse('product_byid', args=[1]))
+        self.client.get(reverse('product_byid', args=[other.product_id]))
+        version = product_cache.get_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/orders/checkout/', {
+                'items': [{'product_id': '1', 'quantity': 2}],
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+
+        self.assertEqual(product_cache.get_version(), version)
+        self.assertEqual(self.client.get(reverse('product_byid', args=[1])).json()['data']['stock'], 3)
+        with self.assertNumQueries(0):
+            self.client.get(reverse('product_byid', args=[other.product_id]))
+
+    def test_missing_product_is_not_cached(self):
+        self.assertEqual(self.client.get(reverse('product_byid', args=[99])).status_code, 404)
+        make_product('99')
+        self.assertEqual(self.client.get(reverse('product_byid', args=[99])).status_code, 200)
+
+    def test_concurrent_miss_waits_for_the_rebuild(self):
+        key = product_cache.make_key('detail', 'busy')
+        cache.add(f'{key}:lock', 1)  # another worker is rebuilding
+        threading.Timer(0.1, cache.set, [key, product_cache.make_entry({'data': 'built elsewhere'})]).start()
+
+        entry = product_cache.get_or_build(key, lambda: self.fail('rebuilt twice'))
+        self.assertEqual(json.loads(entry['body']), {'data': 'built elsewhere'})
+
+
+class AsyncProductViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(1, 6):
+            make_product(f'{i}', category='Kitchen' if i % 2 else 'Garden', price=f'{i}.50')
+
+    def setUp(self):
+        cache.clear()
+
+    def call(self, view, path, **kwargs):
+        request = RequestFactory().get(path)
+        return async_to_sync(view.as_view())(request, **kwargs)
+
+    def test_catalog_matches_sync_view(self):
+        path = reverse('product_all') + '?limit=2&category=Kitchen'
+        expected = self.client.get(path)
+        cache.clear()
+        response = self.call(AsyncProductAllView, path)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, expected.content)
+        self.assertEqual(response['ETag'], expected['ETag'])
+
+    def test_detail_matches_sync_view_and_is_cached(self):
+        path = reverse('product_byid', args=[3])
+        expected = self.client.get(path)
+        cache.clear()
+        self.assertEqual(self.call(AsyncProductByIdView, path, product_id=3).content, expected.content)
+        with self.assertNumQueries(0):
+            response = self.call(AsyncProductByIdView, path, product_id=3)
+        self.assertEqual(response.content, expected.content)
+
+    def test_detail_missing_product(self):
+        path = reverse('product_byid', args=[99])
+        response = self.call(AsyncProductByIdView, path, product_id=99)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.content, self.client.get(path).content)
+
+
+class DashboardCounterTests(TestCase):
+    def setUp(self):
+        CustomerUser.objects.create_user(username='eco', password='secret-pass-123')
+        make_product('1')
+        make_product('2')
+        Order.objects.create(status='pending', total_amount='100.00')
+        Order.objects.create(status='paid', total_amount='40.00')
+        drain()  # counters are applied by the job worker
+
+    def test_summary_is_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('summarize'))
+        self.assertEqual(response.json(), {
+            'total_users': 1,
+            'total_products': 2,
+            'total_orders': 2,
+            'orders_by_status': {'pending': 1, 'paid': 1},
+            'revenue_today': '140.00',
+        })
+
+    def test_status_change_and_delete_update_counters(self):
+        order = Order.objects.get(status='pending')
+        order.status = 'cancelled'
+        order.save()
+        Product.objects.get(product_id='2').delete()
+        drain()
+        summary = stats.summary()
+        self.assertEqual(summary['orders_by_status'], {'pending': 0, 'paid': 1, 'cancelled': 1})
+        self.assertEqual(summary['revenue_today'], 40)
+        self.assertEqual(summary['total_products'], 1)
+
+    def test_reconcile_corrects_drift(self):
+        StatCounter.objects.filter(name=stats.ORDERS).update(count=99)
+        StatCounter.objects.filter(name=stats.PRODUCTS).delete()
+        stats.reconcile()
+        summary = stats.summary()
+        self.assertEqual(summary['total_orders'], 2)
+        self.assertEqual(summary['total_products'], 2)
+
+
+    def test_reconcile_does_not_double_count_queued_deltas(self):
+        Order.objects.create(status='paid', total_amount='10.00')  # its delta job is still queued
+        stats.reconcile()
+        drain()
+        summary = stats.summary()
+        self.assertEqual(summary['total_orders'], 3)
+        self.assertEqual(summary['orders_by_status'], {'pending': 1, 'paid': 2})
+        self.assertEqual(summary['revenue_today'], Decimal('150.00'))
+
+    def test_fresh_table_is_answered_from_the_recount(self):
+        StatCounter.objects.all().delete()
+        self.assertEqual(stats.summary()['total_orders'], 2)
+        # A replica that has not seen the seeded rows yet must not send summary() round again
+        StatCounter.objects.all().delete()
+        with mock.patch.object(stats, 'reconcile', return_value={stats.USERS: (1, 0)}) as reconcile:
+            self.assertEqual(stats.summary()['total_users'], 1)
+        reconcile.assert_called_once()
+
+    def test_reconcile_reads_the_primary(self):
+        with mock.patch.object(replicas, 'replica_configured', lambda: True):
+            token = replicas._use_replica.set(True)
+            try:
+                with mock.patch.object(stats, '_reconcile', side_effect=lambda: router.db_for_read(Order)):
+                    self.assertEqual(stats.reconcile(), 'default')
+            finally:
+                replicas._use_replica.reset(token)
+
+
+class ProductSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        make_product('1', product_name='Bamboo Toothbrush', description='Biodegradable handle')
+        make_product('2', product_name='Cotton Tote', description='Reusable bag', detail='Bamboo fibre lining')
+        make_product('3', product_name='Steel Bottle', description='Keeps drinks cold')
+
+    def search(self, **params):
+        return self.client.get(reverse('product_search'), params)
+
+    def test_ranked_prefix_matching(self):
+        ids = [p['product_id'] for p in self.search(q='bamb').json()['data']]
+        # A match in the name outranks one in the detail
+        self.assertEqual(ids, ['1', '2'])
+
+    def test_index_follows_updates(self):
+        product = Product.objects.get(product_id='3')
+        product.product_name = 'Bamboo Bottle'
+        product.save()
+        ids = {p['product_id'] for p in self.search(q='bamboo bottle').json()['data']}
+        self.assertEqual(ids, {'3'})
+        Product.objects.filter(product_id='1').delete()
+        ids = {p['product_id'] for p in self.search(q='toothbrush').json()['data']}
+        self.assertEqual(ids, set())
+
+    def test_pagination(self):
+        body = self.search(q='bamboo', limit=1).json()
+        self.assertEqual(len(body['data']), 1)
+        self.assertEqual(body['next_page'], 2)
+        body = self.search(q='bamboo', limit=1, page=2).json()
+        self.assertEqual(body['next_page'], None)
+
+    def test_query_required(self):
+        self.assertEqual(self.search(q='  ').status_code, 400)
+        self.assertEqual(self.search(q='"*:').json()['data'], [])
+
+
+class ProductByIdsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        make_product('1', price='12.5', eco_point=3, category='Kitchen', rating='4', img_url='https://img.example/1.png')
+        make_product('2', price='80.00', description='Reusable bag')
+        make_product('3', price='0.99', is_trending=True)
+
+    def test_get_keys_products_by_id_and_reports_missing(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('product_byids'), {'ids': '3,1,nope,1'})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(list(body['data']), ['3', '1'])
+        self.assertEqual(body['missing'], ['nope'])
+        self.assertEqual(body['data']['1']['price'], '12.50')
+
+    def test_matches_product_serializer(self):
+        from product_management.serializers import ProductSerializer, product_rows
+
+        queryset = Product.objects.order_by('product_id')
+        self.assertEqual(list(product_rows(queryset)), ProductSerializer(queryset, many=True).data)
+
+    def test_post_and_validation(self):
+        response = self.client.post(reverse('product_byids'), {'ids': ['2', 3]}, content_type='application/json')
+        self.assertEqual(list(response.json()['data']), ['2', '3'])
+        self.assertEqual(self.client.get(reverse('product_byids')).status_code, 400)
+        self.assertEqual(self.client.get(reverse('product_byids'), {'ids': ','.join(map(str, range(101)))}).status_code, 400)
+        response = self.client.post(reverse('product_byids'), {'ids': '2'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ProductFastPathTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        make_product('1', price='12.5', eco_point=3, category='Kitchen', rating='4', img_url='https://img.example/1.png')
+        make_product('2', product_name='Café "bag" \u2028 \u2029 ü', description='line\nbreak', category='Kitchen')
+        make_product('3', price='0.99', is_trending=True, img_url=None)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_render_rows_is_byte_identical_to_product_serializer(self):
+        from rest_framework.renderers import JSONRenderer
+        from product_management.serializers import ProductSerializer, product_rows, render_rows
+
+        for queryset in (Product.objects.order_by('product_id'), Product.objects.none()):
+            expected = JSONRenderer().render(ProductSerializer(queryset, many=True).data)
+            for chunk_size in (1, 2, 100):
+                chunks = list(render_rows(product_rows(queryset), chunk_size))
+                self.assertEqual(b''.join(chunks), expected)
+
+    def test_catalog_page_matches_product_serializer(self):
+        from product_management.serializers import ProductSerializer
+
+        response = self.client.get(reverse('product_all'))
+        expected = ProductSerializer(Product.objects.order_by('product_id'), many=True).data
+        self.assertEqual(response.json()['data'], expected)
+
+    def test_feed_streams_the_filtered_catalog(self):
+        response = self.client.get(reverse('product_feed'), {'category': 'Kitchen'})
+        self.assertTrue(response.streaming)
+        body = b''.join(response.streaming_content)
+        self.assertEqual([p['product_id'] for p in json.loads(body)], ['1', '2'])
+
+    async def test_feed_streams_asynchronously_under_asgi(self):
+        # A sync iterator would be read whole by the ASGI handler
+        response = await self.async_client.get(reverse('product_feed'), {'category': 'Kitchen'})
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual([p['product_id'] for p in json.loads(body)], ['1', '2'])
+
+    def test_feed_etag_follows_product_changes(self):
+        etag = self.client.get(reverse('product_feed'))['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('product_feed'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Product.objects.filter(product_id='1').first().save()
+        response = self.client.get(reverse('product_feed'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class ImportProductsTests(TestCase):
+    def test_csv_insert_then_ndjson_upsert(self):
+        source = io.StringIO(
+            'product_id,product_name,price,stock,is_trending\n'
+            'a1,Tote,80.00,5,true\n'
+            'a2,Bottle,120.50,,false\n'
+        )
+        self.assertEqual(import_products(source, 'csv', batch_size=1), 2)
+        self.assertEqual(Product.objects.get(product_id='a2').stock, 1)  # model default
+        self.assertTrue(Product.objects.get(product_id='a1').is_trending)
+
+        source = io.StringIO('{"product_id": "a1", "price": "75.00", "stock": 9}\n\n')
+        import_products(source, 'ndjson')
+        product = Product.objects.get(product_id='a1')
+        self.assertEqual((product.price, product.stock, product.is_trending), (Decimal('75.00'), 9, False))
+        self.assertEqual(stats.summary()['total_products'], 2)
+
+    def test_imported_stock_of_sharded_product_goes_to_its_shards(self):
+        make_product('a1', stock=8)
+        inventory.shard_product('a1', 2)
+        import_products(io.StringIO('{"product_id": "a1", "price": "75.00", "stock": 5}\n'), 'ndjson')
+        self.assertEqual(sorted(StockShard.objects.filter(product_id='a1').values_list('stock', flat=True)), [2, 3])
+        inventory.rebalance()
+        product = Product.objects.get(product_id='a1')
+        self.assertEqual((product.stock, product.stock_shards), (5, 2))
+
+    def test_invalid_record_reports_its_position(self):
+        source = io.StringIO('{"product_id": "a1", "price": "1"}\n{"product_id": "a2", "price": "cheap"}\n')
+        with self.assertRaisesMessage(ProductImportError, 'Record 2: price'):
+            import_products(source, 'ndjson')
+
+    def test_command_loads_fixture(self):
+        out = io.StringIO()
+        fixture = settings.BASE_DIR / 'product_management' / 'fixtures' / 'products.json'
+        call_command('import_products', str(fixture), stdout=out)
+        self.assertEqual(Product.objects.count(), 12)
+        self.assertIn('rows/s', out.getvalue())
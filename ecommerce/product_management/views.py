@@ -3,38 +3,203 @@ from product_management.models import Product
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
-from product_management.serializers import ProductSerializer
-from user_management.models import CustomerUser
-from order_management.models import Order
-from django.shortcuts import get_object_or_404
-from django.http import JsonResponse
+from product_management.serializers import PRODUCT_FIELDS, ProductSerializer, format_product, product_rows, render_rows
+from product_management.pagination import ProductCursorPagination
+from product_management import cache as product_cache
+import hashlib
+from product_management import stats
+from product_management.search import search_product_ids
+from django.shortcuts import get_object_or_404, aget_object_or_404
+from django.http import Http404, JsonResponse
+from django.views import View
+from asgiref.sync import sync_to_async
+from rest_framework.request import Request
+from ecommerce_service.responses import api_json_response, streaming_response
 
 # Create your views here.
 
+def parse_bool(value):
+    if value is None:
+        return None
+    value = value.strip().lower()
+    if value in ('true', '1', 'yes'):
+        return True
+    if value in ('false', '0', 'no'):
+        return False
+    return None
+
+
+def catalog_queryset(params):
+    queryset = Product.objects.all()
+
+    category = params.get('category')
+    if category:
+        queryset = queryset.filter(category=category)
+
+    # Booleans arrive as 'true'/'false' strings from URLSearchParams
+    for field in ('is_new_release', 'is_trending'):
+        value = parse_bool(params.get(field))
+        if value is not None:
+            queryset = queryset.filter(**{field: value})
+    return queryset
+
+
+def build_catalog_page(request):
+    """One page of the catalog; ``request`` is a DRF Request"""
+    paginator = ProductCursorPagination()
+    # values() rows rather than instances: the paginator reads its cursor from
+    # either, and format_product gives the same output as ProductSerializer
+    page = paginator.paginate_queryset(catalog_queryset(request.query_params).values(*PRODUCT_FIELDS), request)
+    return paginator.get_paginated_response([format_product(row) for row in page]).data
+
+
+def catalog_cache_suffix(request):
+    # next/previous links are absolute, so the full URI identifies the page
+    return hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+
+
 class ProductAllView(APIView):
     permission_classes = [AllowAny]
+    pagination_class = ProductCursorPagination
+
+    def get_queryset(self):
+        return catalog_queryset(self.request.query_params)
+
+    def build_page(self):
+        return build_catalog_page(self.request)
+
     def get(self, request, format=None):
-        product_data = Product.objects.all()
-        product_serializer = ProductSerializer(product_data, many=True)
-        content = {
-            'data': product_serializer.data
-        }
-        return Response(content)
-    
+        key = product_cache.make_key('catalog', catalog_cache_suffix(request))
+        return product_cache.cached_response(request, key, self.build_page)
+
+class ProductFeedView(APIView):
+    """
+    The whole catalog as one JSON array, for consumers that need every
+    product at once (static page generation, partner feeds):
+
+        GET /api/product/feed?category=Kitchen
+
+    Takes the catalog filters. The body is streamed in chunks straight from
+    the database cursor, so memory stays flat however large the catalog is.
+    The ETag follows the product cache version, so an unchanged catalog is
+    answered with 304 without running a query.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        etag = '"%s"' % hashlib.md5(product_cache.make_key('feed', catalog_cache_suffix(request)).encode()).hexdigest()
+        if product_cache.not_modified(request, etag):
+            return Response(status=304, headers={'ETag': etag})
+        queryset = catalog_queryset(request.query_params).order_by('product_id')
+        response = streaming_response(request, render_rows(product_rows(queryset)), content_type='application/json')
+        response['ETag'] = etag
+        return response
+
 class ProductByIdView(APIView):
-    def get(self, request, product_id):
+    def build_content(self, product_id):
         product = get_object_or_404(Product, product_id=product_id)
         product_serializer = ProductSerializer(product)
         content = {
             'data': product_serializer.data
         }
+        return content
+
+    def get(self, request, product_id):
+        key = product_cache.make_key('detail', product_id)
+        return product_cache.cached_response(request, key, lambda: self.build_content(product_id))
+
+class ProductByIdsView(APIView):
+    """
+    Several products in one round trip, for the cart and checkout pages:
+
+        GET  /api/product/byIds?ids=1,2,3
+        POST /api/product/byIds  {"ids": ["1", "2", "3"]}
+
+    Products come back keyed by id from a single IN query, and ids that do
+    not exist are listed under ``missing``.
+    """
+    permission_classes = [AllowAny]
+    max_ids = 100
+
+    def respond(self, ids):
+        ids = list(dict.fromkeys(str(i).strip() for i in ids if str(i).strip()))
+        if not ids:
+            return Response({'error': 'ids is required'}, status=400)
+        if len(ids) > self.max_ids:
+            return Response({'error': f'At most {self.max_ids} ids per request'}, status=400)
+
+        products = {row['product_id']: row for row in product_rows(Product.objects.filter(product_id__in=ids))}
+        return Response({
+            'data': {i: products[i] for i in ids if i in products},
+            'missing': [i for i in ids if i not in products],
+        })
+
+    def get(self, request):
+        ids = [i for value in request.query_params.getlist('ids') for i in value.split(',')]
+        return self.respond(ids)
+
+    def post(self, request):
+        ids = request.data.get('ids') if isinstance(request.data, dict) else None
+        if not isinstance(ids, list) or not all(isinstance(i, (str, int)) and not isinstance(i, bool) for i in ids):
+            return Response({'error': 'ids must be a list of product ids'}, status=400)
+        return self.respond(ids)
+
+class AsyncProductAllView(View):
+    """
+    ProductAllView for the ASGI server: cache hits never leave the event loop.
+
+    A miss builds the page in a worker thread, because DRF's cursor paginator
+    evaluates the queryset synchronously.
+    """
+
+    async def get(self, request):
+        key = await product_cache.amake_key('catalog', catalog_cache_suffix(request))
+        return await product_cache.acached_response(
+            request, key, sync_to_async(lambda: build_catalog_page(Request(request)))
+        )
+
+class AsyncProductByIdView(View):
+    """ProductByIdView for the ASGI server, reading through the async ORM"""
+
+    async def build_content(self, product_id):
+        product = await aget_object_or_404(Product, product_id=product_id)
+        return {'data': ProductSerializer(product).data}
+
+    async def get(self, request, product_id):
+        key = await product_cache.amake_key('detail', product_id)
+        try:
+            return await product_cache.acached_response(request, key, lambda: self.build_content(product_id))
+        except Http404 as e:
+            # Same body DRF renders for get_object_or_404
+            return api_json_response({'detail': str(e)}, status=404)
+
+class ProductSearchView(APIView):
+    permission_classes = [AllowAny]
+    default_limit = 24
+    max_limit = 100
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'q is required'}, status=400)
+        try:
+            page = max(int(request.query_params.get('page', 1)), 1)
+            limit = min(max(int(request.query_params.get('limit', self.default_limit)), 1), self.max_limit)
+        except ValueError:
+            return Response({'error': 'page and limit must be integers'}, status=400)
+
+        # Fetch one extra id to know whether another page exists
+        ids = search_product_ids(query, limit + 1, (page - 1) * limit)
+        products = {row['product_id']: row for row in product_rows(Product.objects.filter(product_id__in=ids[:limit]))}
+        content = {
+            'data': [products[i] for i in ids[:limit] if i in products],
+            'page': page,
+            'next_page': page + 1 if len(ids) > limit else None,
+        }
         return Response(content)
 
 class SummarizeView(APIView):
     def get(self, request):
-        summarized_data = {
-        "total_users": CustomerUser.objects.count(),
-        "total_products": Product.objects.count(),
-        "total_orders": Order.objects.count(),
-        }
+        # Counters are maintained on write; see product_management/stats.py
+        summarized_data = stats.summary()
         return JsonResponse(summarized_data)
@@ -0,0 +1,7 @@
+#!/usr/bin/env bash
+# Start the API. The release work (checks, migrations, collectstatic,
+# fixtures) only runs when its fingerprint changed; see ecommerce_service/release.py
+set -o errexit
+
+python -m ecommerce_service.release || python manage.py prepare_release
+exec gunicorn -c gunicorn.conf.py ecommerce_service.asgi:application
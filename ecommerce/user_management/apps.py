@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CustomerUserManagementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'user_management'
+
+    def ready(self):
+        # Registers the signal handlers that keep the auth user cache fresh
+        from user_management import authentication  # noqa: F401
@@ -0,0 +1,203 @@
+import datetime
+import threading
+import time
+from collections import OrderedDict
+
+import jwt
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework import authentication, exceptions, permissions
+
+from user_management.models import CustomerUser
+
+JWT_ALGORITHM = 'HS256'
+# Claims copied into the token so request.user is built from it; only the
+# user's active flag is read, through the short-TTL user cache
+USER_CLAIMS = ('id', 'username', 'email', 'first_name', 'last_name')
+TOKEN_LIFETIME = datetime.timedelta(days=1)
+
+
+def issue_token(user):
+    payload = {claim: getattr(user, claim) for claim in USER_CLAIMS}
+    payload['exp'] = datetime.datetime.now(datetime.timezone.utc) + TOKEN_LIFETIME
+    return jwt.encode(payload, settings.SECRET_KEY, algorithm=JWT_ALGORITHM)
+
+
+class TokenCache:
+    """Bounded LRU of token -> verified payload, so a token's signature is checked once per process"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        with self._lock:
+            payload = self._entries.get(token)
+            if payload is None:
+                return None
+            if payload['exp'] <= time.time():
+                del self._entries[token]
+                raise jwt.ExpiredSignatureError('Signature has expired')
+            self._entries.move_to_end(token)
+            return payload
+
+    def set(self, token, payload):
+        with self._lock:
+            self._entries[token] = payload
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class UserCache:
+    """
+    Short-lived id -> CustomerUser cache, dropped whenever the user row is
+    saved or deleted. Changes the signals do not see (another process, a
+    queryset update()) are picked up within ``ttl`` seconds.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def peek(self, user_id):
+        """(found, user) from the cache alone; user is None for a deleted id"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry is not None and entry[1] > time.monotonic():
+            return True, entry[0]
+        return False, None
+
+    def get(self, user_id):
+        found, user = self.peek(user_id)
+        if not found:
+            # A deleted id is cached too, so its tokens do not cost a query each
+            user = CustomerUser.objects.filter(id=user_id).first()
+            with self._lock:
+                self._entries[user_id] = (user, time.monotonic() + self.ttl)
+        if user is None:
+            raise CustomerUser.DoesNotExist(f'No user {user_id}')
+        return user
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(getattr(settings, 'JWT_TOKEN_CACHE_SIZE', 1024))
+user_cache = UserCache(getattr(settings, 'JWT_USER_CACHE_TTL', 60))
+
+
+def decode_token(token):
+    payload = token_cache.get(token)
+    if payload is None:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[JWT_ALGORITHM])
+        token_cache.set(token, payload)
+    return payload
+
+
+def get_user(user_id):
+    """Full CustomerUser row, served from the short-TTL cache"""
+    return user_cache.get(user_id)
+
+
+def check_active(user):
+    if user is None or not user.is_active:
+        raise exceptions.AuthenticationFailed('User inactive or deleted.')
+
+
+def user_from_claims(payload):
+    """
+    Build a CustomerUser from the token claims without touching the database.
+
+    Fields that are not in the token are deferred, so reading one of them loads
+    it on demand and saving the instance only writes the claimed fields.
+    """
+    claims = [claim for claim in USER_CLAIMS if claim in payload]
+    return CustomerUser.from_db(DEFAULT_DB_ALIAS, claims, [payload[claim] for claim in claims])
+
+
+class JWTAuthentication(authentication.BaseAuthentication):
+    keyword = 'Bearer'
+
+    def get_payload(self, request):
+        """Verified token payload, or None when the request carries no bearer token"""
+        header = request.headers.get('Authorization', '').split()
+        if len(header) != 2 or header[0] != self.keyword:
+            return None
+        token = header[1]
+
+        try:
+            payload = decode_token(token)
+        except jwt.ExpiredSignatureError:
+            raise exceptions.AuthenticationFailed('Token expired')
+        except jwt.InvalidTokenError:
+            raise exceptions.AuthenticationFailed('Invalid token')
+
+        if 'id' not in payload:
+            raise exceptions.AuthenticationFailed('Invalid token')
+        return payload
+
+    def user_for_payload(self, payload, user):
+        """request.user for a token whose (cached) user row is ``user``"""
+        check_active(user)
+        if all(claim in payload for claim in USER_CLAIMS):
+            # A fresh instance per request rather than the shared cached one
+            return user_from_claims(payload)
+        # Tokens issued before claims were embedded only carry the id
+        return user
+
+    def load_user(self, payload):
+        try:
+            return get_user(payload['id'])
+        except CustomerUser.DoesNotExist:
+            return None
+
+    def allows_anonymous(self, request):
+        """True when the view lets anyone in, e.g. guest checkout and login"""
+        view = getattr(request, 'parser_context', None) and request.parser_context.get('view')
+        return view is not None and all(isinstance(p, permissions.AllowAny) for p in view.get_permissions())
+
+    def authenticate(self, request):
+        try:
+            payload = self.get_payload(request)
+            if payload is None:
+                return None
+            return (self.user_for_payload(payload, self.load_user(payload)), payload)
+        except exceptions.AuthenticationFailed:
+            # A stale token must not lock a client out of what guests may do
+            if self.allows_anonymous(request):
+                return None
+            raise
+
+    async def aauthenticate(self, request):
+        """authenticate() for async views; the database is only read when the user cache misses"""
+        payload = self.get_payload(request)
+        if payload is None:
+            return None
+        found, user = user_cache.peek(payload['id'])
+        if not found:
+            user = await sync_to_async(self.load_user)(payload)
+        return (self.user_for_payload(payload, user), payload)
+
+    def authenticate_header(self, request):
+        return self.keyword
+
+
+@receiver(post_save, sender=CustomerUser)
+@receiver(post_delete, sender=CustomerUser)
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
@@ -1,3 +1,199 @@
-from django.test import TestCase
+import json
+import datetime
+import jwt
+from django.conf import settings
+from asgiref.sync import async_to_sync
+from django.test import RequestFactory, TestCase
+from product_management.models import Product
+from user_management.authentication import issue_token, token_cache, user_cache, get_user
+from user_management.models import CustomerUser
+from user_management.views import AsyncCustomerUserView, AsyncWishlistView
 
 # Create your tests here.
+
+
+class JWTAuthenticationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomerUser.objects.create_user(username='eco', email='eco@example.com', password='secret-pass-123')
+        cls.product = Product.objects.create(product_id='1', product_name='Tote', price='80.00')
+
+    def setUp(self):
+        token_cache.clear()
+        user_cache.clear()
+        get_user(self.user.id)  # a warm user cache, as on a busy worker
+
+    def auth(self, token):
+        return {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+
+    def test_login_token_carries_user_claims(self):
+        response = self.client.post('/api/login/', {'username': 'eco', 'password': 'secret-pass-123'})
+        payload = jwt.decode(response.json()['token'], settings.SECRET_KEY, algorithms=['HS256'])
+        self.assertEqual(payload['id'], self.user.id)
+        self.assertEqual(payload['email'], 'eco@example.com')
+
+    def test_wishlist_write_skips_user_lookup(self):
+        headers = self.auth(issue_token(self.user))
+        # product lookup + M2M insert, no user query
+        with self.assertNumQueries(2):
+            response = self.client.post('/wishlist/add/1/', **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(self.user.wishlist.values_list('product_id', flat=True)), ['1'])
+
+    def test_missing_and_expired_tokens_are_rejected(self):
+        self.assertEqual(self.client.get('/wishlist/').status_code, 401)
+
+        expired = jwt.encode(
+            {'id': self.user.id, 'exp': datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=1)},
+            settings.SECRET_KEY, algorithm='HS256',
+        )
+        response = self.client.get('/wishlist/', **self.auth(expired))
+        self.assertEqual(response.status_code, 401)
+
+    def test_legacy_token_uses_cached_user(self):
+        legacy = jwt.encode(
+            {'id': self.user.id, 'exp': datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=1)},
+            settings.SECRET_KEY, algorithm='HS256',
+        )
+        self.client.get('/wishlist/', **self.auth(legacy))
+        with self.assertNumQueries(1):  # wishlist only
+            response = self.client.get('/wishlist/', **self.auth(legacy))
+        self.assertEqual(response.status_code, 200)
+
+    def test_user_cache_invalidated_on_save(self):
+        self.assertEqual(get_user(self.user.id).email, 'eco@example.com')
+        user = CustomerUser.objects.get(id=self.user.id)
+        user.email = 'new@example.com'
+        user.save()
+        self.assertEqual(get_user(self.user.id).email, 'new@example.com')
+
+    def test_deactivated_and_deleted_users_are_rejected(self):
+        headers = self.auth(issue_token(self.user))
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.post('/wishlist/add/1/', **headers).status_code, 401)
+        self.assertEqual(self.client.get('/wishlist/', **headers).status_code, 401)
+
+        self.user.is_active = True
+        self.user.save()
+        self.assertEqual(self.client.post('/wishlist/add/1/', **headers).status_code, 200)
+
+        # No signal for a queryset update; the user cache expires instead
+        CustomerUser.objects.filter(id=self.user.id).update(is_active=False)
+        user_cache.clear()
+        self.assertEqual(self.client.get('/wishlist/', **headers).status_code, 401)
+
+        self.user.delete()
+        self.assertEqual(self.client.get('/wishlist/', **headers).status_code, 401)
+
+    def test_stale_token_is_ignored_where_guests_are_allowed(self):
+        expired = jwt.encode(
+            {'id': self.user.id, 'exp': datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=1)},
+            settings.SECRET_KEY, algorithm='HS256',
+        )
+        response = self.client.post(
+            '/api/login/', {'username': 'eco', 'password': 'secret-pass-123'}, **self.auth(expired),
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/profile/', **self.auth(expired)).status_code, 401)
+
+    def test_legacy_token_of_inactive_user_is_rejected(self):
+        legacy = jwt.encode(
+            {'id': self.user.id, 'exp': datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=1)},
+            settings.SECRET_KEY, algorithm='HS256',
+        )
+        CustomerUser.objects.filter(id=self.user.id).update(is_active=False)
+        user_cache.clear()
+        self.assertEqual(self.client.get('/wishlist/', **self.auth(legacy)).status_code, 401)
+
+    def test_profile(self):
+        response = self.client.get('/api/profile/', **self.auth(issue_token(self.user)))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['username'], 'eco')
+
+
+class AsyncUserViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomerUser.objects.create_user(username='eco', email='eco@example.com', password='secret-pass-123')
+        cls.user.wishlist.add(
+            Product.objects.create(product_id='1', product_name='Tote', price='80.00'),
+            Product.objects.create(product_id='2', product_name='Straw', price='12.50'),
+        )
+
+    def setUp(self):
+        token_cache.clear()
+        user_cache.clear()
+        get_user(self.user.id)  # a warm user cache, as on a busy worker
+
+    def call(self, view, path, **kwargs):
+        request = RequestFactory().get(path, **kwargs.pop('headers', {}))
+        return async_to_sync(view.as_view())(request, **kwargs)
+
+    def test_userinfo_matches_sync_view(self):
+        response = self.call(AsyncCustomerUserView, '/api/userinfo/eco', username='eco')
+        self.assertEqual(response.content, self.client.get('/api/userinfo/eco').content)
+        self.assertEqual(self.call(AsyncCustomerUserView, '/api/userinfo/nobody', username='nobody').status_code, 404)
+
+    def test_wishlist_matches_sync_view_without_user_query(self):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {issue_token(self.user)}'}
+        with self.assertNumQueries(1):
+            response = self.call(AsyncWishlistView, '/wishlist/', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, self.client.get('/wishlist/', **headers).content)
+
+    def test_wishlist_requires_valid_token(self):
+        response = self.call(AsyncWishlistView, '/wishlist/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer')
+        response = self.call(AsyncWishlistView, '/wishlist/', headers={'HTTP_AUTHORIZATION': 'Bearer nonsense'})
+        self.assertEqual(json.loads(response.content), {'detail': 'Invalid token'})
+
+
+class WishlistBulkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomerUser.objects.create_user(username='eco', email='eco@example.com', password='secret-pass-123')
+        cls.products = [
+            Product.objects.create(product_id=str(i), product_name=f'Product {i}', price='10.00', img_url=f'/img/{i}.png')
+            for i in range(1, 6)
+        ]
+        cls.user.wishlist.add(cls.products[0], cls.products[1])
+        cls.headers = {'HTTP_AUTHORIZATION': f'Bearer {issue_token(cls.user)}'}
+
+    def setUp(self):
+        token_cache.clear()
+        user_cache.clear()
+        get_user(self.user.id)  # a warm user cache, as on a busy worker
+
+    def bulk(self, payload):
+        return self.client.post('/wishlist/bulk/', payload, content_type='application/json', **self.headers)
+
+    def wishlist_ids(self):
+        return sorted(self.user.wishlist.values_list('product_id', flat=True))
+
+    def test_adds_and_removes_in_one_round_trip(self):
+        # IN lookup, savepoint, one INSERT, one DELETE, release
+        with self.assertNumQueries(5):
+            response = self.bulk({'add': ['3', 4, '1'], 'remove': ['2', 'nope']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'added': ['3', '4', '1'], 'removed': ['2'], 'missing': ['nope']})
+        self.assertEqual(self.wishlist_ids(), ['1', '3', '4'])
+
+    def test_rejects_bad_payloads(self):
+        self.assertEqual(self.bulk({'add': '3'}).status_code, 400)
+        self.assertEqual(self.bulk({'add': [{'id': 3}]}).status_code, 400)
+        self.assertEqual(self.bulk({}).status_code, 400)
+        self.assertEqual(self.bulk({'add': ['3'], 'remove': ['3']}).status_code, 400)
+        self.assertEqual(self.bulk({'add': [str(i) for i in range(201)]}).status_code, 400)
+        self.assertEqual(self.client.post('/wishlist/bulk/', {'add': ['3']}, content_type='application/json').status_code, 401)
+        self.assertEqual(self.wishlist_ids(), ['1', '2'])
+
+    def test_wishlist_read_is_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/wishlist/', **self.headers)
+        self.assertEqual(
+            sorted(response.json()['wishlist'], key=lambda p: p['product_id']),
+            [{'product_id': '1', 'product_name': 'Product 1', 'price': 10.0, 'img_url': '/img/1.png'},
+             {'product_id': '2', 'product_name': 'Product 2', 'price': 10.0, 'img_url': '/img/2.png'}],
+        )
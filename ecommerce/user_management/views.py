@@ -1,4 +1,4 @@
-from django.http import HttpResponse, JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework.parsers import JSONParser
 # from django.contrib.auth.models import User
@@ -7,13 +7,19 @@ from user_management.serializers import CustomerUserSerializer, CustomerUserRegi
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.shortcuts import get_object_or_404
+from django.shortcuts import get_object_or_404, aget_object_or_404
+from django.views import View
+from django.db import transaction
+from rest_framework import exceptions
 from rest_framework import status
 from django.contrib.auth import authenticate
-import jwt
-import datetime
-from django.conf import settings
 from product_management.models import Product
+from user_management.authentication import JWTAuthentication, issue_token, get_user
+from ecommerce_service.responses import api_json_response
+
+# Columns the wishlist endpoints return for each product
+WISHLIST_FIELDS = ('product_id', 'product_name', 'price', 'img_url')
+WISHLIST_BULK_LIMIT = 200
 
 
 class CustomerUserView(APIView):
@@ -55,13 +61,7 @@ class LoginView(APIView):
                 )
             
             # Generate JWT token
-            payload = {
-                'id': user.id,
-                'username': user.username,
-                'exp': datetime.datetime.utcnow() + datetime.timedelta(days=1)
-            }
-            
-            token = jwt.encode(payload, settings.SECRET_KEY, algorithm='HS256')
+            token = issue_token(user)
             
             return Response(
                 {
@@ -80,104 +80,134 @@ class LoginView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class CustomerUserProfileView(APIView):
+    permission_classes = [IsAuthenticated]
+
     def get(self, request):
-        # Get auth token from header
-        token = request.headers.get('Authorization', '').split(' ')[1]
-        
-        if not token:
-            return Response(
-                {"error": "Authentication required"},
-                status=status.HTTP_401_UNAUTHORIZED
-            )
-        
+        # The token only carries a few claims; the profile needs the full row
         try:
-            # Decode token
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-            user_id = payload['id']
-            
-            # Get user
-            user = CustomerUser.objects.get(id=user_id)
-            
-            # Use the existing UserSerializer
-            serializer = CustomerUserSerializer(user)
-            return Response(serializer.data)
-            
-        except jwt.ExpiredSignatureError:
-            return Response(
-                {"error": "Token expired"},
-                status=status.HTTP_401_UNAUTHORIZED
-            )
-        except (jwt.InvalidTokenError, CustomerUser.DoesNotExist):
+            user = get_user(request.user.id)
+        except CustomerUser.DoesNotExist:
             return Response(
                 {"error": "Invalid token"},
                 status=status.HTTP_401_UNAUTHORIZED
             )
+
+        serializer = CustomerUserSerializer(user)
+        return Response(serializer.data)
         
 class AddToWishlistView(APIView):
-    def post(self, request, product_id):
-        token = request.headers.get('Authorization', '').split(' ')[1]
-        if not token:
-            return Response({"error": "Authentication required"}, status=status.HTTP_401_UNAUTHORIZED)
+    permission_classes = [IsAuthenticated]
 
-        try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-            user = CustomerUser.objects.get(id=payload['id'])
-            product = get_object_or_404(Product, product_id=product_id)
+    def post(self, request, product_id):
+        product = get_object_or_404(Product, product_id=product_id)
+        request.user.wishlist.add(product)
+        return Response({"message": "Product added to wishlist"}, status=status.HTTP_200_OK)
 
+class RemoveFromWishlistView(APIView):
+    permission_classes = [IsAuthenticated]
 
-            user.wishlist.add(product)
-            return Response({"message": "Product added to wishlist"}, status=status.HTTP_200_OK)
+    def post(self, request, product_id):
+        product = get_object_or_404(Product, product_id=product_id)
+        request.user.wishlist.remove(product)
+        return Response({"message": "Product removed from wishlist"}, status=status.HTTP_200_OK)
 
-        except jwt.ExpiredSignatureError:
-            return Response({"error": "Token expired"}, status=status.HTTP_401_UNAUTHORIZED)
-        except jwt.InvalidTokenError:
-            return Response({"error": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
+class WishlistView(APIView):
+    permission_classes = [IsAuthenticated]
 
-class RemoveFromWishlistView(APIView):
-    def post(self, request, product_id):
-        token = request.headers.get('Authorization', '').split(' ')[1]
-        if not token:
-            return Response({"error": "Authentication required"}, status=status.HTTP_401_UNAUTHORIZED)
+    def get(self, request):
+        data = list(request.user.wishlist.values(*WISHLIST_FIELDS))
+        return Response({"wishlist": data}, status=status.HTTP_200_OK)
 
-        try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-            user = CustomerUser.objects.get(id=payload['id'])
-            product = get_object_or_404(Product, product_id=product_id)
+class WishlistBulkView(APIView):
+    """
+    Add and remove many wishlist products in one request, e.g. to merge a
+    guest wishlist at login:
 
+        POST /wishlist/bulk/  {"add": ["1", "7"], "remove": ["3"]}
 
-            user.wishlist.remove(product)
-            return Response({"message": "Product removed from wishlist"}, status=status.HTTP_200_OK)
+    The ids are checked with one IN query; adds are one INSERT into the
+    through table and removes one DELETE. Unknown ids are reported in
+    ``missing`` rather than failing the whole request.
+    """
+    permission_classes = [IsAuthenticated]
 
-        except jwt.ExpiredSignatureError:
-            return Response({"error": "Token expired"}, status=status.HTTP_401_UNAUTHORIZED)
-        except jwt.InvalidTokenError:
-            return Response({"error": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
+    def id_list(self, data, key):
+        ids = data.get(key, [])
+        if not isinstance(ids, list) or not all(isinstance(i, (str, int)) and not isinstance(i, bool) for i in ids):
+            raise exceptions.ValidationError({key: "Expected a list of product ids."})
+        return list(dict.fromkeys(str(i) for i in ids))
 
-class WishlistView(APIView):
-    def get(self, request):
-        token = request.headers.get('Authorization', '').split(' ')[1]
-        if not token:
-            return Response({"error": "Authentication required"}, status=status.HTTP_401_UNAUTHORIZED)
+    def post(self, request):
+        if not isinstance(request.data, dict):
+            raise exceptions.ValidationError({"detail": "Expected an object with add and/or remove lists."})
+        add, remove = self.id_list(request.data, 'add'), self.id_list(request.data, 'remove')
+        if not add and not remove:
+            raise exceptions.ValidationError({"detail": "Nothing to add or remove."})
+        if len(add) + len(remove) > WISHLIST_BULK_LIMIT:
+            raise exceptions.ValidationError({"detail": f"At most {WISHLIST_BULK_LIMIT} product ids per request."})
+        if set(add) & set(remove):
+            raise exceptions.ValidationError({"detail": "A product cannot be both added and removed."})
+
+        requested = add + remove
+        known = set(Product.objects.filter(product_id__in=requested).values_list('product_id', flat=True))
+        add = [product_id for product_id in add if product_id in known]
+        remove = [product_id for product_id in remove if product_id in known]
+
+        Through = CustomerUser.wishlist.through
+        user_id = request.user.id
+        with transaction.atomic():
+            if add:
+                # The through table is unique on (user, product), so products
+                # already on the wishlist are skipped by the database
+                Through.objects.bulk_create(
+                    [Through(customeruser_id=user_id, product_id=product_id) for product_id in add],
+                    ignore_conflicts=True,
+                )
+            if remove:
+                Through.objects.filter(customeruser_id=user_id, product_id__in=remove).delete()
 
-        try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-            user = CustomerUser.objects.get(id=payload['id'])
+        return Response({
+            "added": add,
+            "removed": remove,
+            "missing": [product_id for product_id in requested if product_id not in known],
+        }, status=status.HTTP_200_OK)
 
-            wishlist = user.wishlist.all()
+class AsyncCustomerUserView(View):
+    """CustomerUserView for the ASGI server, reading through the async ORM"""
 
-            # 🔍 Debug print — only for development!
-            for p in wishlist:
-                print("Wishlist item:", p)
-                print("Attributes available on product:", dir(p))
+    async def get(self, request, username):
+        try:
+            user = await aget_object_or_404(CustomerUser, username=username)
+        except Http404 as e:
+            return api_json_response({"detail": str(e)}, status=status.HTTP_404_NOT_FOUND)
+        user_data = {
+            "username": user.username,
+            "email": user.email,
+            "created_at": user.created_at.strftime("%d-%m-%Y"),
+            'wishlist': [p async for p in user.wishlist.values('product_id', 'product_name', 'price')],
+        }
+        return JsonResponse(user_data)
 
-            data = [{"product_id": p.product_id, "product_name": p.product_name, "price": p.price, 'img_url': p.img_url} for p in wishlist]
+class AsyncWishlistView(View):
+    """WishlistView for the ASGI server; token claims authenticate without a query"""
+    authenticator = JWTAuthentication()
 
-            return Response({"wishlist": data}, status=status.HTTP_200_OK)
+    def unauthorized(self, detail):
+        response = api_json_response({"detail": detail}, status=status.HTTP_401_UNAUTHORIZED)
+        response['WWW-Authenticate'] = self.authenticator.authenticate_header(None)
+        return response
 
-        except jwt.ExpiredSignatureError:
-            return Response({"error": "Token expired"}, status=status.HTTP_401_UNAUTHORIZED)
-        except jwt.InvalidTokenError:
-            return Response({"error": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
+    async def get(self, request):
+        try:
+            auth = await self.authenticator.aauthenticate(request)
+        except exceptions.AuthenticationFailed as e:
+            return self.unauthorized(e.detail)
+        if auth is None:
+            return self.unauthorized(exceptions.NotAuthenticated.default_detail)
+
+        user = auth[0]
+        data = [p async for p in user.wishlist.values(*WISHLIST_FIELDS)]
+        return api_json_response({"wishlist": data})
 
 
 